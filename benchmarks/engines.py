@@ -0,0 +1,63 @@
+from query.engine import Engine
+from query.catalog import CATALOG_COLUMNS_QUERY, CATALOG_FOREIGN_KEYS_QUERY
+
+
+class RecordingEngine(Engine):
+    def __init__(self, rows=None, description=None, **kwargs):
+        """
+        An engine that never connects to a database, it counts the statements and returns the same `rows` for every
+        query, so the benchmarks using it only measure the cost of building the queries and formatting the results.
+
+        Args:
+            rows (list, optional): the rows returned by every query. Defaults to None
+            description (list, optional): a (name, type oid) for each column of the rows. Defaults to None
+        """
+        self.rows = rows if rows is not None else []
+        self.description = description if description is not None else []
+        self.statements = 0
+        self.bytes_copied = 0
+        super(RecordingEngine, self).__init__(**kwargs)
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def commit(self):
+        return True
+
+    def rollback(self):
+        pass
+
+    def fetch(self, query, params=None, with_description=False):
+        self.statements += 1
+        # the catalog is empty so the joins use the join relations
+        rows = [] if query in (CATALOG_COLUMNS_QUERY, CATALOG_FOREIGN_KEYS_QUERY) else self.rows
+        return (self.description, rows) if with_description else rows
+
+    def stream(self, query, params=None, chunk_size=2000, with_description=False):
+        self.statements += 1
+        for index in range(0, len(self.rows), chunk_size):
+            rows = self.rows[index:index + chunk_size]
+            yield (self.description, rows) if with_description else rows
+
+    def write(self, statements):
+        rows = 0
+        for query, params in statements:
+            self.statements += 1
+            rows += 1
+        return rows
+
+    def save(self, query, params=None):
+        self.statements += 1
+        return True
+
+    def copy_from(self, query, fileobj, size=8192):
+        self.statements += 1
+        while True:
+            data = fileobj.read(size)
+            if not data:
+                break
+            self.bytes_copied += len(data)
+        return True
@@ -0,0 +1,271 @@
+"""
+Benchmarks of the query builder and of the engines, the results are written as json so you can compare releases.
+
+Only the cost of building the queries and formatting the results, with an engine that never connects:
+>>> python -m benchmarks.run --output before.json
+
+Also the round trips to a local postgres, the benchmarks create and drop the `pyquery_benchmark` table:
+>>> python -m benchmarks.run --postgres --host localhost --port 5432 --database pyquery --user postgres --password postgres --output before.json
+
+Compare two runs, a ratio above 1 means the second run is slower:
+>>> python -m benchmarks.run --compare before.json after.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from query.query import Query, fields_cache
+from query.engine import Postgres
+from benchmarks.engines import RecordingEngine
+
+
+JOIN_RELATIONS = {
+    'form_value': {
+        'form': 'dynamic_forms'
+    },
+    'dynamic_forms': {
+        'depends_on': 'dynamic_forms'
+    }
+}
+BENCHMARK_TABLE = 'pyquery_benchmark'
+BENCHMARK_COLUMNS = ['id', 'name', 'value', 'created_at', 'enabled']
+BENCHMARK_DESCRIPTION = [('id', 23), ('name', 25), ('value', 701), ('created_at', 1114), ('enabled', 16)]
+
+
+def benchmark_rows(number_of_rows):
+    return [
+        (index, 'name {}'.format(index), index * 1.5, '2020-01-01 00:00:00', index % 2 == 0)
+        for index in range(number_of_rows)
+    ]
+
+
+def measure(function, number=1, repeat=5, setup=None):
+    """
+    Runs the function `number` times on each repeat and keeps the fastest repeat, the fastest is the one with less
+    noise from the rest of the machine.
+
+    Args:
+        function (callable): the function to measure, it can return the number of units it processed, like rows,
+        otherwise each call is a single unit
+        number (int, optional): number of calls on each repeat. Defaults to 1
+        repeat (int, optional): number of repeats. Defaults to 5
+        setup (callable, optional): runs before each call and it is not part of the timings. Defaults to None
+
+    Returns:
+        dict: `seconds` of the fastest call, `mean` seconds of all of the calls and `units_per_second`
+    """
+    timings = []
+    units = 0
+    for __ in range(repeat):
+        units = 0
+        if setup is None:
+            start = time.perf_counter()
+            for __ in range(number):
+                units += function() or 1
+            timings.append(time.perf_counter() - start)
+        else:
+            timing = 0
+            for __ in range(number):
+                setup()
+                start = time.perf_counter()
+                units += function() or 1
+                timing += time.perf_counter() - start
+            timings.append(timing)
+    best = min(timings)
+    return {
+        'number': number,
+        'repeat': repeat,
+        'seconds': best / number,
+        'mean': sum(timings) / (number * repeat),
+        'units_per_second': units / best if best else None
+    }
+
+
+def compile_benchmarks(quick):
+    engine = RecordingEngine()
+    number = 200 if quick else 2000
+
+    def simple():
+        Query(JOIN_RELATIONS, 'form_value', engine).filter(id=1, value='foo').order_by('-id').limit(10)._compile()
+
+    def joins():
+        Query(JOIN_RELATIONS, 'form_value', engine).select(
+            'id', 'form__name', 'form__depends_on__name'
+        ).filter(
+            form__depends_on__depends_on__id=1, form__name='foo', id___in=[1, 2, 3]
+        ).order_by('form__depends_on__id', '-id')._compile()
+
+    def joins_cold():
+        fields_cache.clear()
+        joins()
+
+    def subquery():
+        Query(JOIN_RELATIONS, 'form_value', engine).filter(
+            form_id___in=Query(JOIN_RELATIONS, 'dynamic_forms', engine).filter(depends_on__name='foo')
+        )._compile()
+
+    return {
+        'compile.simple': measure(simple, number),
+        'compile.joins': measure(joins, number),
+        'compile.joins_cold': measure(joins_cold, number),
+        'compile.subquery': measure(subquery, number)
+    }
+
+
+def format_db_values_benchmarks(quick):
+    query = Query(JOIN_RELATIONS, 'form_value', RecordingEngine())
+    size = 1000 if quick else 10000
+    values_list = list(range(size))
+    values_rows = tuple([list(row) for row in benchmark_rows(size // 10)])
+
+    def large_list():
+        query.format_db_values(values_list, [])
+        return len(values_list)
+
+    def tuple_of_lists():
+        query.format_db_values(values_rows, [])
+        return len(values_rows)
+
+    return {
+        'format_db_values.list': measure(large_list, 10),
+        'format_db_values.tuple_of_lists': measure(tuple_of_lists, 10)
+    }
+
+
+def bulk_insert_benchmarks(engine, quick, table, setup=None):
+    rows = benchmark_rows(2000 if quick else 20000)
+
+    def insert(method):
+        def function():
+            Query(JOIN_RELATIONS, table, engine).bulk_insert(rows, column_names=BENCHMARK_COLUMNS, method=method)
+            return len(rows)
+        return function
+
+    return dict(
+        ('bulk_insert.{}'.format(method), measure(insert(method), repeat=3, setup=setup)) for method in ('values', 'copy')
+    )
+
+
+def fetch_benchmarks(engine, quick, table):
+    results = {}
+    for row_format in ('tuple', 'named', 'dict'):
+        def force():
+            return len(Query(JOIN_RELATIONS, table, engine).rows(as_=row_format).force())
+
+        def iterator():
+            return sum(1 for __ in Query(JOIN_RELATIONS, table, engine).rows(as_=row_format).iterator(chunk_size=2000))
+
+        results['fetch.force.{}'.format(row_format)] = measure(force, repeat=3)
+        results['fetch.iterator.{}'.format(row_format)] = measure(iterator, repeat=3)
+
+    def first():
+        Query(JOIN_RELATIONS, table, engine).filter(id=1).first().force()
+
+    def count():
+        Query(JOIN_RELATIONS, table, engine).count()
+
+    number = 20 if quick else 200
+    results['fetch.latency.first'] = measure(first, number)
+    results['fetch.latency.count'] = measure(count, number)
+    return results
+
+
+def recording_engine_benchmarks(quick):
+    rows = benchmark_rows(10000 if quick else 100000)
+    results = {}
+    results.update(bulk_insert_benchmarks(RecordingEngine(), quick, BENCHMARK_TABLE))
+    results.update(fetch_benchmarks(RecordingEngine(rows=rows, description=BENCHMARK_DESCRIPTION), quick, BENCHMARK_TABLE))
+    return dict(('recording.{}'.format(name), result) for name, result in results.items())
+
+
+def postgres_benchmarks(quick, **connection):
+    engine = Postgres(pool={'min_size': 1, 'max_size': 4}, **connection)
+    engine.connect()
+    engine.execute('DROP TABLE IF EXISTS "{}"'.format(BENCHMARK_TABLE))
+    engine.execute(
+        'CREATE TABLE "{}" ("id" integer PRIMARY KEY, "name" text, "value" double precision, '
+        '"created_at" timestamp, "enabled" boolean)'.format(BENCHMARK_TABLE)
+    )
+    engine.commit()
+
+    # every repeat inserts the same ids, so the table is emptied before each one
+    def truncate():
+        engine.connect()
+        engine.execute('TRUNCATE "{}"'.format(BENCHMARK_TABLE))
+        engine.commit()
+
+    try:
+        results = bulk_insert_benchmarks(engine, quick, BENCHMARK_TABLE, setup=truncate)
+        Query(JOIN_RELATIONS, BENCHMARK_TABLE, engine).bulk_insert(
+            benchmark_rows(10000 if quick else 100000), column_names=BENCHMARK_COLUMNS, method='copy'
+        )
+        results.update(fetch_benchmarks(engine, quick, BENCHMARK_TABLE))
+    finally:
+        engine.connect()
+        engine.execute('DROP TABLE IF EXISTS "{}"'.format(BENCHMARK_TABLE))
+        engine.commit()
+        engine.dispose()
+    return dict(('postgres.{}'.format(name), result) for name, result in results.items())
+
+
+def metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file)['results'], json.load(after_file)['results']
+    print('{:<45} {:>14} {:>14} {:>8}'.format('benchmark', 'before (s)', 'after (s)', 'ratio'))
+    for name in sorted(set(before) & set(after)):
+        ratio = after[name]['seconds'] / before[name]['seconds'] if before[name]['seconds'] else float('nan')
+        print('{:<45} {:>14.6f} {:>14.6f} {:>8.2f}'.format(name, before[name]['seconds'], after[name]['seconds'], ratio))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the query builder and of the engines')
+    parser.add_argument('--output', help='writes the results to this json file')
+    parser.add_argument('--quick', action='store_true', help='less iterations and smaller datasets')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compares two json results')
+    parser.add_argument('--postgres', action='store_true', help='also runs the benchmarks against postgres')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5432)
+    parser.add_argument('--database', default='postgres')
+    parser.add_argument('--user', default='postgres')
+    parser.add_argument('--password', default='')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.compare:
+        compare(*arguments.compare)
+        return
+
+    results = {}
+    results.update(compile_benchmarks(arguments.quick))
+    results.update(format_db_values_benchmarks(arguments.quick))
+    results.update(recording_engine_benchmarks(arguments.quick))
+    if arguments.postgres:
+        results.update(postgres_benchmarks(
+            arguments.quick, host=arguments.host, port=arguments.port, database=arguments.database,
+            user=arguments.user, password=arguments.password
+        ))
+
+    for name, result in sorted(results.items()):
+        print('{:<45} {:>12.6f}s {:>14.1f}/s'.format(name, result['seconds'], result['units_per_second'] or 0))
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump({'metadata': metadata(), 'results': results}, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
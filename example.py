@@ -34,10 +34,11 @@ print(fields_to_recover_data)
 # EXAMPLE 2 #
 #           #
 #############
-# In this example uses the value of a query in a second query, evaluates only once, 
-# you are not using `new_results` for anything.
+# In this example uses a query as the value of a second query, `results` is not evaluated,
+# it becomes a subquery so the database runs everything at once:
+# WHERE "form_value"."id" IN (SELECT "form_value"."id" FROM "form_value" LIMIT 2)
 results = conn.query('form_value').select('id', flat=True).limit(2)
 new_results = conn.query('form_value').filter(id___in=results)
 
-# you can also use .force() to force evaluation
+# you can also use .force() to evaluate `results` first and use its values
 new_results = conn.query('form_value').filter(id___in=results.force())
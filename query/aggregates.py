@@ -0,0 +1,61 @@
+from .settings import AGGREGATE_FORMAT, AGGREGATE_ALL_FIELDS, DISTINCT_CLAUSE_FORMAT
+
+
+class Aggregate:
+    function = None
+
+    def __init__(self, field, distinct=False):
+        """
+        An aggregate function for `query.aggregate()` and `query.annotate()`, the field can use joins with double
+        underscores like `form__id`.
+        >>> connection.query('form_value').aggregate(total=Sum('value'), forms=Count('form_id', distinct=True))
+
+        Args:
+            field (str): the field to aggregate
+            distinct (bool, optional): aggregates only the distinct values of the field. Defaults to False
+        """
+        if distinct and field == AGGREGATE_ALL_FIELDS:
+            raise ValueError('`distinct` needs a field')
+        self.field = field
+        self.distinct = distinct
+
+    def compile(self, query):
+        """
+        Args:
+            query (Query): the query where the aggregate is used, the joins of the field are added to it
+
+        Returns:
+            str: the aggregate expression
+        """
+        field = self.field if self.field == AGGREGATE_ALL_FIELDS else query._format_db_fields(self.field)
+        return AGGREGATE_FORMAT.format(
+            function=self.function,
+            distinct=DISTINCT_CLAUSE_FORMAT if self.distinct else '',
+            field=field
+        )
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.field)
+
+
+class Count(Aggregate):
+    function = 'COUNT'
+
+    def __init__(self, field=AGGREGATE_ALL_FIELDS, distinct=False):
+        super(Count, self).__init__(field, distinct=distinct)
+
+
+class Sum(Aggregate):
+    function = 'SUM'
+
+
+class Avg(Aggregate):
+    function = 'AVG'
+
+
+class Min(Aggregate):
+    function = 'MIN'
+
+
+class Max(Aggregate):
+    function = 'MAX'
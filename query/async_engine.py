@@ -0,0 +1,309 @@
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import time
+
+from .engine import Engine, numbered_placeholders
+from .instrumentation import estimate_size
+
+
+class AsyncPostgres(Engine):
+    is_async = True
+    connection_errors = (OSError,) + (
+        (
+            asyncpg.exceptions.ConnectionDoesNotExistError, 
+            asyncpg.exceptions.PostgresConnectionError, 
+            asyncpg.exceptions.CannotConnectNowError
+        ) if asyncpg else ()
+    )
+
+    def __init__(self, port, host, database, user, password, pool=None, instrumentation=None, catalog_ttl=300,
+                 result_cache=None):
+        """
+        Postgres engine for asyncio, built on top of `asyncpg`. Every method is a coroutine and the connections
+        always come from a pool, so queries can run concurrently on a single thread.
+
+        Args:
+            pool (dict, optional): the options of the pool, a dict with any of the following keys: `min_size`,
+            `max_size`, `idle_timeout` and `timeout`. Defaults to None
+            instrumentation (Instrumentation, optional): collects the timing of each statement, when not set we
+            create one with the default options. Defaults to None
+            catalog_ttl (int, optional): seconds until the columns and foreign keys of the tables expire, None to
+            never expire. Defaults to 300
+            result_cache (bool/dict/ResultCache, optional): caches the results of the queries that use `.cache()`.
+            Use True for the default options or a dict with `backend`, `maxsize` and `ttl` keys. Defaults to None
+        """
+        if asyncpg is None:
+            raise ImportError('`asyncpg` is required for the `postgres_async` engine, install it with `pip install asyncpg`')
+        self.port = port
+        self.host = host
+        self.database = database
+        self.user = user
+        self.password = password
+        pool_options = dict(pool) if isinstance(pool, dict) else dict()
+        self.pool_options = {
+            'min_size': pool_options.get('min_size', 1),
+            'max_size': pool_options.get('max_size', 10),
+            'max_inactive_connection_lifetime': pool_options.get('idle_timeout', 300)
+        }
+        self.timeout = pool_options.get('timeout', 30)
+        self.pool = None
+        self.__pool_lock = None
+        # the connection of the current transaction, each task has its own
+        self.__transaction_connection = contextvars.ContextVar('transaction_connection', default=None)
+        # the tables written in the current transaction, invalidated in the result cache when it ends
+        self.__pending_invalidations = contextvars.ContextVar('pending_invalidations', default=None)
+        super(AsyncPostgres, self).__init__(
+            instrumentation=instrumentation, catalog_ttl=catalog_ttl, result_cache=result_cache
+        )
+
+    def is_connection_error(self, error):
+        """
+        Timeouts are raised by slow queries and by a busy pool as well, so they are never connection errors. Since
+        python 3.11 `asyncio.TimeoutError` is the builtin `TimeoutError`, a subclass of `OSError`.
+        """
+        if isinstance(error, asyncio.TimeoutError):
+            return False
+        return super(AsyncPostgres, self).is_connection_error(error)
+
+    async def __get_pool(self):
+        """
+        The pool is created on the first query since it must be created inside the running event loop
+        """
+        if self.pool is None:
+            if self.__pool_lock is None:
+                self.__pool_lock = asyncio.Lock()
+            async with self.__pool_lock:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(
+                        port=self.port,
+                        host=self.host,
+                        database=self.database,
+                        user=self.user,
+                        password=self.password,
+                        **self.pool_options
+                    )
+        return self.pool
+
+    async def _acquire(self):
+        transaction_connection = self.__transaction_connection.get()
+        if transaction_connection is not None:
+            return transaction_connection
+        pool = await self.__get_pool()
+        return await pool.acquire(timeout=self.timeout)
+
+    async def _release(self, connection):
+        if connection is not self.__transaction_connection.get():
+            await self.pool.release(connection)
+
+    @property
+    def in_transaction(self):
+        return self.__transaction_connection.get() is not None
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Runs everything inside the `async with` block in a single connection and a single transaction, nested
+        transactions use savepoints. Don't run queries concurrently inside the same transaction, a connection
+        runs one statement at a time.
+
+        >>> async with engine.transaction():
+                await connection.query('form_value').insert(id=1)
+        """
+        connection = self.__transaction_connection.get()
+        if connection is not None:
+            async with connection.transaction():
+                yield connection
+            return
+
+        connection = await self._acquire()
+        token = self.__transaction_connection.set(connection)
+        invalidations_token = self.__pending_invalidations.set(set())
+        try:
+            async with connection.transaction():
+                yield connection
+        finally:
+            pending_invalidations = self.__pending_invalidations.get()
+            self.__pending_invalidations.reset(invalidations_token)
+            self.__transaction_connection.reset(token)
+            await self._release(connection)
+            if pending_invalidations:
+                self.invalidate_result_cache(*pending_invalidations)
+
+    def _pending_invalidations(self):
+        return self.__pending_invalidations.get()
+
+    async def fetch(self, query, params=None, with_description=False):
+        """
+        Args:
+            with_description (bool, optional): returns a tuple of (description, rows) instead, the description has 
+            a (name, type oid) for each column. Defaults to False
+
+        Returns:
+            list: the rows of the query
+        """
+        start = time.perf_counter()
+        connection = await self._acquire()
+        connect_time = time.perf_counter() - start
+        description = None
+        try:
+            with self.instrumentation.measure(query, params, connect_time) as event:
+                server_query, __ = numbered_placeholders(query)
+                if with_description:
+                    statement = await connection.prepare(server_query)
+                    description = [(attribute.name, attribute.type.oid) for attribute in statement.get_attributes()]
+                    records = await statement.fetch(*(params or ()))
+                else:
+                    records = await connection.fetch(server_query, *(params or ()))
+                result = [tuple(record) for record in records]
+                event['rows'] = len(result)
+                if self.instrumentation.measure_bytes:
+                    event['bytes'] = estimate_size(result)
+        finally:
+            await self._release(connection)
+        return (description, result) if with_description else result
+
+    async def stream(self, query, params=None, chunk_size=2000, with_description=False):
+        """
+        Runs the query with a server side cursor and yields the results in batches of at most `chunk_size` rows.
+
+        Args:
+            with_description (bool, optional): yields a tuple of (description, rows) instead, the description has a
+            (name, type oid) for each column. A query without results yields the description once with no rows.
+            Defaults to False
+
+        Yields:
+            list: a list with at most `chunk_size` rows
+        """
+        start = time.perf_counter()
+        connection = await self._acquire()
+        connect_time = time.perf_counter() - start
+        try:
+            with self.instrumentation.measure(query, params, connect_time) as event:
+                server_query, __ = numbered_placeholders(query)
+                event['rows'] = 0
+                # asyncpg cursors only exist inside a transaction
+                async with connection.transaction():
+                    statement = await connection.prepare(server_query)
+                    description = [(attribute.name, attribute.type.oid) for attribute in statement.get_attributes()]
+                    cursor = await statement.cursor(*(params or ()))
+                    while True:
+                        rows = [tuple(record) for record in await cursor.fetch(chunk_size)]
+                        if not rows:
+                            break
+                        event['rows'] += len(rows)
+                        yield (description, rows) if with_description else rows
+                    if with_description and event['rows'] == 0:
+                        yield description, []
+        finally:
+            await self._release(connection)
+
+    async def describe(self, query, params=None):
+        """
+        Returns:
+            list: the name of each column returned by the query, without running it
+        """
+        connection = await self._acquire()
+        try:
+            server_query, __ = numbered_placeholders(query)
+            statement = await connection.prepare(server_query)
+            return [attribute.name for attribute in statement.get_attributes()]
+        finally:
+            await self._release(connection)
+
+    async def write(self, statements):
+        """
+        Runs each statement in a single transaction
+
+        Args:
+            statements (iterable): tuples of (query, params)
+
+        Returns:
+            int: number of rows affected by all of the statements
+        """
+        start = time.perf_counter()
+        connection = await self._acquire()
+        connect_time = time.perf_counter() - start
+        rows = 0
+        try:
+            async with connection.transaction():
+                for query, params in statements:
+                    with self.instrumentation.measure(query, params, connect_time) as event:
+                        server_query, __ = numbered_placeholders(query)
+                        status = await connection.execute(server_query, *(params or ()))
+                        # the status is something like `UPDATE 10` or `INSERT 0 10`
+                        status = (status or '').split()
+                        event['rows'] = int(status[-1]) if status and status[-1].isdigit() else 0
+                        rows += event['rows']
+        finally:
+            await self._release(connection)
+        return rows
+
+    async def save(self, query, params=None):
+        await self.write([(query, params)])
+        return True
+
+    async def copy_records(self, table, records, columns):
+        """
+        Inserts the records with the binary COPY protocol
+
+        Args:
+            table (str): the name of the table
+            records (iterable): each record is a list or tuple of values
+            columns (list): the name of each column of the records
+
+        Returns:
+            int: number of rows copied
+        """
+        connection = await self._acquire()
+        try:
+            with self.instrumentation.measure('COPY "{}"'.format(table), None) as event:
+                status = await connection.copy_records_to_table(
+                    table, records=(tuple(record) for record in records), columns=list(columns)
+                )
+                event['rows'] = int(status.split()[-1])
+        finally:
+            await self._release(connection)
+        return event['rows']
+
+    async def copy_from_query(self, query, params, fileobj, format='csv', header=False):
+        """
+        Runs the SELECT with `COPY ... TO STDOUT` writing the data to a file like object
+
+        Args:
+            query (str): the SELECT statement
+            params (tuple): the value of each placeholder of the query
+            fileobj (file): any object with a `write(data)` method
+            format (str, optional): `csv`, `text` or `binary`. Defaults to 'csv'
+            header (bool, optional): writes the name of the columns in the first line, only for csv. Defaults to False
+
+        Returns:
+            int: number of rows copied
+        """
+        start = time.perf_counter()
+        connection = await self._acquire()
+        connect_time = time.perf_counter() - start
+        try:
+            with self.instrumentation.measure(query, params, connect_time) as event:
+                server_query, __ = numbered_placeholders(query)
+                options = {'header': True} if header else {}
+                status = await connection.copy_from_query(
+                    server_query, *(params or ()), output=fileobj, format=format, **options
+                )
+                event['rows'] = int(status.split()[-1])
+        finally:
+            await self._release(connection)
+        return event['rows']
+
+    async def dispose(self):
+        """
+        Closes all of the connections of the pool.
+        """
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        return True
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+
+def run_batch(engine, queries, workers=None):
+    """
+    Evaluates many independent queries at the same time, each one in its own connection, so the batch takes as long
+    as the slowest query and not the sum of all of them. Each query keeps its own `flat`, `rows`, `prefetch` and
+    `cache` options and its results are also kept in the query, so `query.fetch()` doesn't hit the database again.
+
+    Inside a transaction the queries run one after the other in the connection of the transaction, so they see its
+    writes.
+
+    Args:
+        engine (Engine): the engine of the connection
+        queries (list): the queries to evaluate
+        workers (int, optional): maximum number of queries running at the same time, by default all of them. Keep it
+        below the `max_size` of the pool. Defaults to None
+
+    Returns:
+        list: the results of each query, in the same order as the queries. With an async engine returns an awaitable.
+    """
+    queries = list(queries)
+    if workers is not None and workers < 1:
+        raise ValueError('`workers` must be at least 1')
+    if engine.is_async:
+        return _async_run_batch(engine, queries, workers)
+    if engine.in_transaction or len(queries) < 2:
+        return [query.force() for query in queries]
+    with ThreadPoolExecutor(max_workers=workers or len(queries)) as executor:
+        return list(executor.map(lambda query: query.force(), queries))
+
+
+async def _async_run_batch(engine, queries, workers):
+    if engine.in_transaction:
+        # a connection runs one statement at a time
+        return [await query.force() for query in queries]
+    semaphore = asyncio.Semaphore(workers or len(queries) or 1)
+
+    async def run(query):
+        async with semaphore:
+            return await query.force()
+
+    return list(await asyncio.gather(*[run(query) for query in queries]))
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        """
+        A thread safe dict like cache that keeps only the `maxsize` most recently used keys. Keys can also expire
+        after a number of seconds.
+
+        Args:
+            maxsize (int, optional): maximum number of keys in the cache. Defaults to 1024
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires_at = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Args:
+            ttl (int, optional): seconds until the key expires, None to keep it until it is evicted. Defaults to None
+        """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def items(self):
+        """
+        Returns:
+            list: a (key, value) tuple for each key that has not expired, from the least to the most recently used
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (value, expires_at) in self._data.items() 
+                if expires_at is None or now < expires_at
+            ]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: the number of `hits`, `misses`, `evictions` and `expirations`, the current `size` and the `maxsize` 
+            of the cache
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._data),
+                'maxsize': self.maxsize
+            }
@@ -0,0 +1,140 @@
+import itertools
+import threading
+import time
+
+
+# Columns and types of every table and view in the search path, ordered as they are in the table
+CATALOG_COLUMNS_QUERY = (
+    'SELECT "c"."relname", "a"."attname", format_type("a"."atttypid", "a"."atttypmod") '
+    'FROM "pg_catalog"."pg_attribute" "a" '
+    'INNER JOIN "pg_catalog"."pg_class" "c" ON ("c"."oid" = "a"."attrelid") '
+    'WHERE "c"."relkind" IN (\'r\', \'v\', \'m\', \'p\', \'f\') AND "a"."attnum" > 0 AND NOT "a"."attisdropped" '
+    'AND pg_table_is_visible("c"."oid") '
+    'ORDER BY "c"."relname", "a"."attnum"'
+)
+# Single column foreign keys of every table in the search path
+CATALOG_FOREIGN_KEYS_QUERY = (
+    'SELECT "c"."relname", "a"."attname", "r"."relname", "ra"."attname" '
+    'FROM "pg_catalog"."pg_constraint" "con" '
+    'INNER JOIN "pg_catalog"."pg_class" "c" ON ("c"."oid" = "con"."conrelid") '
+    'INNER JOIN "pg_catalog"."pg_class" "r" ON ("r"."oid" = "con"."confrelid") '
+    'INNER JOIN "pg_catalog"."pg_attribute" "a" ON ("a"."attrelid" = "con"."conrelid" AND "a"."attnum" = "con"."conkey"[1]) '
+    'INNER JOIN "pg_catalog"."pg_attribute" "ra" ON ("ra"."attrelid" = "con"."confrelid" AND "ra"."attnum" = "con"."confkey"[1]) '
+    'WHERE "con"."contype" = \'f\' AND cardinality("con"."conkey") = 1 AND pg_table_is_visible("c"."oid")'
+)
+# Foreign key columns usually are the name of the field with this suffix, like `form_id` for `form__name`
+FOREIGN_KEY_COLUMN_SUFFIX = '_id'
+
+# each load gets a new version, so anything cached from an older load is never reused
+versions = itertools.count(1)
+
+
+class Catalog:
+    def __init__(self, engine, ttl=300):
+        """
+        Keeps the columns, types and foreign keys of the tables of the database, they are loaded from `pg_catalog`
+        with two queries and reused until they expire. You can access it with `conn.catalog`.
+
+        With sync engines the catalog is loaded automatically when it is needed. With async engines it can't be
+        loaded while building a query, use `await conn.catalog.load()` once and after this the joins use the
+        foreign keys as well.
+
+        Args:
+            engine (Engine): the engine used to load the catalog
+            ttl (int, optional): seconds until the catalog is loaded again, None to never expire. Defaults to 300
+        """
+        self.engine = engine
+        self.ttl = ttl
+        self.version = None
+        self.loaded_at = None
+        self.__tables = {}
+        self.__foreign_keys = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def is_expired(self):
+        if self.loaded_at is None:
+            return True
+        return self.ttl is not None and time.monotonic() - self.loaded_at >= self.ttl
+
+    def load(self):
+        """
+        Loads the catalog from the database, even if it didn't expire yet.
+
+        Returns:
+            Catalog: the catalog itself. With an async engine returns an awaitable.
+        """
+        if self.engine.is_async:
+            return self._async_load()
+        with self.__lock:
+            self.__set(self.engine.fetch(CATALOG_COLUMNS_QUERY), self.engine.fetch(CATALOG_FOREIGN_KEYS_QUERY))
+        return self
+
+    async def _async_load(self):
+        columns = await self.engine.fetch(CATALOG_COLUMNS_QUERY)
+        foreign_keys = await self.engine.fetch(CATALOG_FOREIGN_KEYS_QUERY)
+        self.__set(columns, foreign_keys)
+        return self
+
+    def __set(self, columns, foreign_keys):
+        tables = {}
+        for table, column, data_type in columns:
+            tables.setdefault(table, {})[column] = data_type
+        relations = {}
+        for table, column, to_table, to_column in foreign_keys:
+            relations.setdefault(table, {})[column] = (to_table, to_column)
+        self.__tables = tables
+        self.__foreign_keys = relations
+        self.version = next(versions)
+        self.loaded_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Loads the catalog only if it expired, async engines are never loaded here since we can't wait for them.
+        """
+        if self.is_expired and not self.engine.is_async:
+            with self.__lock:
+                if self.is_expired:
+                    self.__set(self.engine.fetch(CATALOG_COLUMNS_QUERY), self.engine.fetch(CATALOG_FOREIGN_KEYS_QUERY))
+        return self
+
+    def invalidate(self):
+        """
+        Expires the catalog, use it after changing the schema. It is loaded again the next time it is needed.
+        """
+        self.loaded_at = None
+
+    def columns(self, table):
+        """
+        Returns:
+            list: the name of each column of the table or None if the table is not in the catalog
+        """
+        columns = self.refresh().__tables.get(table)
+        return list(columns.keys()) if columns is not None else None
+
+    def types(self, table):
+        """
+        Returns:
+            dict: the type of each column of the table, like {'id': 'integer'}, or None if the table is not in the catalog
+        """
+        columns = self.refresh().__tables.get(table)
+        return dict(columns) if columns is not None else None
+
+    def foreign_key(self, table, field):
+        """
+        Finds the foreign key of a join field, the field can be the name of the column, like `form_id`, or the name
+        without the `_id` suffix, like `form`.
+
+        Args:
+            table (str): the table the field belongs to
+            field (str): the name of the field
+
+        Returns:
+            tuple: (column, to_table, to_column) or None if the field is not a foreign key
+        """
+        foreign_keys = self.refresh().__foreign_keys.get(table, {})
+        for column in (field + FOREIGN_KEY_COLUMN_SUFFIX, field):
+            if column in foreign_keys:
+                to_table, to_column = foreign_keys[column]
+                return column, to_table, to_column
+        return None
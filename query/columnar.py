@@ -0,0 +1,148 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# dtype of each postgres type oid, any other type is kept as python objects. numeric is kept as `Decimal` since a
+# float would lose its precision
+POSTGRES_TYPES_TO_DTYPES = {
+    16: 'bool',               # boolean
+    20: 'int64',              # bigint
+    21: 'int16',              # smallint
+    23: 'int32',              # integer
+    26: 'uint32',             # oid
+    700: 'float32',           # real
+    701: 'float64',           # double precision
+    1082: 'datetime64[D]',    # date
+    1114: 'datetime64[us]'    # timestamp without time zone
+}
+DEFAULT_DTYPE = 'object'
+DUPLICATED_COLUMN_FORMAT = '{name}_{number}'
+INITIAL_CAPACITY = 1024
+
+
+def dtype_from_type_oid(type_oid):
+    return numpy.dtype(POSTGRES_TYPES_TO_DTYPES.get(type_oid, DEFAULT_DTYPE))
+
+
+def unique_column_names(names):
+    """
+    Columns with the same name, like `id` and `form__id`, would overwrite each other, so the repeated ones get
+    a number: `id`, `id_1`
+
+    Args:
+        names (list): the name of each column of the query
+
+    Returns:
+        list: the names without repeated ones, in the same order
+    """
+    unique_names = []
+    for name in names:
+        unique_name = name
+        number = 1
+        while unique_name in unique_names or (unique_name != name and unique_name in names):
+            unique_name = DUPLICATED_COLUMN_FORMAT.format(name=name, number=number)
+            number += 1
+        unique_names.append(unique_name)
+    return unique_names
+
+
+class ColumnarBuffer:
+    def __init__(self, description, records=False):
+        """
+        Copies the rows of each batch straight to a numpy array for each column, or to a single structured array
+        when `records` is True. The arrays grow by doubling their size so we never keep a list with all of the rows.
+
+        Columns with nulls can't be stored in integer or boolean arrays, when we find one the column is converted
+        to `object`. Floats and dates keep their dtype, nulls become `nan` and `NaT`. Numeric columns are `object`
+        arrays of `Decimal`. Repeated column names get a number, so `id` and `form__id` become `id` and `id_1`.
+
+        Args:
+            description (list): a (name, type oid) for each column of the query
+            records (bool, optional): fills a structured array instead of one array for each column. Defaults to False
+        """
+        if numpy is None:
+            raise ImportError('`numpy` is required for columnar results, install it with `pip install numpy`')
+        self.names = unique_column_names([column[0] for column in description])
+        self.dtypes = [dtype_from_type_oid(column[1]) for column in description]
+        self.records = records
+        self.size = 0
+        self.capacity = 0
+        if records:
+            self.__array = numpy.empty(0, dtype=list(zip(self.names, self.dtypes)))
+        else:
+            self.__arrays = [numpy.empty(0, dtype=dtype) for dtype in self.dtypes]
+
+    def __grow(self, size):
+        capacity = max(self.capacity, INITIAL_CAPACITY)
+        while capacity < size:
+            capacity *= 2
+        if self.records:
+            array = numpy.empty(capacity, dtype=self.__array.dtype)
+            array[:self.size] = self.__array[:self.size]
+            self.__array = array
+        else:
+            for index, old_array in enumerate(self.__arrays):
+                array = numpy.empty(capacity, dtype=old_array.dtype)
+                array[:self.size] = old_array[:self.size]
+                self.__arrays[index] = array
+        self.capacity = capacity
+
+    def __column(self, index):
+        return self.__array[self.names[index]] if self.records else self.__arrays[index]
+
+    def __convert_to_object(self, index):
+        self.dtypes[index] = numpy.dtype(DEFAULT_DTYPE)
+        if self.records:
+            self.__array = self.__array.astype(list(zip(self.names, self.dtypes)))
+        else:
+            self.__arrays[index] = self.__arrays[index].astype(DEFAULT_DTYPE)
+
+    def append(self, rows):
+        """
+        Args:
+            rows (list): a batch of rows retrieved from the cursor
+        """
+        if not rows:
+            return
+        end = self.size + len(rows)
+        if end > self.capacity:
+            self.__grow(end)
+        for index in range(len(self.names)):
+            values = [row[index] for row in rows]
+            # numpy would store nulls as False in boolean arrays, so we check them before
+            if self.dtypes[index].kind in 'biu' and any(value is None for value in values):
+                self.__convert_to_object(index)
+            try:
+                self.__column(index)[self.size:end] = values
+            except (TypeError, ValueError):
+                self.__convert_to_object(index)
+                self.__column(index)[self.size:end] = values
+        self.size = end
+
+    def __shrink(self):
+        # gives back the memory we reserved and didn't use, without copying the arrays
+        if self.capacity > self.size:
+            if self.records:
+                self.__array.resize((self.size,), refcheck=False)
+            else:
+                for array in self.__arrays:
+                    array.resize((self.size,), refcheck=False)
+            self.capacity = self.size
+
+    def to_columns(self):
+        """
+        Returns:
+            dict: the name of each column and a numpy array with its values
+        """
+        self.__shrink()
+        return dict((name, self.__column(index)) for index, name in enumerate(self.names))
+
+    def to_records(self):
+        """
+        Returns:
+            numpy.ndarray: a structured array with a field for each column
+        """
+        self.__shrink()
+        return self.__array
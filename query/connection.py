@@ -1,15 +1,25 @@
 import psycopg2
 from .settings import ENGINES
 from .query import Query
+from .router import Router
+from .batch import run_batch
 
 
 class Connect:
-    def __init__(self, engine, join_relations=dict(), **kwargs):
+    def __init__(self, engine, join_relations=dict(), replicas=None, routing='round_robin', **kwargs):
         """
         Connects to a engine so the user can make queryies
 
         Args:
             engine (str): The engine string
+            pool (bool/dict, optional): Reuse connections from a pool instead of opening one on each query. Use True
+            for the default options or a dict with `min_size`, `max_size`, `idle_timeout`, `timeout`, `health_check`
+            and `health_check_after` keys. Defaults to None
+            replicas (list, optional): a dict for each read replica with the arguments that are different from the
+            primary, like `host`, and optionally a `name`. SELECT queries run on the replicas, everything else on the
+            primary. Defaults to None
+            routing (str/dict, optional): how we pick the replica of each query, `round_robin` or `least_outstanding`,
+            or a dict with `strategy` and `eject_seconds` keys. Defaults to 'round_robin'
         Raises:
             KeyError: Engine must be one of the following: `postgres`
         """
@@ -20,9 +30,101 @@ class Connect:
         except TypeError as te:
             arguments = str(te).replace('__init__() missing 5 required positional arguments: ', '')
             raise TypeError('The following arguments are required for a new connection: {}'.format(arguments))
+        if replicas:
+            self.__engine = self.__create_router(engine, kwargs, replicas, routing)
         self.join_relations = join_relations 
 
+    def __create_router(self, engine, kwargs, replicas, routing):
+        replica_engines = {}
+        for index, replica in enumerate(replicas):
+            replica = dict(replica)
+            name = replica.pop('name', 'replica_{}'.format(index))
+            # replicas only run SELECT queries, the catalog and the result cache are the primary's
+            replica_kwargs = dict(kwargs, result_cache=None, instrumentation=self.__engine.instrumentation)
+            replica_kwargs.update(replica)
+            replica_engines[name] = ENGINES[engine](**replica_kwargs)
+        routing = dict(routing) if isinstance(routing, dict) else dict(strategy=routing)
+        return Router(self.__engine, replica_engines, **routing)
+
+    @property
+    def instrumentation(self):
+        """
+        The timing of each statement that runs in this connection, see `query.instrumentation.Instrumentation`
+        """
+        return self.__engine.instrumentation
+
+    @property
+    def catalog(self):
+        """
+        The columns, types and foreign keys of the tables of the database, see `query.catalog.Catalog`
+        """
+        return self.__engine.catalog
+
+    @property
+    def result_cache(self):
+        """
+        The cached results of the queries that use `.cache()`, None if the connection was created without
+        `result_cache`, see `query.result_cache.ResultCache`
+        """
+        return self.__engine.result_cache
+
+    def check_replicas(self):
+        """
+        Runs a `SELECT 1` on every replica, failing replicas are ejected and working ones come back.
+
+        Returns:
+            dict: the name of each replica and True if it is healthy. With an async engine returns an awaitable.
+        """
+        if not isinstance(self.__engine, Router):
+            return {}
+        return self.__engine.check_health()
+
     def query(self, on_table, join_relations=dict()):
         if not join_relations:
             join_relations = self.join_relations
         return Query(on_table=on_table, engine=self.__engine, join_relations=join_relations)
+
+    def batch(self, queries, workers=None):
+        """
+        Evaluates many independent queries at the same time, each one in its own connection, so use it with a `pool`.
+        >>> forms, values = conn.batch([
+                conn.query('dynamic_forms').filter(id=2),
+                conn.query('form_value').filter(form_id=2).select('value', flat=True)
+            ])
+
+        With an async engine use `await conn.batch([...])`
+
+        Args:
+            queries (list): the queries to evaluate
+            workers (int, optional): maximum number of queries running at the same time. Defaults to None
+
+        Returns:
+            list: the results of each query, in the same order as the queries
+        """
+        return run_batch(self.__engine, queries, workers=workers)
+
+    def transaction(self):
+        """
+        Runs every query inside the `with` block in a single connection, committing once at the end or rolling back
+        if an exception is raised. Transactions can be nested, nested transactions use savepoints.
+
+        >>> with conn.transaction():
+                conn.query('form_value').insert(id=1, name='foo')
+                conn.query('form_value').bulk_insert([[2, 'bar']], column_names=['id', 'name'])
+
+        With an async engine use `async with conn.transaction():`
+        """
+        return self.__engine.transaction()
+
+    def atomic(self):
+        """
+        Same as `.transaction()`
+        """
+        return self.transaction()
+
+    def close(self):
+        """
+        Closes the idle connections of the pool, if the connection was created with one, on the primary and on the
+        replicas.
+        """
+        return self.__engine.dispose()
@@ -0,0 +1,114 @@
+from datetime import date, datetime, time
+import codecs
+import io
+
+COPY_NULL = '\\N'
+COPY_COLUMN_SEPARATOR = '\t'
+COPY_ROW_SEPARATOR = '\n'
+COPY_ESCAPES = {
+    ord('\\'): '\\\\',
+    ord('\t'): '\\t',
+    ord('\n'): '\\n',
+    ord('\r'): '\\r'
+}
+
+
+def format_copy_value(value):
+    """
+    Formats a single value in the text format of the `COPY` command
+
+    Args:
+        value (str/int/float/bool/datetime/date/time/bytes/None): the value to format
+
+    Returns:
+        str: the formatted value
+    """
+    if value is None:
+        return COPY_NULL
+    if type(value) == bool:
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    return str(value).translate(COPY_ESCAPES)
+
+
+class CopyBuffer:
+    def __init__(self, rows, encoding='utf-8'):
+        """
+        A read only file like object that formats the rows as they are read, so we can send any iterable of rows
+        to the `COPY` command without holding all of them in memory.
+
+        Args:
+            rows (iterable): each row is a list or tuple of values
+            encoding (str, optional): the encoding of the connection. Defaults to 'utf-8'
+        """
+        self.__rows = iter(rows)
+        self.__buffer = b''
+        self.encoding = encoding
+        self.rows = 0
+        self.bytes = 0
+
+    def __format_row(self, row):
+        return (COPY_COLUMN_SEPARATOR.join([format_copy_value(value) for value in row]) + COPY_ROW_SEPARATOR).encode(self.encoding)
+
+    def read(self, size=-1):
+        chunks = [self.__buffer]
+        length = len(self.__buffer)
+        while size < 0 or length < size:
+            try:
+                row = next(self.__rows)
+            except StopIteration:
+                break
+            chunk = self.__format_row(row)
+            chunks.append(chunk)
+            length += len(chunk)
+            self.rows += 1
+
+        data = b''.join(chunks)
+        if size >= 0:
+            data, self.__buffer = data[:size], data[size:]
+        else:
+            self.__buffer = b''
+        self.bytes += len(data)
+        return data
+
+
+class CopyWriter:
+    def __init__(self, fileobj, chunk_size=65536, encoding='utf-8'):
+        """
+        A write only file like object that receives the data of a `COPY ... TO STDOUT` and writes it to `fileobj`
+        in chunks of `chunk_size` bytes, the database sends one small write for each row and compressed writers or
+        pipes are much faster with bigger writes.
+
+        Args:
+            fileobj (file): any object with a `write(data)` method, files opened in text mode receive strings
+            chunk_size (int, optional): number of bytes written to the file at once. Defaults to 65536
+            encoding (str, optional): the encoding of the connection. Defaults to 'utf-8'
+        """
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        # a chunk can end in the middle of a character, so text files use an incremental decoder
+        self.__decoder = codecs.getincrementaldecoder(encoding)() if isinstance(fileobj, io.TextIOBase) else None
+        self.__chunks = []
+        self.__length = 0
+        self.bytes = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        self.__chunks.append(bytes(data))
+        self.__length += len(data)
+        self.bytes += len(data)
+        if self.__length >= self.chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.__chunks:
+            data = b''.join(self.__chunks)
+            self.__chunks = []
+            self.__length = 0
+            self.fileobj.write(data if self.__decoder is None else self.__decoder.decode(data))
@@ -1,10 +1,85 @@
 import psycopg2
+import psycopg2.extensions
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import re
+import threading
+import time
+import uuid
+
+from .pool import ConnectionPool
+from .instrumentation import Instrumentation, estimate_size
+from .catalog import Catalog
+from .result_cache import ResultCache
+
+
+PREPARE_FORMAT = 'PREPARE {name} AS {query}'
+EXECUTE_FORMAT = 'EXECUTE {name}'
+EXECUTE_WITH_PARAMS_FORMAT = 'EXECUTE {name} ({params})'
+DEALLOCATE_FORMAT = 'DEALLOCATE {name}'
+SAVEPOINT_FORMAT = 'SAVEPOINT {name}'
+RELEASE_SAVEPOINT_FORMAT = 'RELEASE SAVEPOINT {name}'
+ROLLBACK_TO_SAVEPOINT_FORMAT = 'ROLLBACK TO SAVEPOINT {name}'
+SAVEPOINT_NAME_FORMAT = 'pyquery_savepoint_{}'
+PREPARED_STATEMENT_NAME_FORMAT = 'pyquery_{}'
+PLACEHOLDER_REGEX = re.compile(r'%(s|%)')
+
+
+def numbered_placeholders(query):
+    """
+    Converts the `%s` placeholders used by psycopg2 to the `$1`, `$2` placeholders used by the server
+
+    Args:
+        query (str): the query with `%s` placeholders
+
+    Returns:
+        tuple: the query with numbered placeholders and the number of placeholders
+    """
+    counter = [0]
+    def replace(match):
+        if match.group(1) == '%':
+            return '%'
+        counter[0] += 1
+        return '${}'.format(counter[0])
+    return PLACEHOLDER_REGEX.sub(replace, query), counter[0]
+
+
+class PostgresConnection(psycopg2.extensions.connection):
+    """
+    A psycopg2 connection that remembers the statements it has prepared, prepared statements only exist in the
+    session that created them.
+    """
+    def __init__(self, *args, **kwargs):
+        super(PostgresConnection, self).__init__(*args, **kwargs)
+        self.prepared_statements = OrderedDict()
 
 
 class Engine:
-    def __init__(self):
-        self.connection = None
-    
+    # async engines return awaitables from `fetch`, `stream` and the other methods that hit the database
+    is_async = False
+    # exceptions raised when the database can't be reached, a replica that raises one of them is ejected
+    connection_errors = ()
+
+    def __init__(self, instrumentation=None, catalog_ttl=300, result_cache=None):
+        # each thread holds its own connection so the same engine can be shared between threads
+        self._local = threading.local()
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        self.catalog = Catalog(self, ttl=catalog_ttl)
+        self.result_cache = None
+        if isinstance(result_cache, ResultCache):
+            self.result_cache = result_cache
+        elif result_cache:
+            self.result_cache = ResultCache(**(result_cache if isinstance(result_cache, dict) else dict()))
+
+    @property
+    def connection(self):
+        return getattr(self._local, 'connection', None)
+
+    @connection.setter
+    def connection(self, connection):
+        self._local.connection = connection
+
     def validate_not_connected(self):
         if self.connection != None:
             raise AssertionError('Database connected, use `{}` method to close the connection to your databse'.format('.close()'))
@@ -12,7 +87,7 @@ class Engine:
     def validate_connected(self):
         if self.connection == None:
             raise AssertionError('Database not connected, use `{}` method to connect to your databse'.format('.connect()') )
-    
+
     def connect(self):
         pass
 
@@ -28,52 +103,471 @@ class Engine:
     def commit(self):
         pass
 
+    def rollback(self):
+        pass
+
+    def write(self):
+        pass
+
+    def transaction(self):
+        pass
+
+    @property
+    def in_transaction(self):
+        return False
+
+    def _pending_invalidations(self):
+        """
+        Returns:
+            set: the tables written in the current transaction, None outside of a transaction
+        """
+        return None
+
+    def invalidate_result_cache(self, *tables):
+        """
+        Invalidates the cached results of the tables after a write. Inside a transaction the invalidation waits until
+        the transaction ends, otherwise other threads could cache the rows from before the commit again.
+        """
+        if self.result_cache is None:
+            return
+        pending_invalidations = self._pending_invalidations()
+        if pending_invalidations is None:
+            self.result_cache.invalidate(*tables)
+        else:
+            pending_invalidations.update(tables)
+
+    def is_connection_error(self, error):
+        """
+        Returns:
+            bool: True when the error means the database can't be reached, not that the query itself failed
+        """
+        return isinstance(error, self.connection_errors)
+
+    def reader(self, using=None):
+        """
+        The engine that runs the SELECT queries, engines without replicas run them in the same engine.
+
+        Args:
+            using (str, optional): `primary`, `replica` or the name of a replica. Defaults to None
+        """
+        if using not in (None, 'primary', 'replica'):
+            raise KeyError('Replica `{}` not found, this connection has no replicas'.format(using))
+        return self
+
+    def dispose(self):
+        pass
+
+
 class Postgres(Engine):
-    def __init__(self, port, host, database, user, password):
+    connection_errors = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    def __init__(self, port, host, database, user, password, pool=None, prepare=False, max_prepared_statements=256, 
+                 instrumentation=None, catalog_ttl=300, result_cache=None):
+        """
+        Args:
+            pool (bool/dict, optional): When set, connections are borrowed from a pool instead of being opened and
+            closed on each query. Use True for the default options or a dict with any of the following keys:
+            `min_size`, `max_size`, `idle_timeout`, `timeout`, `health_check`, `health_check_after`. Defaults to None
+            prepare (bool, optional): `PREPARE` each query with values once per connection and `EXECUTE` it after,
+            so the server doesn't need to plan it again. Works best with `pool`. Defaults to False
+            max_prepared_statements (int, optional): maximum number of prepared statements kept in each connection,
+            the least recently used are deallocated. Defaults to 256
+            instrumentation (Instrumentation, optional): collects the timing of each statement, when not set we 
+            create one with the default options. Defaults to None
+            catalog_ttl (int, optional): seconds until the columns and foreign keys of the tables are loaded again,
+            None to never load them again. Defaults to 300
+            result_cache (bool/dict/ResultCache, optional): caches the results of the queries that use `.cache()`.
+            Use True for the default options or a dict with `backend`, `maxsize` and `ttl` keys. Defaults to None
+        """
         self.port = port
         self.host = host
         self.database = database
         self.user = user
         self.password = password
-        super(Postgres, self).__init__()
+        self.prepare = prepare
+        self.max_prepared_statements = max_prepared_statements
+        self.pool = None
+        if pool:
+            pool_options = dict(pool) if isinstance(pool, dict) else dict()
+            health_check = pool_options.pop('health_check', True)
+            self.pool = ConnectionPool(
+                self.__new_connection,
+                is_healthy=self.__is_healthy if health_check else self.__is_open,
+                reset=self.__reset,
+                **pool_options
+            )
+        super(Postgres, self).__init__(
+            instrumentation=instrumentation, catalog_ttl=catalog_ttl, result_cache=result_cache
+        )
 
-    def connect(self):
-        #self.validate_not_connected()
+    def is_connection_error(self, error):
+        """
+        `OperationalError` also covers errors of the query, like a statement timeout or a conflict with recovery on a 
+        replica. These come from the server with a `pgcode`, errors of a lost or refused connection never have one.
+        """
+        if isinstance(error, psycopg2.InterfaceError):
+            return True
+        return isinstance(error, psycopg2.OperationalError) and error.pgcode is None
 
-        self.connection = psycopg2.connect(
+    def __new_connection(self):
+        return psycopg2.connect(
             port=self.port,
-            host=self.host, 
+            host=self.host,
             database=self.database,
-            user=self.user, 
-            password=self.password
+            user=self.user,
+            password=self.password,
+            connection_factory=PostgresConnection
         )
+
+    def __is_open(self, connection):
+        return not connection.closed
+
+    def __is_healthy(self, connection):
+        if connection.closed:
+            return False
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def __reset(self, connection):
+        """
+        Connections must be given back to the pool without any open transaction
+        """
+        if connection.closed:
+            raise psycopg2.InterfaceError('connection already closed')
+        status = connection.get_transaction_status()
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            raise psycopg2.InterfaceError('connection is broken')
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+
+    def _acquire(self):
+        """
+        Retrieves a connection, from the pool if we are using one. Inside a transaction this is always the
+        connection of the transaction.
+        """
+        transaction_connection = getattr(self._local, 'transaction_connection', None)
+        if transaction_connection is not None:
+            return transaction_connection
+        return self.__open()
+
+    def __open(self):
+        if self.pool:
+            return self.pool.get()
+        return self.__new_connection()
+
+    def _release(self, connection):
+        """
+        Gives the connection back to the pool, or closes it if we are not using a pool. The connection of a 
+        transaction is only released when the transaction ends.
+        """
+        if connection is getattr(self._local, 'transaction_connection', None):
+            return
+        self.__close(connection)
+
+    def __close(self, connection):
+        if self.pool:
+            if connection.closed:
+                self.pool.discard(connection)
+            else:
+                self.pool.put(connection)
+        else:
+            connection.close()
+
+    def connect(self):
+        #self.validate_not_connected()
+
+        start = time.perf_counter()
+        self.connection = self._acquire()
+        self._local.connect_time = time.perf_counter() - start
         return self.connection
-    
+
     def close(self):
         self.validate_connected()
-        self.connection.close()
+        connection = self.connection
+        self.connection = None
+        self._release(connection)
         return True
-    
-    def execute(self, query):
-        self.validate_connected()
+
+    def __prepared(self, cursor, query, params):
+        """
+        Prepares the query in the current connection if it was not prepared yet and returns the EXECUTE statement
+        that runs it.
+        """
+        prepared_statements = self.connection.prepared_statements
+        name = PREPARED_STATEMENT_NAME_FORMAT.format(hashlib.md5(query.encode('utf-8')).hexdigest())
+        if name in prepared_statements:
+            prepared_statements.move_to_end(name)
+            number_of_params = prepared_statements[name]
+        else:
+            if len(prepared_statements) >= self.max_prepared_statements:
+                oldest_name, __ = prepared_statements.popitem(last=False)
+                cursor.execute(DEALLOCATE_FORMAT.format(name=oldest_name))
+            server_query, number_of_params = numbered_placeholders(query)
+            cursor.execute(PREPARE_FORMAT.format(name=name, query=server_query))
+            prepared_statements[name] = number_of_params
+
+        if number_of_params:
+            return EXECUTE_WITH_PARAMS_FORMAT.format(name=name, params=', '.join(['%s'] * number_of_params))
+        return EXECUTE_FORMAT.format(name=name)
+
+    def __execute(self, query, params):
         cursor = self.connection.cursor()
-        cursor.execute(query)
+        if self.prepare and params is not None:
+            cursor.execute(self.__prepared(cursor, query, params), params)
+        else:
+            cursor.execute(query, params)
         return cursor
 
-    def fetch(self, query):
+    def execute(self, query, params=None):
+        self.validate_connected()
+        with self.instrumentation.measure(query, params, getattr(self._local, 'connect_time', None)) as event:
+            cursor = self.__execute(query, params)
+            event['rows'] = cursor.rowcount
+        return cursor
+
+    def fetch(self, query, params=None, with_description=False):
+        """
+        Args:
+            with_description (bool, optional): returns a tuple of (description, rows) instead, the description has 
+            a (name, type oid) for each column. Defaults to False
+
+        Returns:
+            list: the rows of the query
+        """
         self.connect()
-        cursor = self.execute(query)
-        result = cursor.fetchall()
-        self.close()
-        return result
-    
+        try:
+            with self.instrumentation.measure(query, params, self._local.connect_time) as event:
+                cursor = self.__execute(query, params)
+                result = cursor.fetchall()
+                event['rows'] = len(result)
+                if self.instrumentation.measure_bytes:
+                    event['bytes'] = estimate_size(result)
+        finally:
+            self.close()
+        return (self.__description(cursor), result) if with_description else result
+
+    def stream(self, query, params=None, chunk_size=2000, with_description=False):
+        """
+        Runs the query with a server side cursor and yields the results in batches, so we never hold more than
+        `chunk_size` rows in memory. The connection is retrieved when the iteration starts and released when
+        the generator is exhausted or closed.
+
+        Args:
+            query (str): the SELECT statement
+            params (tuple, optional): the value of each placeholder of the query. Defaults to None
+            chunk_size (int, optional): number of rows retrieved on each round trip. Defaults to 2000
+            with_description (bool, optional): yields a tuple of (description, rows) instead, the description has a
+            (name, type oid) for each column. A query without results yields the description once with no rows.
+            Defaults to False
+
+        Yields:
+            list: a list with at most `chunk_size` rows
+        """
+        start = time.perf_counter()
+        connection = self._acquire()
+        connect_time = time.perf_counter() - start
+        try:
+            # the duration of streamed queries also includes the time spent by the consumer of the rows
+            with self.instrumentation.measure(query, params, connect_time) as event:
+                cursor = connection.cursor(name='pyquery_{}'.format(uuid.uuid4().hex))
+                cursor.itersize = chunk_size
+                cursor.execute(query, params)
+                event['rows'] = 0
+                try:
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        event['rows'] += len(rows)
+                        if self.instrumentation.measure_bytes:
+                            event['bytes'] = (event['bytes'] or 0) + estimate_size(rows)
+                        yield (self.__description(cursor), rows) if with_description else rows
+                    if with_description and event['rows'] == 0:
+                        yield self.__description(cursor), []
+                finally:
+                    try:
+                        cursor.close()
+                    except psycopg2.Error:
+                        pass
+        finally:
+            self._release(connection)
+
+    def __description(self, cursor):
+        # the description of named cursors only exists after the first fetch
+        return [(column[0], column[1]) for column in cursor.description or ()]
+
+    def copy_from(self, query, fileobj, size=8192):
+        """
+        Runs a `COPY ... FROM STDIN` statement reading the data from a file like object and commits it.
+
+        Args:
+            query (str): the COPY statement
+            fileobj (file): any object with a `read(size)` method
+            size (int, optional): number of bytes read from the file on each iteration. Defaults to 8192
+
+        Returns:
+            int: number of rows copied
+        """
+        self.connect()
+        try:
+            with self.instrumentation.measure(query, None, self._local.connect_time) as event:
+                cursor = self.connection.cursor()
+                cursor.copy_expert(query, fileobj, size)
+                event['rows'] = cursor.rowcount
+        except Exception:
+            self.rollback()
+            raise
+        self.commit()
+        return cursor.rowcount
+
+    def copy_to(self, query, params, fileobj):
+        """
+        Runs a `COPY ... TO STDOUT` statement writing the data to a file like object. COPY doesn't accept params, so
+        they are bound by psycopg2 before sending the statement.
+
+        Args:
+            query (str): the COPY statement
+            params (tuple): the value of each placeholder of the query
+            fileobj (file): any object with a `write(data)` method
+
+        Returns:
+            int: number of rows copied
+        """
+        self.connect()
+        try:
+            with self.instrumentation.measure(query, params, self._local.connect_time) as event:
+                cursor = self.connection.cursor()
+                cursor.copy_expert(cursor.mogrify(query, params), fileobj)
+                event['rows'] = cursor.rowcount
+        finally:
+            self.close()
+        return cursor.rowcount
+
     def commit(self):
+        """
+        Commits and closes the connection, inside a transaction the commit only happens when the transaction ends.
+        """
         self.validate_connected()
-        self.connection.commit()
-        self.close()
+        try:
+            if not self.in_transaction:
+                self.connection.commit()
+        finally:
+            self.close()
         return True
 
-    def save(self, query):
+    def rollback(self):
+        """
+        Rolls back and closes the connection, inside a transaction the rollback is made by the transaction when
+        the exception reaches it.
+        """
+        self.validate_connected()
+        try:
+            if not self.in_transaction:
+                self.connection.rollback()
+        except psycopg2.Error:
+            pass
+        finally:
+            self.close()
+        return True
+
+    @property
+    def in_transaction(self):
+        return getattr(self._local, 'transaction_connection', None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs everything inside the `with` block in a single connection and a single transaction, committing
+        once at the end or rolling back if an exception is raised. Nested transactions use savepoints, so
+        only the nested block is rolled back.
+
+        >>> with engine.transaction():
+                connection.query('form_value').insert(id=1)
+                connection.query('form_value').bulk_insert([[2], [3]], column_names=['id'])
+        """
+        connection = getattr(self._local, 'transaction_connection', None)
+        if connection is not None:
+            self._local.savepoints += 1
+            name = SAVEPOINT_NAME_FORMAT.format(self._local.savepoints)
+            cursor = connection.cursor()
+            cursor.execute(SAVEPOINT_FORMAT.format(name=name))
+            try:
+                yield connection
+            except BaseException:
+                cursor.execute(ROLLBACK_TO_SAVEPOINT_FORMAT.format(name=name))
+                raise
+            else:
+                cursor.execute(RELEASE_SAVEPOINT_FORMAT.format(name=name))
+            finally:
+                self._local.savepoints -= 1
+            return
+
+        connection = self.__open()
+        self._local.transaction_connection = connection
+        self._local.savepoints = 0
+        self._local.pending_invalidations = set()
+        try:
+            yield connection
+        except BaseException:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                pass
+            raise
+        else:
+            connection.commit()
+        finally:
+            self._local.transaction_connection = None
+            pending_invalidations, self._local.pending_invalidations = self._local.pending_invalidations, None
+            self.__close(connection)
+            # after a commit or a rollback, so nobody caches the rows of the transaction or the ones before it
+            if pending_invalidations:
+                self.invalidate_result_cache(*pending_invalidations)
+
+    def _pending_invalidations(self):
+        return getattr(self._local, 'pending_invalidations', None)
+
+    def write(self, statements):
+        """
+        Runs each statement in the same connection and commits once at the end
+
+        Args:
+            statements (iterable): tuples of (query, params)
+
+        Returns:
+            int: number of rows affected by all of the statements
+        """
+        self.connect()
+        rows = 0
+        try:
+            for query, params in statements:
+                cursor = self.execute(query, params)
+                rows += max(cursor.rowcount, 0)
+        except Exception:
+            self.rollback()
+            raise
+        self.commit()
+        return rows
+
+    def save(self, query, params=None):
         self.connect()
-        self.execute(query)
-        return self.commit()
\ No newline at end of file
+        try:
+            self.execute(query, params)
+        except Exception:
+            self.rollback()
+            raise
+        return self.commit()
+
+    def dispose(self):
+        """
+        Closes all of the idle connections of the pool, if we are using one.
+        """
+        if self.pool:
+            self.pool.close()
+        return True
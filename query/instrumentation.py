@@ -0,0 +1,220 @@
+from collections import deque
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from .cache import LRUCache
+
+
+slow_query_logger = logging.getLogger('query.slow')
+
+# the recent and slow queries keep only a short text of the params, so they never hold big payloads like bulk inserts
+RECORDED_PARAMS_ITEMS = 10
+RECORDED_PARAMS_LENGTH = 200
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest rank percentile of a sorted list
+
+    Args:
+        sorted_values (list): the values sorted in ascending order
+        percent (int): the percentile, from 0 to 100
+
+    Returns:
+        float: the value of the percentile or None if the list is empty
+    """
+    if not sorted_values:
+        return None
+    index = max(int(round(percent / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def estimate_size(rows):
+    """
+    Estimates the number of bytes of the rows retrieved from the database, strings and bytes count their length
+    and any other value the length of its text representation.
+    """
+    size = 0
+    for row in rows:
+        for value in (row if isinstance(row, (list, tuple)) else (row,)):
+            if value is None:
+                continue
+            if isinstance(value, (str, bytes, bytearray, memoryview)):
+                size += len(value)
+            else:
+                size += len(str(value))
+    return size
+
+
+def summarize_params(params):
+    """
+    Returns:
+        str: the text of the first params, truncated to `RECORDED_PARAMS_LENGTH` characters, None without params
+    """
+    if params is None:
+        return None
+    if isinstance(params, (list, tuple)) and len(params) > RECORDED_PARAMS_ITEMS:
+        text = '{} ... {} params'.format(repr(tuple(params[:RECORDED_PARAMS_ITEMS])), len(params))
+    else:
+        text = repr(params)
+    if len(text) > RECORDED_PARAMS_LENGTH:
+        text = text[:RECORDED_PARAMS_LENGTH] + '...'
+    return text
+
+
+class Instrumentation:
+    def __init__(self, enabled=True, slow_query_threshold=None, recent_queries_size=100, latencies_size=500, 
+                 measure_bytes=False, shapes_size=512, record_params=False):
+        """
+        Collects the timing of every statement that runs in an engine. You can access it with `conn.instrumentation`.
+
+        Each statement produces an event, a dict with the following keys:
+            `query`: the SQL with placeholders
+            `params`: the value of each placeholder
+            `duration`: the wall time in seconds, from sending the statement to reading all of the rows
+            `connect_time`: seconds it took to open or check out the connection from the pool
+            `rows`: number of rows fetched or affected
+            `bytes`: estimated size of the rows fetched, only when `measure_bytes` is True
+            `error`: the exception raised, if any
+
+        Args:
+            enabled (bool, optional): set to False to skip all of the instrumentation. Defaults to True
+            slow_query_threshold (float, optional): statements slower than this number of seconds are logged in
+            the `query.slow` logger and kept in `slow_queries`. Defaults to None
+            recent_queries_size (int, optional): number of events kept in `recent_queries` and in `slow_queries`.
+            Defaults to 100
+            latencies_size (int, optional): number of latencies kept for each query shape to calculate the
+            percentiles. Defaults to 500
+            measure_bytes (bool, optional): estimates the size of the fetched rows, this needs to go through every
+            value so it is disabled by default. Defaults to False
+            shapes_size (int, optional): number of query shapes kept in `stats()`, the least recently used are 
+            dropped. Defaults to 512
+            record_params (bool, optional): keeps the params of the events in `recent_queries` and `slow_queries`,
+            by default they only keep a short text of the params. The callbacks always receive the params. 
+            Defaults to False
+        """
+        self.enabled = enabled
+        self.slow_query_threshold = slow_query_threshold
+        self.latencies_size = latencies_size
+        self.measure_bytes = measure_bytes
+        self.record_params = record_params
+        self.pre_execute_callbacks = []
+        self.post_execute_callbacks = []
+        self.recent_queries = deque(maxlen=recent_queries_size)
+        self.slow_queries = deque(maxlen=recent_queries_size)
+        self.__lock = threading.Lock()
+        self.__shapes = LRUCache(maxsize=shapes_size)
+        self.compile_count = 0
+        self.compile_time = 0.0
+
+    def on_pre_execute(self, callback):
+        """
+        Adds a function that is called before each statement with the `query` and the `params`
+        """
+        self.pre_execute_callbacks.append(callback)
+        return callback
+
+    def on_post_execute(self, callback):
+        """
+        Adds a function that is called after each statement with the event dict
+        """
+        self.post_execute_callbacks.append(callback)
+        return callback
+
+    def record_compile(self, seconds):
+        if self.enabled:
+            with self.__lock:
+                self.compile_count += 1
+                self.compile_time += seconds
+
+    @contextmanager
+    def measure(self, query, params=None, connect_time=None):
+        """
+        Measures the statement that runs inside the `with` block, set `rows` in the yielded event dict.
+
+        >>> with instrumentation.measure(query, params) as event:
+                cursor.execute(query, params)
+                event['rows'] = cursor.rowcount
+        """
+        event = {
+            'query': query,
+            'params': params,
+            'duration': None,
+            'connect_time': connect_time,
+            'rows': None,
+            'bytes': None,
+            'error': None
+        }
+        if not self.enabled:
+            yield event
+            return
+
+        for callback in self.pre_execute_callbacks:
+            callback(query, params)
+        start = time.perf_counter()
+        try:
+            yield event
+        except Exception as exception:
+            event['error'] = exception
+            raise
+        finally:
+            event['duration'] = time.perf_counter() - start
+            self.record(event)
+
+    def record(self, event):
+        recorded_event = event if self.record_params else dict(event, params=summarize_params(event['params']))
+        with self.__lock:
+            self.recent_queries.append(recorded_event)
+            shape = self.__shapes.get(event['query'])
+            if shape is None:
+                shape = {
+                    'count': 0,
+                    'errors': 0,
+                    'rows': 0,
+                    'total_time': 0.0,
+                    'latencies': deque(maxlen=self.latencies_size)
+                }
+                self.__shapes.set(event['query'], shape)
+            shape['count'] += 1
+            shape['errors'] += 1 if event['error'] else 0
+            shape['rows'] += event['rows'] if event['rows'] and event['rows'] > 0 else 0
+            shape['total_time'] += event['duration']
+            shape['latencies'].append(event['duration'])
+
+        if self.slow_query_threshold is not None and event['duration'] >= self.slow_query_threshold:
+            self.slow_queries.append(recorded_event)
+            slow_query_logger.warning('Slow query (%.3fs): %s', event['duration'], event['query'])
+
+        for callback in self.post_execute_callbacks:
+            callback(event)
+
+    def stats(self):
+        """
+        Aggregated counters of each query shape, the shape is the SQL with placeholders so the same query with
+        different values is counted together. Only the `shapes_size` most recently used shapes are kept.
+
+        Returns:
+            dict: for each query a dict with `count`, `errors`, `rows`, `total_time`, `p50` and `p95` latencies
+        """
+        with self.__lock:
+            shapes = dict(
+                (query, dict(shape, latencies=sorted(shape['latencies']))) for query, shape in self.__shapes.items()
+            )
+            compile_stats = {'count': self.compile_count, 'total_time': self.compile_time}
+        result = {}
+        for query, shape in shapes.items():
+            latencies = shape.pop('latencies')
+            shape['p50'] = percentile(latencies, 50)
+            shape['p95'] = percentile(latencies, 95)
+            result[query] = shape
+        return {'queries': result, 'compile': compile_stats}
+
+    def reset(self):
+        with self.__lock:
+            self.__shapes.clear()
+            self.recent_queries.clear()
+            self.slow_queries.clear()
+            self.compile_count = 0
+            self.compile_time = 0.0
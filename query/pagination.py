@@ -0,0 +1,87 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+import base64
+import json
+
+
+# values that json can't represent are kept as [type, text]
+CURSOR_TYPES = {
+    'datetime': (datetime, datetime.isoformat, datetime.fromisoformat),
+    'date': (date, date.isoformat, date.fromisoformat),
+    'time': (time, time.isoformat, time.fromisoformat),
+    'decimal': (Decimal, str, Decimal),
+    'uuid': (UUID, str, UUID)
+}
+
+
+def encode_cursor(values):
+    """
+    Encodes the values of the last row of a page as an url safe string. It is json and not pickle, so decoding a
+    cursor sent by a client never runs any code.
+
+    Args:
+        values (tuple): the value of each pagination field
+
+    Returns:
+        str: the cursor
+    """
+    encoded_values = []
+    for value in values:
+        for type_name, (value_type, to_string, __) in CURSOR_TYPES.items():
+            # datetime is a subclass of date, so it is checked first
+            if isinstance(value, value_type):
+                value = [type_name, to_string(value)]
+                break
+        encoded_values.append(value)
+    return base64.urlsafe_b64encode(json.dumps(encoded_values, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: the values encoded in the cursor
+
+    Raises:
+        ValueError: the cursor is not valid
+    """
+    try:
+        encoded_values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        values = []
+        for value in encoded_values:
+            if isinstance(value, list):
+                type_name, text = value
+                value = CURSOR_TYPES[type_name][2](text)
+            values.append(value)
+    except (TypeError, ValueError, KeyError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    return tuple(values)
+
+
+class Page:
+    def __init__(self, rows, cursor):
+        """
+        A page of the results, use `cursor` to retrieve the next page.
+
+        Args:
+            rows (list): the rows of the page
+            cursor (str): the cursor of the next page, None if this is the last page
+        """
+        self.rows = rows
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.cursor is not None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, k):
+        return self.rows[k]
+
+    def __repr__(self):
+        return '<Page: {} rows, cursor={}>'.format(len(self.rows), self.cursor)
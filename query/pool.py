@@ -0,0 +1,199 @@
+from collections import deque
+import os
+import threading
+import time
+
+
+# connections inherited from the parent process after a fork. They are kept referenced and never closed: freeing a
+# psycopg2 connection sends a Terminate message over the socket it shares with the parent and ends the parent's session
+inherited_connections = []
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, is_healthy=None, reset=None, min_size=1, max_size=10, idle_timeout=300, timeout=30,
+                 health_check_after=30):
+        """
+        A thread safe pool of database connections, connections are borrowed with `.get()` and MUST be given back
+        with `.put()` so other threads can reuse the same socket instead of opening a new one.
+
+        The pool is also safe to use after `os.fork()`, the child process never reuses nor closes the connections
+        opened by the parent, it moves them to `inherited_connections`, so they are never freed, and starts a fresh 
+        pool.
+
+        Args:
+            connect (function): function with no arguments that opens and returns a new connection
+            is_healthy (function, optional): receives a connection and returns True if it can be reused, this is
+            called when a connection idle for more than `health_check_after` seconds is borrowed. Defaults to None
+            reset (function, optional): receives a connection when it is given back so it can be cleaned (like
+            rolling back open transactions). Defaults to None
+            min_size (int, optional): Number of idle connections we keep even after `idle_timeout`. Defaults to 1
+            max_size (int, optional): Maximum number of connections opened at the same time. Defaults to 10
+            idle_timeout (int, optional): Seconds an idle connection can stay in the pool before being closed.
+            Defaults to 300
+            timeout (int, optional): Seconds to wait for a free connection when the pool is exhausted. Defaults to 30
+            health_check_after (int, optional): Seconds a connection must be idle before `is_healthy` is called on
+            checkout, connections used moments ago are reused without a round trip. Defaults to 30
+        """
+        if min_size > max_size:
+            raise ValueError('`min_size` must be lower or equal to `max_size`')
+        self._connect = connect
+        self._is_healthy = is_healthy
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.__start()
+
+    def __start(self):
+        self._pid = os.getpid()
+        self._lock = threading.Condition()
+        # each item is a tuple of (connection, time it was given back), most recent connections on the right
+        self._idle = deque()
+        self._size = 0
+        # ids of the connections opened by this process, connections borrowed before a fork are not in it
+        self._owned = set()
+
+    def __check_fork(self):
+        """
+        Connections can't be shared between processes, when we are in a forked child we move every connection
+        of the parent to `inherited_connections` without closing it, closing or freeing it would terminate the 
+        session of the parent.
+        """
+        if self._pid != os.getpid():
+            inherited_connections.extend(connection for connection, __ in self._idle)
+            self.__start()
+
+    def __prune(self):
+        """
+        Removes the connections that were idle for more than `idle_timeout`, always keeping `min_size` of them.
+        MUST be called while holding the lock.
+
+        Returns:
+            list: the connections that must be closed.
+        """
+        expired = []
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            connection, __ = self._idle.popleft()
+            expired.append(connection)
+            self._owned.discard(id(connection))
+            self._size -= 1
+        return expired
+
+    def __close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def __discard(self, connection):
+        self.__close(connection)
+        with self._lock:
+            self._owned.discard(id(connection))
+            self._size -= 1
+            self._lock.notify()
+
+    def __is_inherited(self, connection):
+        """
+        Returns True, and keeps the connection referenced, when it was opened by the parent process
+        """
+        self.__check_fork()
+        if id(connection) in self._owned:
+            return False
+        inherited_connections.append(connection)
+        return True
+
+    def get(self):
+        """
+        Borrows a connection from the pool, opens a new one if there is no idle connection and the pool is not full
+
+        Raises:
+            PoolTimeout: when no connection was given back in `timeout` seconds
+
+        Returns:
+            connection: a connection ready to use
+        """
+        self.__check_fork()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = None
+            idle_since = None
+            with self._lock:
+                expired = self.__prune()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout('No connection available in the pool after {} seconds'.format(self.timeout))
+                    self._lock.wait(remaining)
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                else:
+                    self._size += 1
+            for expired_connection in expired:
+                self.__close(expired_connection)
+
+            if connection is None:
+                try:
+                    connection = self._connect()
+                    with self._lock:
+                        self._owned.add(id(connection))
+                    return connection
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+
+            if (
+                self._is_healthy is None or 
+                time.monotonic() - idle_since <= self.health_check_after or 
+                self._is_healthy(connection)
+            ):
+                return connection
+            self.__discard(connection)
+
+    def put(self, connection):
+        """
+        Gives a connection back to the pool so it can be reused.
+
+        Args:
+            connection (connection): a connection retrieved with `.get()`
+        """
+        if self.__is_inherited(connection):
+            return
+        try:
+            if self._reset:
+                self._reset(connection)
+        except Exception:
+            self.__discard(connection)
+            return
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    def discard(self, connection):
+        """
+        Closes a borrowed connection instead of giving it back, use it when the connection is broken.
+        """
+        if self.__is_inherited(connection):
+            return
+        self.__discard(connection)
+
+    def close(self):
+        """
+        Closes every idle connection of the pool, connections borrowed at this moment are not affected.
+        """
+        self.__check_fork()
+        with self._lock:
+            idle = [connection for connection, __ in self._idle]
+            self._idle.clear()
+            self._owned.difference_update(id(connection) for connection in idle)
+            self._size -= len(idle)
+        for connection in idle:
+            self.__close(connection)
@@ -2,24 +2,79 @@ from .settings import (
     WHERE_SPECIAL_ARGUMENTS, AUTOMATIC_JOINS_PLACEHOLDER, 
     FIELD_FORMAT, SELECT_FORMAT, JOIN_CLAUSE_FORMAT, WHERE_CLAUSE_FORMAT, WHERE_AND_CONNECTOR_FORMAT,
     WHERE_EQUAL_OPERATION_FORMAT, ORDER_BY_CLAUSE_FORMAT, ORDER_BY_ASC_FORMAT, ORDER_BY_DESC_FORMAT,
-    LIMIT_FORMAT,VALUE_STRING_FORMAT, VALUE_LIST_FORMAT, VALUE_TUPLE_FORMAT, VALUE_NULL_FORMAT, VALUE_DATETIME_FORMAT,
-    VALUE_SINGLE_QUOTE_FORMAT, DISTINCT_CLAUSE_FORMAT, FIELD_OR_TABLES_FORMAT
+    LIMIT_FORMAT, OFFSET_FORMAT, EXISTS_SELECT_FORMAT, COUNT_SELECT_FORMAT, SUBQUERY_FORMAT, VALUE_LIST_FORMAT, 
+    VALUE_PLACEHOLDER_FORMAT, VALUE_SUBQUERY_FORMAT, SUBQUERY_DEFAULT_FIELD, DISTINCT_CLAUSE_FORMAT, FIELD_OR_TABLES_FORMAT, COPY_FROM_FORMAT, COPY_BUFFER_SIZE,
+    TABLE_ALIAS_FORMAT, MAXIMUM_IDENTIFIER_LENGTH, TABLE_ALIAS_DIGEST_LENGTH, FIELDS_CACHE_SIZE, 
+    MAXIMUM_ROWS_PER_STATEMENT, UPDATE_FORMAT, SET_FORMAT, DELETE_FORMAT, WHERE_IN_SUBQUERY_FORMAT, 
+    BULK_UPDATE_FORMAT, BULK_UPDATE_ALIAS, BULK_UPDATE_VALUES_FORMAT, UPSERT_FORMAT, UPSERT_UPDATE_FORMAT, 
+    UPSERT_NOTHING_FORMAT, EXCLUDED_FIELD_FORMAT, JOIN_FROM_COLUMN_FORMAT, JOIN_TO_COLUMN, 
+    PARTITION_BOUNDS_SELECT_FORMAT, PARTITION_CONDITION_FORMAT, PARTITION_LAST_CONDITION_FORMAT, 
+    PARTITION_NULL_CONDITION_FORMAT, PREFETCH_CONDITION_FORMAT, PREFETCH_RENAMED_FIELD_FORMAT, 
+    KEYSET_CONDITION_FORMAT, KEYSET_AFTER_OPERATOR, KEYSET_BEFORE_OPERATOR, KEYSET_FIELD_ALIAS_FORMAT, 
+    COPY_TO_FORMAT, COPY_TO_HEADER_OPTION, EXPORT_FORMATS, AGGREGATE_ALIAS_FORMAT, GROUP_BY_CLAUSE_FORMAT, 
+    GROUP_BY_DEFAULT_FIELD, HAVING_CLAUSE_FORMAT
 )
-
-from datetime import datetime
+from .copy_buffer import CopyBuffer, CopyWriter
+from .columnar import ColumnarBuffer
+from .rows import ROW_FORMAT_TUPLE, ROW_FORMAT_DICT, ROW_FORMATS, format_rows
+from .pagination import Page, encode_cursor, decode_cursor
+from .cache import LRUCache
+from .aggregates import Aggregate
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import asyncio
+import hashlib
 import math
-import random
+import time
+
+
+# Resolving a field like `form__depends_on__id` to its SQL and its joins only depends on the table, the join_relations
+# and the field itself, so we resolve each field once per process. Use `fields_cache.stats()` to see the hits and misses.
+fields_cache = LRUCache(maxsize=FIELDS_CACHE_SIZE)
+
+
+def freeze_join_relations(join_relations):
+    """
+    Converts the join_relations dict to a tuple so it can be used as a key of the fields cache
+
+    Args:
+        join_relations (dict): the join relations, like {'form_value': {'form': 'dynamic_forms'}}
+
+    Returns:
+        tuple: the join relations as sorted tuples
+    """
+    return tuple(sorted(
+        (table, tuple(sorted(relations.items()))) for table, relations in join_relations.items()
+    ))
 
 
 class BaseQuery:
     def __init__(self, on_table, engine):
         self.engine = engine
         self.on_table = on_table
-        # first value of the tuple is the original table name, the second, the value we are using
+        # each join path points to the table it joins: `table` is the original table name and `table_name` the 
+        # name we use in the query, for joined tables this is always an alias created from the path
         self.fields_table_relations={
-            '':dict(table_name=on_table, is_alias=False)
+            '':dict(table=on_table, table_name=on_table, is_alias=False)
         }
 
+    def _invalidate_result_cache(self, result):
+        """
+        Invalidates the cached results of the table after a write, with async engines `result` is an awaitable so 
+        we invalidate after awaiting it.
+        """
+        if self.engine.result_cache is None:
+            return result
+        if self.engine.is_async:
+            return self.__async_invalidate_result_cache(result)
+        self.engine.invalidate_result_cache(self.on_table)
+        return result
+
+    async def __async_invalidate_result_cache(self, result):
+        result = await result
+        self.engine.invalidate_result_cache(self.on_table)
+        return result
+
     def _format_db_tables_names(self, value):
         """
         A single key of fields_table_relations dict
@@ -27,38 +82,38 @@ class BaseQuery:
         Args:
             value (dict) a singe dict of the fields_table_relations dict
         """
-        if value['is_alias']:
-            return value['table_name']
-        else:
-            return self._format_field_or_tables(value['table_name'])
+        return self._format_field_or_tables(value['table_name'])
 
     def _format_field_or_tables(self, value):
         return FIELD_OR_TABLES_FORMAT.format(value)
 
-    def __create_table_name_alias(self, table_name):
+    def _create_table_name_alias(self, query_path):
         """
-        Creates a new alias for the table
+        Creates the alias of a joined table from the path of the join, so `form__depends_on` on `form_value` table
+        is always `form_value__form__depends_on`. The same query always produces the same SQL, and two paths never
+        share an alias. Aliases longer than the maximum identifier length of postgres are shortened with a digest 
+        of the path.
+
+        Args:
+            query_path (str): the join path, like `form__depends_on`
+
+        Returns:
+            str: the alias of the table
         """
-        alias = 'TA{}'.format(str(random.randint(1,100)))
-        invalid_aliases = [value['table_name'] for value in self.fields_table_relations.values()]
-        while alias in invalid_aliases:
-            alias = 'TA{}'.format(str(random.randint(1,100)))
+        alias = TABLE_ALIAS_FORMAT.format(table=self.on_table, path=query_path)
+        if len(alias.encode('utf-8')) > MAXIMUM_IDENTIFIER_LENGTH:
+            digest = hashlib.md5(alias.encode('utf-8')).hexdigest()[:TABLE_ALIAS_DIGEST_LENGTH]
+            prefix = alias.encode('utf-8')[:MAXIMUM_IDENTIFIER_LENGTH - TABLE_ALIAS_DIGEST_LENGTH - 1]
+            alias = '{}_{}'.format(prefix.decode('utf-8', 'ignore'), digest)
         return alias
 
     def _get_table_name_or_alias(self, query_path, table_name):
-        if query_path in self.fields_table_relations:
-            return self.fields_table_relations[query_path]
-
-        if table_name in [value['table_name'] for value in self.fields_table_relations.values()]:
+        if query_path not in self.fields_table_relations:
             self.fields_table_relations[query_path] = {
-                'table_name': self.__create_table_name_alias(table_name),
+                'table': table_name,
+                'table_name': self._create_table_name_alias(query_path),
                 'is_alias': True
             }
-        else:
-            self.fields_table_relations[query_path] = {
-                'table_name': table_name,
-                'is_alias': False
-            }
         return self.fields_table_relations[query_path]
         
     def __format_joins(self, joins):
@@ -101,9 +156,14 @@ class BaseQuery:
                 "form": "foo"
             }
         }   
+
+        Returns:
+            tuple: the name of the last table of the joins formatted to be used in the query and a list with a tuple 
+            of (join path, fields_table_relations value, join clause) for each join
         """
         to_table_join = self.fields_table_relations['']
         reference_string_list = list()
+        resolved_joins = list()
 
         for index, join in enumerate(joins):
             # creates a reference of the path to the fields so something like
@@ -112,33 +172,79 @@ class BaseQuery:
             reference_string = '__'.join(reference_string_list)
             from_table_join = to_table_join
             
+            from_column, to_table_join_name, to_column = self._resolve_relation(from_table_join['table'], join)
+
             # automatically creates alias
-            to_table_join_name = self.join_relations.get(from_table_join['table_name'], {}).get(join, join)
             to_table_join = self._get_table_name_or_alias(reference_string, to_table_join_name)
             
             join_clause = JOIN_CLAUSE_FORMAT.format(
-                join=join, 
+                from_column=self._format_field_or_tables(from_column),
+                to_column=self._format_field_or_tables(to_column),
                 from_table_join=self._format_db_tables_names(from_table_join),
                 to_table_join=FIELD_OR_TABLES_FORMAT.format(to_table_join_name),
                 to_table_join_name_or_alias=self._format_db_tables_names(to_table_join),
-                alias=to_table_join['table_name'] if to_table_join['is_alias'] else ''
+                alias=self._format_db_tables_names(to_table_join)
             )
 
-            if join_clause not in self.query_joins:
-                self.query_joins.append(join_clause)
-        return self._format_db_tables_names(to_table_join)
+            self._add_join(join_clause)
+            resolved_joins.append((reference_string, to_table_join, join_clause))
+        return self._format_db_tables_names(to_table_join), resolved_joins
+
+    def _resolve_relation(self, table, field):
+        """
+        Finds the table a field references. Join relations set by the user come first, then the foreign keys of the
+        catalog and at last we guess that `form` is the `form_id` column and it references the `id` of the `form` table
+
+        Args:
+            table (str): the table of the field
+            field (str): the name of the field, without the `_id` suffix
+
+        Returns:
+            tuple: (column, to_table, to_column)
+        """
+        to_table = self.join_relations.get(table, {}).get(field)
+        if to_table is None:
+            foreign_key = self.engine.catalog.foreign_key(table, field)
+            if foreign_key is not None:
+                return foreign_key
+            to_table = field
+        return JOIN_FROM_COLUMN_FORMAT.format(join=field), to_table, JOIN_TO_COLUMN
+
+    def _add_join(self, join_clause):
+        if join_clause not in self._query_joins_set:
+            self._query_joins_set.add(join_clause)
+            self.query_joins.append(join_clause)
     
     def _format_db_fields(self, value):
         """
-        Formats each database field based on a default VALUE_CLAUSE
+        Formats each database field based on a default VALUE_CLAUSE, the field and its joins are resolved only
+        once per process, after this we just reuse them from `fields_cache`. Joins depend on the foreign keys of the
+        catalog so they are cached for each version of the catalog.
         """
+        catalog_version = self.engine.catalog.refresh().version if AUTOMATIC_JOINS_PLACEHOLDER in value else None
+        cache_key = (self.on_table, self._join_relations_key, catalog_version, value)
+        resolved_field = fields_cache.get(cache_key)
+        if resolved_field is None:
+            resolved_field = self.__resolve_field(value)
+            fields_cache.set(cache_key, resolved_field)
+            return resolved_field[0]
+
+        field, resolved_joins = resolved_field
+        for query_path, table_relation, join_clause in resolved_joins:
+            if query_path not in self.fields_table_relations:
+                self.fields_table_relations[query_path] = table_relation
+            self._add_join(join_clause)
+        return field
+
+    def __resolve_field(self, value):
         table_name = self._format_db_tables_names(self.fields_table_relations[''])
+        resolved_joins = []
 
         splitted_value = value.split(AUTOMATIC_JOINS_PLACEHOLDER)
         if len(splitted_value) > 1:
             # Handle automatic join operations
             joins = splitted_value[:-1]
-            table_name = self.__format_joins(joins)
+            table_name, resolved_joins = self.__format_joins(joins)
 
         values_to_use = splitted_value[-2:]
         value = FIELD_FORMAT.format(
@@ -146,79 +252,146 @@ class BaseQuery:
             field=self._format_field_or_tables(values_to_use[-1])
         )
     
-        return value
+        return value, tuple(resolved_joins)
+
+    def format_db_values(self, value, params):
+        """
+        Values are never written in the query, instead we write a placeholder for each value and append the value
+        to `params`, the driver sends them separately. This way the same query shape always produces the same SQL.
+
+        Args:
+            value (str/int/datetime/list/tuple/Query): the value to format, lists are formatted as `(%s, %s)` and
+            tuples as `%s, %s` so a tuple of lists is formatted as `(%s, %s), (%s, %s)`. Queries are formatted as
+            subqueries `(SELECT ...)`, use `.force()` if you want to use the results of the query instead.
+            params (list): the list where we append each value
 
-    def format_db_values(self, value):
-        if type(value) == str:
-            value = VALUE_STRING_FORMAT.format(value.replace("'",VALUE_SINGLE_QUOTE_FORMAT))
+        Returns:
+            str: the placeholders for the value
+        """
+        if isinstance(value, Select):
+            query, query_params = value._compile_subquery()
+            params.extend(query_params)
+            self._subquery_tables.update(value._tables())
+            return VALUE_SUBQUERY_FORMAT.format(query=query)
 
         if type(value) == list:
-            value = VALUE_LIST_FORMAT.format(', '.join([str(self.format_db_values(val)) for val in value]))
+            return VALUE_LIST_FORMAT.format(', '.join([self.format_db_values(val, params) for val in value]))
 
-        if type(value) == datetime:
-            value= VALUE_STRING_FORMAT.format(value.strftime(VALUE_DATETIME_FORMAT))
-        
         if type(value) == tuple:
-            value = '{}'.format(', '.join([str(self.format_db_values(val)) for val in value]))
-
-        if type(value) == self.__class__:
-            value = self.format_db_values(list(value))
+            return ', '.join([self.format_db_values(val, params) for val in value])
 
-        if value == None:
-            value = VALUE_NULL_FORMAT
-            
-        return value
+        params.append(value)
+        return VALUE_PLACEHOLDER_FORMAT
 
 
 class Insert(BaseQuery):
-    def bulk_insert(self, values, column_names=None):
+    def bulk_insert(self, values, column_names=None, method='values'):
         """
         This is optimize to be quicker than insert, all your arguments EXCEPTS column names must be a list of values
         To be easier you can use it like this:
         >>> connection.query('form_value').bulk_insert(values=[[1,2], [3,4], [4,5]], column_names=['column_a', 'column_b'])
 
+        For big loads use `method='copy'`, the values are sent with a `COPY ... FROM STDIN` as they are read, so
+        `values` can be any iterable, like a generator, and is never held in memory.
+        >>> connection.query('form_value').bulk_insert(values=(row for row in rows), column_names=['column_a', 'column_b'], method='copy')
+
         Use with the * for positional arguments
 
         Args:
             column_names (list): the column names as a list
+            method (str, optional): `values` for chunked `INSERT ... VALUES` statements or `copy` to use the 
+            COPY command. Defaults to 'values'
 
         Returns:
-            bool: returns True if everything went fine
+            bool/dict: returns True if everything went fine, with `copy` returns a dict with `rows`, `seconds` 
+            and `rows_per_second`. With an async engine returns an awaitable.
         """
-        values = tuple(list(value) for value in values)
+        if method not in ('values', 'copy'):
+            raise ValueError('`method` must be one of the following: values, copy')
+        if self.engine.is_async:
+            return self._invalidate_result_cache(self._async_bulk_insert(values, column_names, method))
+
         columns = column_names if column_names else self.columns
-        maximum_number_of_values_per_iteration = 999
+        if method == 'copy':
+            return self._invalidate_result_cache(self._copy_insert(values, columns))
+
+        self.engine.write(self._format_bulk_insert(values, columns))
+        return self._invalidate_result_cache(True)
+
+    async def _async_bulk_insert(self, values, column_names, method):
+        columns = column_names if column_names else await self.columns
+        if method == 'copy':
+            start = time.monotonic()
+            rows = await self.engine.copy_records(self.on_table, values, columns)
+            seconds = time.monotonic() - start
+            return {
+                'rows': rows,
+                'seconds': seconds,
+                'rows_per_second': rows / seconds if seconds else float(rows)
+            }
+        await self.engine.write(self._format_bulk_insert(values, columns))
+        return True
+
+    def _format_bulk_insert(self, values, columns):
+        """
+        Splits the values in chunks of 999 rows
+
+        Returns:
+            list: a tuple of (query, params) for each INSERT statement
+        """
+        values = tuple(list(value) for value in values)
+        maximum_number_of_values_per_iteration = MAXIMUM_ROWS_PER_STATEMENT
         iterations = math.ceil(len(values)/maximum_number_of_values_per_iteration)
 
-        self.engine.connect()
+        statements = []
         for iteration in range(0, iterations):
             iteration_values = values[iteration*maximum_number_of_values_per_iteration : (iteration+1)*maximum_number_of_values_per_iteration]
-            query = self._format_insert(tuple(iteration_values), columns)
-            self.engine.execute(query)
-        self.engine.commit()
-        return True
+            statements.append(self._format_insert(tuple(iteration_values), columns))
+        return statements
+
+    def _copy_insert(self, values, columns):
+        """
+        Inserts the values using the COPY command, the values are formatted while they are being sent.
+
+        Returns:
+            dict: with the number of `rows` inserted, the `seconds` it took and the `rows_per_second`
+        """
+        query = COPY_FROM_FORMAT.format(
+            table=self.on_table, 
+            columns=', '.join([self._format_field_or_tables(column) for column in columns])
+        )
+        buffer = CopyBuffer(values)
+        start = time.monotonic()
+        self.engine.copy_from(query, buffer, size=COPY_BUFFER_SIZE)
+        seconds = time.monotonic() - start
+        return {
+            'rows': buffer.rows,
+            'seconds': seconds,
+            'rows_per_second': buffer.rows / seconds if seconds else float(buffer.rows)
+        }
 
     def insert(self, **kwargs):
         """
         Inserts an handful amount of data in the database
+        >>> connection.query('form_value').insert(column_a=1, column_b=2)
 
         Returns:
-            [type]: [description]
+            bool: returns True if everything went fine. With an async engine returns an awaitable.
         """
         columns = kwargs.keys()
         values = list(kwargs.values())
-        query = self._format_insert(values, columns)
-        print(query)
-        #self.engine.save(query)
-        return True
+        query, params = self._format_insert(values, columns)
+        return self._invalidate_result_cache(self.engine.save(query, params))
 
     def _format_insert(self, values, columns):
         INSERT_CLAUSE = 'INSERT INTO "{}" ({}) VALUES {}'
-        return INSERT_CLAUSE.format(
+        params = []
+        query = INSERT_CLAUSE.format(
             self.on_table, 
             ', '.join(['"{}"'.format(column) for column in columns]),
-            self.format_db_values(values)
+            self.format_db_values(values, params)
         )
+        return query, tuple(params)
 
 
 class Select(BaseQuery):
@@ -227,33 +400,127 @@ class Select(BaseQuery):
     """
     def __init__(self, join_relations, *args, **kwargs):
         self.join_relations = join_relations
+        self._join_relations_key = freeze_join_relations(join_relations)
         self.query_select = ['*']
         self.query_distinct = ''
         self.query_orders = []
         self.query_where = []
-        self.query_limit = ''
+        self.query_limit = None
+        self.query_offset = None
         self.query_joins = []
+        self.query_having = []
+        # the alias and the expression of each aggregate added with `annotate`, the query is grouped when it has any
+        self._annotations = {}
+        # the lists keep the order of the clauses, the sets are only used to check if a clause was already added
+        self._query_orders_set = set()
+        self._query_where_set = set()
+        self._query_joins_set = set()
+        # results of the last evaluation, reused until the query changes
+        self._result_cache = None
+        # tables used by the subqueries in the filters, so writes on them invalidate the cached results
+        self._subquery_tables = set()
+        self._cache = False
+        self._cache_ttl = None
+        self._row_format = ROW_FORMAT_TUPLE
+        self._prefetch_relations = []
+        # the engine that runs the query when the connection has replicas, None lets the connection decide
+        self._using = None
         super(Select, self).__init__(*args, **kwargs)
 
-    @property
-    def __get_query(self):
+    def _compile(self, select=None, distinct=None, ordered=True, limit=None, offset=None):
+        """
+        Builds the SELECT statement, the arguments override the values set in the query without changing it.
+
+        Args:
+            select (str, optional): the select clause to use instead of the selected fields. Defaults to None
+            distinct (str, optional): the distinct clause to use instead of the query one. Defaults to None
+            ordered (bool, optional): set to False to ignore the order by clause. Defaults to True
+            limit (int, optional): the limit to use instead of the query limit. Defaults to None
+            offset (int, optional): the offset to use instead of the query offset. Defaults to None
+
+        Returns:
+            tuple: the SELECT statement with placeholders and a tuple with the value of each placeholder
+        """
+        start = time.perf_counter()
+        limit = self.query_limit if limit is None else limit
+        offset = self.query_offset if offset is None else offset
         query = SELECT_FORMAT.format(
-            select=', '.join(self.query_select),
-            distinct=DISTINCT_CLAUSE_FORMAT,
+            select=select or self._select_clause(),
+            distinct=self.query_distinct if distinct is None else distinct,
             froms=self.on_table
         )
         
         joins = '{} '.format(' '.join(self.query_joins)) if self.query_joins else ''
-        where = WHERE_CLAUSE_FORMAT.format(where_conditions=WHERE_AND_CONNECTOR_FORMAT.join(self.query_where)) if self.query_where else ''
-        orders = ORDER_BY_CLAUSE_FORMAT.format(order_by_conditions=', '.join(self.query_orders)) if self.query_orders else ''
-        limit = self.query_limit
+        where = WHERE_CLAUSE_FORMAT.format(
+            where_conditions=WHERE_AND_CONNECTOR_FORMAT.join([condition for condition, __ in self.query_where])
+        ) if self.query_where else ''
+        group_by = GROUP_BY_CLAUSE_FORMAT.format(fields=', '.join(self._group_by_fields())) if self._annotations else ''
+        having = HAVING_CLAUSE_FORMAT.format(
+            conditions=WHERE_AND_CONNECTOR_FORMAT.join([condition for condition, __ in self.query_having])
+        ) if self.query_having else ''
+        orders = ORDER_BY_CLAUSE_FORMAT.format(order_by_conditions=', '.join(self.query_orders)) if self.query_orders and ordered else ''
+        limit = LIMIT_FORMAT.format(num=limit) if limit is not None else ''
+        offset = OFFSET_FORMAT.format(num=offset) if offset else ''
+
+        query = query + joins + where + group_by + having + orders + limit + offset
+        params = tuple(
+            param for __, condition_params in self.query_where + self.query_having for param in condition_params
+        )
+        self.engine.instrumentation.record_compile(time.perf_counter() - start)
+        return query, params
 
-        query = query + joins + where + orders + limit
-        return query
+    def _select_clause(self):
+        """
+        Returns:
+            str: the selected fields followed by the annotations, annotated queries without selected fields select 
+            every column of the table
+        """
+        if not self._annotations:
+            return ', '.join(self.query_select)
+        select = self.query_select
+        if select == ['*']:
+            select = [FIELD_FORMAT.format(table=self._format_db_tables_names(self.fields_table_relations['']), field='*')]
+        return ', '.join(select + [
+            AGGREGATE_ALIAS_FORMAT.format(aggregate=aggregate, alias=self._format_field_or_tables(alias))
+            for alias, aggregate in self._annotations.items()
+        ])
+
+    def _group_by_fields(self):
+        """
+        Returns:
+            list: the selected fields, or the `id` of the table when nothing was selected, postgres knows the other
+            columns of the table depend on its primary key
+        """
+        if self.query_select == ['*']:
+            return [FIELD_FORMAT.format(
+                table=self._format_db_tables_names(self.fields_table_relations['']),
+                field=self._format_field_or_tables(GROUP_BY_DEFAULT_FIELD)
+            )]
+        return self.query_select
+
+    def _compile_subquery(self):
+        """
+        Builds the query so it can be used as a value of another query, like `filter(id___in=query)`. When nothing
+        was selected we select the `id` of the table, since a subquery must return only one column.
+
+        Returns:
+            tuple: the SELECT statement with placeholders and a tuple with the value of each placeholder
+        """
+        select = None
+        if self.query_select == ['*']:
+            select = FIELD_FORMAT.format(
+                table=self._format_db_tables_names(self.fields_table_relations['']),
+                field=self._format_field_or_tables(SUBQUERY_DEFAULT_FIELD)
+            )
+        return self._compile(select=select)
 
     @property
     def query(self):
-        return self.__get_query
+        return self._compile()[0]
+
+    @property
+    def params(self):
+        return self._compile()[1]
 
     def first(self):
         """
@@ -271,11 +538,13 @@ class Select(BaseQuery):
         Returns:
             self: this object so you can concatenate with other functions
         """
-        self.query_limit = LIMIT_FORMAT.format(num=number)
+        self.query_limit = number
+        self._result_cache = None
         return self
 
     def distinct(self):
         self.query_distinct = DISTINCT_CLAUSE_FORMAT
+        self._result_cache = None
         return self
 
     def select(self, *args, **kwargs):
@@ -309,8 +578,68 @@ class Select(BaseQuery):
             select_clause = self._format_db_fields(value)
             if select_clause not in self.query_select:
                 self.query_select.append(select_clause)
+        self._result_cache = None
+        return self
+
+    def rows(self, as_='tuple'):
+        """
+        Sets the type of each row of the results
+        >>> row = connection.query('form_value').rows(as_='named')[0]
+        >>> row.id, row['id'], row[0]
+
+        Args:
+            as_ (str, optional): `tuple`, `named` for tuples that can also be accessed by the name of the column or
+            `dict`. Defaults to 'tuple'
+        """
+        if as_ not in ROW_FORMATS:
+            raise ValueError('`as_` must be one of the following: {}'.format(', '.join(ROW_FORMATS)))
+        self._row_format = as_
+        self._flat = False
+        self._result_cache = None
+        return self
+
+    def values(self, *args):
+        """
+        Retrieves each row as a dict, when you set fields only these fields are selected
+        >>> connection.query('form_value').values('id', 'value')
+        [{'id': 1, 'value': 'foo'}]
+        """
+        if args:
+            self.select(*args)
+        return self.rows(as_=ROW_FORMAT_DICT)
+
+    def prefetch(self, *args):
+        """
+        Retrieves the rows referenced by each field with one query for each field, instead of a join or one query
+        for each row. The related row is added to the end of each row, and can be accessed by the name of the field
+        with named or dict rows. Use double underscores to prefetch the relations of the related rows.
+        >>> row = connection.query('form_value').rows(as_='named').prefetch('form', 'form__depends_on')[0]
+        >>> row.form.depends_on.id
+
+        The results must have the column of each field, like `form_id` for `form`. When the column has the name of the
+        field, like a `form` column, the related row is `form_related`.
+        """
+        for value in args:
+            if value not in self._prefetch_relations:
+                self._prefetch_relations.append(value)
+        self._result_cache = None
+        return self
+
+    def using(self, alias):
+        """
+        Sets where the query runs when the connection has replicas
+        >>> connection.query('form_value').using('primary').filter(id=1)
+
+        Args:
+            alias (str): `primary`, `replica` or the name of a replica
+        """
+        self._using = alias
+        self._result_cache = None
         return self
 
+    def _reader(self):
+        return self.engine.reader(self._using)
+
     def filter(self, **kwargs): 
         """
         You need to define filters like the following example:
@@ -323,19 +652,106 @@ class Select(BaseQuery):
         where condition is the id on `connectedfield` table.
         """       
         for key, value in kwargs.items():
-            where_operation =  WHERE_SPECIAL_ARGUMENTS.get(key.split(AUTOMATIC_JOINS_PLACEHOLDER)[-1], WHERE_EQUAL_OPERATION_FORMAT)
+            self._add_where(self._format_condition(key, value, self._format_db_fields))
 
-            if where_operation != WHERE_EQUAL_OPERATION_FORMAT:
-                key = AUTOMATIC_JOINS_PLACEHOLDER.join(key.split(AUTOMATIC_JOINS_PLACEHOLDER)[:-1])
-            
-            where_field = self._format_db_fields(key)
+        self._result_cache = None
+        return self
+
+    def _format_condition(self, key, value, format_field):
+        """
+        Builds a condition like `id=2` or `id___in=[1, 2]`, the special arguments are in `WHERE_SPECIAL_ARGUMENTS`
 
-            value = self.format_db_values(value)
-            if where_field not in self.query_where:
-                self.query_where.append(where_field + where_operation + str(value))
+        Args:
+            key (str): the field with an optional special argument
+            value (str/int/datetime/list/tuple/Query): the value of the condition
+            format_field (callable): formats the field to be used in the query
+
+        Returns:
+            tuple: the condition with placeholders and a tuple with the value of each placeholder
+        """
+        where_operation =  WHERE_SPECIAL_ARGUMENTS.get(key.split(AUTOMATIC_JOINS_PLACEHOLDER)[-1], WHERE_EQUAL_OPERATION_FORMAT)
+
+        if where_operation != WHERE_EQUAL_OPERATION_FORMAT:
+            key = AUTOMATIC_JOINS_PLACEHOLDER.join(key.split(AUTOMATIC_JOINS_PLACEHOLDER)[:-1])
+        
+        where_field = format_field(key)
+
+        params = []
+        value = self.format_db_values(value, params)
+        return where_field + where_operation + value, tuple(params)
 
+    def annotate(self, **kwargs):
+        """
+        Adds an aggregate for each group of the selected fields, the query is grouped by the selected fields, or by
+        the `id` of the table when nothing was selected, so only the aggregated rows are retrieved.
+        >>> connection.query('form_value').values('form__name').annotate(n=Count('id'))
+        [{'name': 'foo', 'n': 10}]
+
+        You can filter the annotations with `.having()` and order by them with `.order_by('-n')`.
+        """
+        for alias, aggregate in kwargs.items():
+            if not isinstance(aggregate, Aggregate):
+                raise TypeError('`{}` must be an aggregate, like `Count(\'id\')`'.format(alias))
+            self._annotations[alias] = aggregate.compile(self)
+        # the annotations are also retrieved, so the rows are never a single value
+        self._flat = False
+        self._result_cache = None
         return self
 
+    def having(self, **kwargs):
+        """
+        Filters the groups of an annotated query, it works like `.filter()` but also accepts the annotations.
+        >>> connection.query('form_value').values('form_id').annotate(n=Count('id')).having(n___gte=10)
+        """
+        for key, value in kwargs.items():
+            condition = self._format_condition(key, value, self._format_having_field)
+            if condition not in self.query_having:
+                self.query_having.append(condition)
+        self._result_cache = None
+        return self
+
+    def _format_having_field(self, value):
+        # postgres doesn't accept the alias of an annotation in HAVING, so we use its expression
+        if value in self._annotations:
+            return self._annotations[value]
+        return self._format_db_fields(value)
+
+    def cache(self, ttl=None):
+        """
+        Reuses the results of the same query from the result cache of the connection, the results are invalidated
+        when you write to any of the tables of the query. Only works if the connection was created with `result_cache`.
+        >>> connection.query('form_type').filter(enabled=True).cache(ttl=30)
+
+        Args:
+            ttl (int, optional): seconds until the results expire, when not set we use the ttl of the result cache. 
+            Defaults to None
+        """
+        self._cache = True
+        self._cache_ttl = ttl
+        self._result_cache = None
+        return self
+
+    def _tables(self):
+        """
+        Returns:
+            set: the name of every table used in the query, including joins and subqueries
+        """
+        return set(relation['table'] for relation in self.fields_table_relations.values()) | self._subquery_tables
+
+    def _add_where(self, where_condition):
+        """
+        Adds a tuple of (condition, params) to the where clause if it was not added yet
+        """
+        try:
+            if where_condition in self._query_where_set:
+                return
+            self._query_where_set.add(where_condition)
+        except TypeError:
+            # values that can't be hashed, like dicts, are checked in the list
+            if where_condition in self.query_where:
+                return
+        self.query_where.append(where_condition)
+
     def order_by(self, *args):
         """
         Expects the each column names as string. You can also make joins in your order using double undersocores
@@ -359,59 +775,1026 @@ class Select(BaseQuery):
             if value[0] == '-':
                 asc_or_desc = ORDER_BY_DESC_FORMAT
                 value = value[1:]
-            order_clause = self._format_db_fields(value)
+            if value in self._annotations:
+                order_clause = self._format_field_or_tables(value)
+            else:
+                order_clause = self._format_db_fields(value)
             order_clause = '{} {}'.format(order_clause, asc_or_desc)
-            if order_clause not in self.query_orders:
+            if order_clause not in self._query_orders_set:
+                self._query_orders_set.add(order_clause)
                 self.query_orders.append(order_clause)
 
+        self._result_cache = None
         return self
 
     def force(self):
         """
-        Runs a SELECT type of query
+        Runs a SELECT type of query, this always hits the database and refreshes the cached results
 
         Returns:
-            list/tuple: List or tuple of results
+            list/tuple: List or tuple of results. With an async engine returns an awaitable.
         """
-        query = self.__get_query
-        result = self.engine.fetch(query)
-        
+        if self.engine.is_async:
+            return self._async_force()
+        result = self._run(*self._compile())
+        self._result_cache = result
+        return result
+
+    async def _async_force(self):
+        if self._needs_description:
+            description, rows = await self._async_cached_fetch(*self._compile(), with_description=True)
+            if self._prefetch_relations:
+                description, rows = await self._async_prefetch(description, rows)
+            result = self._format_results(rows, description)
+        else:
+            result = self._format_results(await self._async_cached_fetch(*self._compile()))
+        self._result_cache = result
+        return result
+
+    def fetch(self):
+        """
+        Returns the results of the query, evaluating it only if it was not evaluated since the last change. 
+        With an async engine use it as `await query.fetch()`.
+
+        Returns:
+            list/tuple: List or tuple of results. With an async engine returns an awaitable.
+        """
+        if self.engine.is_async:
+            return self._async_fetch_all()
+        return self._fetch_all()
+
+    async def _async_fetch_all(self):
+        if self._result_cache is None:
+            await self._async_force()
+        return self._result_cache
+
+    def _run(self, query, params):
+        if self._needs_description:
+            description, rows = self._cached_fetch(query, params, with_description=True)
+            if self._prefetch_relations:
+                description, rows = self._prefetch(description, rows)
+            return self._format_results(rows, description)
+        return self._format_results(self._cached_fetch(query, params))
+
+    @property
+    def _needs_description(self):
+        return (self._row_format != ROW_FORMAT_TUPLE or bool(self._prefetch_relations)) and not getattr(self, '_flat', False)
+
+    def _prefetch_tree(self):
+        """
+        Returns:
+            dict: the prefetched fields as a tree, `form` and `form__depends_on` become {'form': {'depends_on': {}}}
+        """
+        tree = {}
+        for value in self._prefetch_relations:
+            node = tree
+            for field in value.split(AUTOMATIC_JOINS_PLACEHOLDER):
+                node = node.setdefault(field, {})
+        return tree
+
+    def _prefetch_query(self, table, field, description, rows):
+        """
+        Builds the query that retrieves the rows referenced by the field in all of the rows at once
+
+        Returns:
+            tuple: the index of the column of the field, the related table, the related column and the query with
+            its params, the query is None when no row references anything
+        """
+        from_column, to_table, to_column = self._resolve_relation(table, field)
+        names = [column[0] for column in description]
+        if from_column not in names:
+            raise ValueError('Select the `{}` column of `{}` to prefetch `{}`'.format(from_column, table, field))
+        index = names.index(from_column)
+        ids = list(set(row[index] for row in rows if row[index] is not None))
+        query = None
+        if ids:
+            query = (
+                SELECT_FORMAT.format(select='*', distinct='', froms=to_table) + WHERE_CLAUSE_FORMAT.format(
+                    where_conditions=PREFETCH_CONDITION_FORMAT.format(
+                        field=FIELD_FORMAT.format(
+                            table=self._format_field_or_tables(to_table), 
+                            field=self._format_field_or_tables(to_column)
+                        ),
+                        placeholder=VALUE_PLACEHOLDER_FORMAT
+                    )
+                ),
+                (ids,)
+            )
+        return index, to_table, to_column, query
+
+    def _prefetch_attach(self, field, index, to_column, description, rows, related_description, related_rows):
+        """
+        Adds the related row, formatted as the other rows, to the end of each row. The column of the related row has
+        the name of the field, or `<field>_related` when the foreign key column already has the name of the field.
+        """
+        names = [column[0] for column in description]
+        if field in names:
+            field = PREFETCH_RENAMED_FIELD_FORMAT.format(field=field)
+            if field in names:
+                raise ValueError('The results already have a `{}` column, it can\'t be used by prefetch'.format(field))
+        related = {}
+        if related_rows:
+            to_index = [column[0] for column in related_description].index(to_column)
+            formatted_rows = format_rows(related_rows, related_description, self._row_format)
+            related = dict((row[to_index], formatted_row) for row, formatted_row in zip(related_rows, formatted_rows))
+        description = list(description) + [(field, None)]
+        rows = [tuple(row) + (related.get(row[index]),) for row in rows]
+        return description, rows
+
+    def _prefetch(self, description, rows, table=None, tree=None):
+        table = self.on_table if table is None else table
+        tree = self._prefetch_tree() if tree is None else tree
+        for field, children in tree.items():
+            index, to_table, to_column, query = self._prefetch_query(table, field, description, rows)
+            related_description, related_rows = None, []
+            if query is not None:
+                related_description, related_rows = self._reader().fetch(*query, with_description=True)
+                if children:
+                    related_description, related_rows = self._prefetch(related_description, related_rows, to_table, children)
+            description, rows = self._prefetch_attach(field, index, to_column, description, rows, related_description, related_rows)
+        return description, rows
+
+    async def _async_prefetch(self, description, rows, table=None, tree=None):
+        table = self.on_table if table is None else table
+        tree = self._prefetch_tree() if tree is None else tree
+        for field, children in tree.items():
+            index, to_table, to_column, query = self._prefetch_query(table, field, description, rows)
+            related_description, related_rows = None, []
+            if query is not None:
+                related_description, related_rows = await self._reader().fetch(*query, with_description=True)
+                if children:
+                    related_description, related_rows = await self._async_prefetch(related_description, related_rows, to_table, children)
+            description, rows = self._prefetch_attach(field, index, to_column, description, rows, related_description, related_rows)
+        return description, rows
+
+    def _result_cache_backend(self):
+        if not self._cache or self.engine.in_transaction:
+            return None
+        return self.engine.result_cache
+
+    def _cached_fetch(self, query, params, with_description=False):
+        """
+        Retrieves the rows from the result cache of the connection when the query uses `.cache()`, otherwise from 
+        the database. The cache always keeps the description with the rows. Inside a transaction we skip the cache,
+        the transaction can see rows that were not committed yet. The key is built before running the query, so
+        rows retrieved while a write invalidates the table are stored under the old token.
+        """
+        result_cache = self._result_cache_backend()
+        if result_cache is None:
+            return self._reader().fetch(query, params, with_description=with_description)
+        key = result_cache.key(query, params, self._tables())
+        result = result_cache.get(key)
+        if result is None:
+            result = self._reader().fetch(query, params, with_description=True)
+            result_cache.set(key, result, ttl=self._cache_ttl)
+        return (result[0], list(result[1])) if with_description else list(result[1])
+
+    async def _async_cached_fetch(self, query, params, with_description=False):
+        result_cache = self._result_cache_backend()
+        if result_cache is None:
+            return await self._reader().fetch(query, params, with_description=with_description)
+        key = result_cache.key(query, params, self._tables())
+        result = result_cache.get(key)
+        if result is None:
+            result = await self._reader().fetch(query, params, with_description=True)
+            result_cache.set(key, result, ttl=self._cache_ttl)
+        return (result[0], list(result[1])) if with_description else list(result[1])
+
+    def _format_results(self, result, description=None):
         if getattr(self, '_flat', False):
-            result = [value[0] for value in result]
+            return [value[0] for value in result]
+        if description is not None:
+            return format_rows(result, description, self._row_format)
         return result
 
-class Query(Insert, Select):
+    def _validate_sync(self):
+        if self.engine.is_async:
+            raise TypeError('This query uses an async engine, use `await query.fetch()` to retrieve the results')
+
+    def _window(self, start, stop):
+        """
+        Combines a python slice with the limit and offset already set in the query, so `query.limit(10)[5:20]` 
+        retrieves only 5 rows.
+
+        Args:
+            start (int): the first index of the slice, it must not be negative
+            stop (int): the end of the slice, not inclusive, it must not be negative. None means no end
+
+        Returns:
+            tuple: (limit, offset) to use in the query, limit is None when there is no limit
+        """
+        offset = (self.query_offset or 0) + start
+        limit = None if stop is None else max(stop - start, 0)
+        if self.query_limit is not None:
+            available = max(self.query_limit - start, 0)
+            limit = available if limit is None else min(limit, available)
+        return limit, offset
+
+    def _slice(self, k):
+        """
+        Retrieves only the rows of the slice or the index from the database using LIMIT and OFFSET.
+        Negative indexes can't be translated to SQL, for them we evaluate the whole query.
+        """
+        if self._result_cache is not None:
+            return self._result_cache[k]
+
+        if isinstance(k, slice):
+            start = k.start or 0
+            if start < 0 or (k.stop is not None and k.stop < 0) or (k.step is not None and k.step < 0):
+                return self._fetch_all()[k]
+            limit, offset = self._window(start, k.stop)
+            result = self._run(*self._compile(limit=limit, offset=offset)) if limit != 0 else []
+            return result[::k.step] if k.step else result
+
+        if not isinstance(k, int):
+            raise TypeError('Query indices must be integers or slices, not {}'.format(type(k).__name__))
+        if k < 0:
+            return self._fetch_all()[k]
+        limit, offset = self._window(k, k + 1)
+        result = self._run(*self._compile(limit=limit, offset=offset)) if limit != 0 else []
+        if not result:
+            raise IndexError('Query index out of range')
+        return result[0]
+
+    def exists(self):
+        """
+        Checks if the query has any result without retrieving the rows, runs a `SELECT 1 ... LIMIT 1`
+
+        Returns:
+            bool: True if the query has at least one row. With an async engine returns an awaitable.
+        """
+        if self.engine.is_async:
+            return self._async_exists()
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        if self.query_limit == 0:
+            return False
+        return bool(self._cached_fetch(*self._exists_query()))
+
+    async def _async_exists(self):
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        if self.query_limit == 0:
+            return False
+        return bool(await self._async_cached_fetch(*self._exists_query()))
+
+    def _exists_query(self):
+        if self.query_distinct or self.query_offset:
+            query, params = self._compile(ordered=False)
+            query = SUBQUERY_FORMAT.format(
+                select=EXISTS_SELECT_FORMAT, 
+                query=query, 
+                alias='exists_query'
+            ) + LIMIT_FORMAT.format(num=1)
+        else:
+            query, params = self._compile(select=EXISTS_SELECT_FORMAT, ordered=False, limit=1)
+        return query, params
+
+    def count(self):
+        """
+        Counts the number of rows of the query without retrieving them, runs a `SELECT COUNT(*)` with the same 
+        joins and filters
+
+        Returns:
+            int: the number of rows. With an async engine returns an awaitable.
+        """
+        if self.engine.is_async:
+            return self._async_count()
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return self._cached_fetch(*self._count_query())[0][0]
+
+    async def _async_count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return (await self._async_cached_fetch(*self._count_query()))[0][0]
+
+    def _count_query(self):
+        if self.query_distinct or self._annotations or self.query_limit is not None or self.query_offset:
+            query, params = self._compile(ordered=False)
+            query = SUBQUERY_FORMAT.format(
+                select=COUNT_SELECT_FORMAT, 
+                query=query, 
+                alias='count_query'
+            )
+        else:
+            query, params = self._compile(select=COUNT_SELECT_FORMAT, ordered=False)
+        return query, params
+
+    def aggregate(self, **kwargs):
+        """
+        Aggregates all of the rows of the query in the database, only the aggregated values are retrieved
+        >>> connection.query('form_value').filter(form__id=2).aggregate(total=Sum('value'), n=Count('id'))
+        {'total': 10, 'n': 4}
+
+        Returns:
+            dict: the alias and the value of each aggregate. With an async engine returns an awaitable.
+        """
+        if not kwargs:
+            raise ValueError('Use at least one aggregate, like `aggregate(n=Count(\'id\'))`')
+        if self._annotations or self.query_distinct or self.query_limit is not None or self.query_offset:
+            raise ValueError('Queries with annotations, distinct, limit or offset can\'t be aggregated')
+        # the joins of the aggregates are only used in this query
+        query = self._clone()
+        select = []
+        for alias, aggregate in kwargs.items():
+            if not isinstance(aggregate, Aggregate):
+                raise TypeError('`{}` must be an aggregate, like `Count(\'id\')`'.format(alias))
+            select.append(AGGREGATE_ALIAS_FORMAT.format(
+                aggregate=aggregate.compile(query), alias=self._format_field_or_tables(alias)
+            ))
+        compiled_query = query._compile(select=', '.join(select), ordered=False)
+        if self.engine.is_async:
+            return query._async_aggregate(compiled_query, list(kwargs))
+        return dict(zip(kwargs, query._cached_fetch(*compiled_query)[0]))
+
+    async def _async_aggregate(self, compiled_query, aliases):
+        return dict(zip(aliases, (await self._async_cached_fetch(*compiled_query))[0]))
+
+    def iterator(self, chunk_size=2000):
+        """
+        Iterates over the results without loading all of them in memory, the rows are retrieved from a server side
+        cursor in batches of `chunk_size`. The results are not cached.
+
+        >>> for row in connection.query('example_db_name').iterator(chunk_size=1000):
+                print(row)
+
+        Args:
+            chunk_size (int, optional): number of rows retrieved on each round trip. Defaults to 2000
+
+        Returns:
+            generator: yields each row of the query, or the value itself if you used `flat=True` in select. With an
+            async engine returns an async generator, use it with `async for`.
+        """
+        if self.engine.is_async:
+            return self._async_iterator(chunk_size)
+        return self._iterator(chunk_size)
+
+    def _iterator(self, chunk_size):
+        query, params = self._compile()
+        if self._needs_description:
+            for description, rows in self._reader().stream(query, params, chunk_size=chunk_size, with_description=True):
+                if self._prefetch_relations:
+                    description, rows = self._prefetch(description, rows)
+                for value in self._format_results(rows, description):
+                    yield value
+        else:
+            for rows in self._reader().stream(query, params, chunk_size=chunk_size):
+                for value in self._format_results(rows):
+                    yield value
+
+    async def _async_iterator(self, chunk_size):
+        query, params = self._compile()
+        if self._needs_description:
+            async for description, rows in self._reader().stream(query, params, chunk_size=chunk_size, with_description=True):
+                if self._prefetch_relations:
+                    description, rows = await self._async_prefetch(description, rows)
+                for value in self._format_results(rows, description):
+                    yield value
+        else:
+            async for rows in self._reader().stream(query, params, chunk_size=chunk_size):
+                for value in self._format_results(rows):
+                    yield value
+
+    def stream(self, chunk_size=2000):
+        """
+        Same as `.iterator()`
+        """
+        return self.iterator(chunk_size=chunk_size)
+
+    def to_columns(self, chunk_size=2000):
+        """
+        Retrieves the results as a numpy array for each column, the dtype of each array comes from the type of the
+        column. The rows are copied to the arrays in batches of `chunk_size` as they are read from a server side 
+        cursor. Needs `numpy`.
+        >>> connection.query('form_value').select('id', 'value').to_columns()
+        {'id': array([1, 2, 3], dtype=int32), 'value': array(['a', 'b', 'c'], dtype=object)}
+
+        Args:
+            chunk_size (int, optional): number of rows retrieved on each round trip. Defaults to 2000
+
+        Returns:
+            dict: the name of each column and a numpy array with its values. With an async engine returns an awaitable.
+        """
+        if self.engine.is_async:
+            return self._async_columnar(chunk_size, records=False)
+        return self._columnar(chunk_size, records=False).to_columns()
+
+    def to_records(self, chunk_size=2000):
+        """
+        Same as `.to_columns()` but retrieves the results as a numpy structured array, with a field for each column.
+
+        Returns:
+            numpy.ndarray: a structured array. With an async engine returns an awaitable.
+        """
+        if self.engine.is_async:
+            return self._async_columnar(chunk_size, records=True)
+        return self._columnar(chunk_size, records=True).to_records()
+
+    def _columnar(self, chunk_size, records):
+        query, params = self._compile()
+        buffer = None
+        for description, rows in self._reader().stream(query, params, chunk_size=chunk_size, with_description=True):
+            if buffer is None:
+                buffer = ColumnarBuffer(description, records=records)
+            buffer.append(rows)
+        return buffer
+
+    async def _async_columnar(self, chunk_size, records):
+        query, params = self._compile()
+        buffer = None
+        async for description, rows in self._reader().stream(query, params, chunk_size=chunk_size, with_description=True):
+            if buffer is None:
+                buffer = ColumnarBuffer(description, records=records)
+            buffer.append(rows)
+        return buffer.to_records() if records else buffer.to_columns()
+
+    def export(self, fileobj, format='csv', header=False, chunk_size=COPY_BUFFER_SIZE):
+        """
+        Writes the results of the query to a file with `COPY (...) TO STDOUT`, the data goes straight from the 
+        database to the file, so the rows are never converted to python objects or held in memory.
+        >>> with gzip.open('form_value.csv.gz', 'wb') as fileobj:
+                connection.query('form_value').filter(form__id=2).export(fileobj, format='csv', header=True)
+
+        Args:
+            fileobj (file): any object with a `write(data)` method, like a file, a pipe or a compressed writer
+            format (str, optional): `csv`, `text` or `binary`. Defaults to 'csv'
+            header (bool, optional): writes the name of the columns in the first line, only for csv. Defaults to False
+            chunk_size (int, optional): number of bytes written to the file at once. Defaults to 65536
+
+        Returns:
+            dict: with the number of `rows` and `bytes` exported and the `seconds` it took. With an async engine 
+            returns an awaitable.
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError('`format` must be one of the following: {}'.format(', '.join(EXPORT_FORMATS)))
+        if header and format != 'csv':
+            raise ValueError('`header` can only be used with the csv format')
+        query, params = self._compile()
+        writer = CopyWriter(fileobj, chunk_size=chunk_size)
+        if self.engine.is_async:
+            return self._async_export(query, params, writer, format, header)
+
+        start = time.monotonic()
+        rows = self._reader().copy_to(
+            COPY_TO_FORMAT.format(query=query, format=format, header=COPY_TO_HEADER_OPTION if header else ''), 
+            params, 
+            writer
+        )
+        writer.flush()
+        return {'rows': rows, 'bytes': writer.bytes, 'seconds': time.monotonic() - start}
+
+    async def _async_export(self, query, params, writer, format, header):
+        start = time.monotonic()
+        rows = await self._reader().copy_from_query(query, params, writer, format=format, header=header)
+        writer.flush()
+        return {'rows': rows, 'bytes': writer.bytes, 'seconds': time.monotonic() - start}
+
+    def _clone(self):
+        """
+        Copies the query so the copy can be changed without changing this one, the results are not copied.
+        """
+        # copy.copy would use __getstate__, that evaluates the query
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.fields_table_relations = dict(self.fields_table_relations)
+        clone.query_select = list(self.query_select)
+        clone.query_orders = list(self.query_orders)
+        clone.query_where = list(self.query_where)
+        clone.query_joins = list(self.query_joins)
+        clone._query_orders_set = set(self._query_orders_set)
+        clone._query_where_set = set(self._query_where_set)
+        clone._query_joins_set = set(self._query_joins_set)
+        clone._subquery_tables = set(self._subquery_tables)
+        clone._prefetch_relations = list(self._prefetch_relations)
+        clone.query_having = list(self.query_having)
+        clone._annotations = dict(self._annotations)
+        clone._result_cache = None
+        return clone
+
+    def parallel(self, workers=4, partition_by='id', ordered=True, postprocess=None, processes=False):
+        """
+        Splits the query in `workers` partitions by ranges of the `partition_by` field and retrieves them at the same
+        time, each one in its own connection, so use it with a `pool` big enough for all of the workers. The 
+        partition_by field must be a number or a date, ideally with an index. Rows where the field is null are 
+        retrieved in an extra partition at the end.
+        >>> for row in connection.query('form_value').filter(form__id=2).parallel(workers=8, partition_by='id'):
+                print(row)
+
+        Each worker runs in its own thread, so it doesn't see the transaction of the current thread.
+
+        Args:
+            workers (int, optional): number of partitions retrieved at the same time. Defaults to 4
+            partition_by (str, optional): the field used to split the query, it can use joins. Defaults to 'id'
+            ordered (bool, optional): yields the partitions in the order of the `partition_by` field, otherwise 
+            yields each partition as soon as it is retrieved. Defaults to True
+            postprocess (callable, optional): function called with the rows of each partition, it must return the 
+            rows to yield. Defaults to None
+            processes (bool, optional): runs `postprocess` in a pool of processes, use it for CPU heavy functions.
+            The function and the rows must be picklable. Defaults to False
+
+        Returns:
+            generator: yields each row of the query. With an async engine returns an async generator, use it with
+            `async for`.
+        """
+        if workers < 1:
+            raise ValueError('`workers` must be at least 1')
+        if self.query_limit is not None or self.query_offset:
+            raise ValueError('Queries with limit or offset can\'t be partitioned')
+        if self._annotations:
+            # the bounds of a grouped query would be retrieved for each group
+            raise ValueError('Queries with annotations can\'t be partitioned')
+        query = self._clone()
+        field = query._format_db_fields(partition_by)
+        if self.engine.is_async:
+            return query._async_parallel(field, workers, ordered, postprocess, processes)
+        return query._parallel(field, workers, ordered, postprocess, processes)
+
+    def _partitions(self, field, bounds, workers):
+        """
+        Splits the range between the minimum and the maximum value of the field in `workers` ranges
+
+        Args:
+            field (str): the field formatted to be used in the query
+            bounds (tuple): the minimum and the maximum value of the field
+
+        Returns:
+            list: a copy of this query filtered by the range of each partition, the last one retrieves the rows 
+            where the field is null
+        """
+        low, high = bounds
+        null_partition = self._clone()
+        null_partition._add_where((PARTITION_NULL_CONDITION_FORMAT.format(field=field), ()))
+        if low is None:
+            return [null_partition]
+        try:
+            if isinstance(low, int):
+                starts = [low + (high - low) * index // workers for index in range(workers)]
+            else:
+                starts = [low + (high - low) * index / workers for index in range(workers)]
+        except TypeError:
+            raise ValueError('`partition_by` must be a number or a date field')
+        # small ranges create the same start more than once
+        starts = sorted(set(starts))
+
+        partitions = []
+        for index, start in enumerate(starts):
+            is_last = index == len(starts) - 1
+            condition_format = PARTITION_LAST_CONDITION_FORMAT if is_last else PARTITION_CONDITION_FORMAT
+            partition = self._clone()
+            partition._add_where((
+                condition_format.format(field=field, placeholder=VALUE_PLACEHOLDER_FORMAT),
+                (start, high if is_last else starts[index + 1])
+            ))
+            partitions.append(partition)
+        # like `ORDER BY`, nulls come last
+        partitions.append(null_partition)
+        return partitions
+
+    def _bounds_query(self, field):
+        return self._compile(select=PARTITION_BOUNDS_SELECT_FORMAT.format(field=field), distinct='', ordered=False)
+
+    def _parallel(self, field, workers, ordered, postprocess, processes):
+        partitions = self._partitions(field, self._reader().fetch(*self._bounds_query(field))[0], workers)
+        process_executor = ProcessPoolExecutor(max_workers=workers) if postprocess and processes else None
+
+        def run(partition):
+            rows = partition._run(*partition._compile())
+            if postprocess is None:
+                return rows
+            if process_executor is not None:
+                return process_executor.submit(postprocess, rows).result()
+            return postprocess(rows)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(run, partition) for partition in partitions]
+        try:
+            for future in (futures if ordered else as_completed(futures)):
+                for row in future.result():
+                    yield row
+        finally:
+            # when the consumer stops early we don't start the partitions that are still waiting
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if process_executor is not None:
+                process_executor.shutdown(wait=True)
+
+    async def _async_parallel(self, field, workers, ordered, postprocess, processes):
+        partitions = self._partitions(field, (await self._reader().fetch(*self._bounds_query(field)))[0], workers)
+        process_executor = ProcessPoolExecutor(max_workers=workers) if postprocess and processes else None
+        loop = asyncio.get_event_loop()
+
+        async def run(partition):
+            rows = await partition._async_force()
+            if postprocess is None:
+                return rows
+            if process_executor is not None:
+                return await loop.run_in_executor(process_executor, postprocess, rows)
+            return postprocess(rows)
+
+        tasks = [asyncio.ensure_future(run(partition)) for partition in partitions]
+        try:
+            for task in (tasks if ordered else asyncio.as_completed(tasks)):
+                for row in await task:
+                    yield row
+        finally:
+            for task in tasks:
+                task.cancel()
+            if process_executor is not None:
+                process_executor.shutdown(wait=True)
+
+    def paginate(self, by=('id',), page_size=500, cursor=None):
+        """
+        Retrieves a page of the results using the values of the last row of the previous page instead of an offset,
+        so every page costs the same as the first one. The page is ordered by the `by` fields, prefix all of them with
+        `-` for a descending order. The fields must be unique together, so add `id` to the end if they are not.
+        >>> page = connection.query('form_value').filter(form__id=2).paginate(by=('created_at', 'id'), page_size=100)
+        >>> next_page = connection.query('form_value').filter(form__id=2).paginate(by=('created_at', 'id'), page_size=100, cursor=page.cursor)
+
+        The next page runs something like `WHERE ("form_value"."created_at", "form_value"."id") > (%s, %s)`, with an
+        index on the fields it is a single index seek. The pages are always ordered by the `by` fields, annotated 
+        queries can use the annotations as `by` fields, like `by=('-n', 'form__name')`.
+
+        Args:
+            by (tuple, optional): the fields used to order the pages, they can use joins. Defaults to ('id',)
+            page_size (int, optional): the maximum number of rows of each page. Defaults to 500
+            cursor (str, optional): the `cursor` of the previous page, None for the first page. Defaults to None
+
+        Returns:
+            Page: the rows of the page and the `cursor` of the next one. With an async engine returns an awaitable.
+        """
+        query, number_of_fields = self._keyset_query(by, page_size, cursor)
+        if self.engine.is_async:
+            return self._async_paginate(query, number_of_fields, page_size)
+        description, rows = self._reader().fetch(*query, with_description=True)
+        description, rows, next_cursor = self._split_page(description, rows, number_of_fields, page_size)
+        if self._prefetch_relations:
+            description, rows = self._prefetch(description, rows)
+        return Page(self._format_results(rows, description), next_cursor)
+
+    async def _async_paginate(self, query, number_of_fields, page_size):
+        description, rows = await self._reader().fetch(*query, with_description=True)
+        description, rows, next_cursor = self._split_page(description, rows, number_of_fields, page_size)
+        if self._prefetch_relations:
+            description, rows = await self._async_prefetch(description, rows)
+        return Page(self._format_results(rows, description), next_cursor)
+
+    def pages(self, by=('id',), page_size=500):
+        """
+        Walks through all of the pages, see `.paginate()`
+
+        Returns:
+            generator: yields each Page. With an async engine returns an async generator, use it with `async for`.
+        """
+        if self.engine.is_async:
+            return self._async_pages(by, page_size)
+        return self._pages(by, page_size)
+
+    def _pages(self, by, page_size):
+        page = self.paginate(by=by, page_size=page_size)
+        yield page
+        while page.has_next:
+            page = self.paginate(by=by, page_size=page_size, cursor=page.cursor)
+            yield page
+
+    async def _async_pages(self, by, page_size):
+        page = await self.paginate(by=by, page_size=page_size)
+        yield page
+        while page.has_next:
+            page = await self.paginate(by=by, page_size=page_size, cursor=page.cursor)
+            yield page
+
+    def _keyset_query(self, by, page_size, cursor):
+        """
+        Builds the query of a page, the `by` fields are added to the end of the select so we can create the cursor
+        of the next page, and we retrieve one more row to know if there is a next page.
+
+        Returns:
+            tuple: the query with its params and the number of `by` fields
+        """
+        by = (by,) if isinstance(by, str) else tuple(by)
+        if not by:
+            raise ValueError('`by` must have at least one field')
+        if self.query_limit is not None or self.query_offset:
+            raise ValueError('Paginated queries can\'t have limit or offset')
+        descending = [value.startswith('-') for value in by]
+        if any(descending) and not all(descending):
+            raise ValueError('All of the `by` fields must be ascending or all of them descending')
+
+        query = self._clone()
+        query.query_orders = []
+        query._query_orders_set = set()
+        query.order_by(*by)
+        # annotated queries can also be paginated by their annotations
+        fields = [query._format_having_field(value.lstrip('-')) for value in by]
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if len(values) != len(fields):
+                raise ValueError('Invalid cursor')
+            condition = (
+                KEYSET_CONDITION_FORMAT.format(
+                    fields=', '.join(fields),
+                    operator=KEYSET_BEFORE_OPERATOR if all(descending) else KEYSET_AFTER_OPERATOR,
+                    values=', '.join([VALUE_PLACEHOLDER_FORMAT] * len(values))
+                ),
+                values
+            )
+            if any(value.lstrip('-') in query._annotations for value in by):
+                query.query_having.append(condition)
+            else:
+                query._add_where(condition)
+        select = ', '.join([query._select_clause()] + [
+            KEYSET_FIELD_ALIAS_FORMAT.format(field=field, index=index) for index, field in enumerate(fields)
+        ])
+        return query._compile(select=select, limit=page_size + 1), len(fields)
+
+    def _split_page(self, description, rows, number_of_fields, page_size):
+        """
+        Removes the `by` fields and the extra row from the results
+
+        Returns:
+            tuple: the description, the rows and the cursor of the next page
+        """
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1][-number_of_fields:])
+        description = list(description)[:-number_of_fields]
+        rows = [tuple(row[:-number_of_fields]) for row in rows]
+        return description, rows, next_cursor
+
+    def _fetch_all(self):
+        """
+        Returns the cached results, evaluating the query only if it was not evaluated since the last change.
+
+        Returns:
+            list/tuple: List or tuple of results
+        """
+        if self._result_cache is None:
+            self._validate_sync()
+            self.force()
+        return self._result_cache
+
+
+class Update(BaseQuery):
+    """
+    Class responsible for handling update, delete and upsert statements, they use the joins and filters of the 
+    query to know which rows to change.
+    """
+    def _format_write_where(self):
+        """
+        Builds the where clause of an UPDATE or DELETE. Joins, limit and offset can't be used in these statements
+        so when the query has any of them we filter by the ids of a SELECT with the same clauses.
+
+        Returns:
+            tuple: the condition with placeholders, empty if the query has no filters, and a tuple of params
+        """
+        if self.query_joins or self.query_limit is not None or self.query_offset:
+            field = FIELD_FORMAT.format(
+                table=self._format_field_or_tables(self.on_table),
+                field=self._format_field_or_tables(SUBQUERY_DEFAULT_FIELD)
+            )
+            query, params = self._compile(select=field, distinct='', ordered=self.query_limit is not None or bool(self.query_offset))
+            return WHERE_IN_SUBQUERY_FORMAT.format(field=field, query=query.strip()), params
+        condition = WHERE_AND_CONNECTOR_FORMAT.join([condition for condition, __ in self.query_where])
+        params = tuple(param for __, condition_params in self.query_where for param in condition_params)
+        return condition, params
+
+    def _format_rows(self, rows, column_names):
+        """
+        Rows can be dicts or lists, with lists you must set the `column_names`
+
+        Returns:
+            tuple: a tuple with the values of each row and the list of columns
+        """
+        rows = list(rows)
+        if not rows:
+            return [], list(column_names or [])
+        if column_names:
+            return [list(row) for row in rows], list(column_names)
+        if rows and all(isinstance(row, dict) for row in rows):
+            columns = list(rows[0].keys())
+            return [[row[column] for column in columns] for row in rows], columns
+        raise ValueError('Each row must be a dict or you must set `column_names`')
+
+    def _chunks(self, rows):
+        for index in range(0, len(rows), MAXIMUM_ROWS_PER_STATEMENT):
+            yield rows[index:index+MAXIMUM_ROWS_PER_STATEMENT]
+
+    def _nothing_written(self):
+        """
+        Writes without rows never connect to the database, with async engines the 0 is still an awaitable
+        """
+        if self.engine.is_async:
+            return self.__async_nothing_written()
+        return 0
+
+    async def __async_nothing_written(self):
+        return 0
+
+    def update(self, **kwargs):
+        """
+        Updates all of the rows of the query with a single UPDATE statement
+        >>> connection.query('form_value').filter(form__id=2).update(value='', column_b=2)
+
+        Returns:
+            int: the number of updated rows. With an async engine returns an awaitable.
+        """
+        if not kwargs:
+            raise ValueError('You must set at least one column to update')
+        params = []
+        sets = ', '.join([
+            SET_FORMAT.format(field=self._format_field_or_tables(column), value=self.format_db_values(value, params)) 
+            for column, value in kwargs.items()
+        ])
+        query = UPDATE_FORMAT.format(table=self.on_table, sets=sets)
+        condition, condition_params = self._format_write_where()
+        if condition:
+            query = query + WHERE_CLAUSE_FORMAT.format(where_conditions=condition)
+        self._result_cache = None
+        return self._invalidate_result_cache(self.engine.write([(query, tuple(params) + condition_params)]))
+
+    def delete(self):
+        """
+        Deletes all of the rows of the query with a single DELETE statement
+        >>> connection.query('form_value').filter(form__id=2).delete()
+
+        Returns:
+            int: the number of deleted rows. With an async engine returns an awaitable.
+        """
+        query = DELETE_FORMAT.format(table=self.on_table)
+        condition, params = self._format_write_where()
+        if condition:
+            query = query + WHERE_CLAUSE_FORMAT.format(where_conditions=condition)
+        self._result_cache = None
+        return self._invalidate_result_cache(self.engine.write([(query, params)]))
+
+    def bulk_update(self, rows, key='id', column_names=None):
+        """
+        Updates each row with its own values, matching the rows of the table by the `key` column. The rows are sent
+        in chunks of 999 with `UPDATE ... FROM (VALUES ...)`, so it is a single statement for each chunk instead of 
+        one for each row. The filters of the query are also applied.
+        >>> connection.query('form_value').bulk_update([{'id': 1, 'value': 'a'}, {'id': 2, 'value': 'b'}])
+
+        Args:
+            rows (iterable): each row is a dict or a list of values in the same order as `column_names`
+            key (str/tuple, optional): the column, or a tuple of columns, used to find each row. Defaults to 'id'
+            column_names (list, optional): the columns of each row, required if the rows are lists. Defaults to None
+
+        Returns:
+            int: the number of updated rows. With an async engine returns an awaitable.
+        """
+        keys = [key] if isinstance(key, str) else list(key)
+        values, columns = self._format_rows(rows, column_names)
+        if not values:
+            return self._nothing_written()
+        missing_keys = [key for key in keys if key not in columns]
+        if missing_keys:
+            raise ValueError('Every row must have the key columns: {}'.format(', '.join(missing_keys)))
+        updated_columns = [column for column in columns if column not in keys]
+        if not updated_columns:
+            raise ValueError('You must set at least one column to update besides the key')
+
+        alias = self._format_field_or_tables(BULK_UPDATE_ALIAS)
+        table = self._format_field_or_tables(self.on_table)
+        sets = ', '.join([
+            SET_FORMAT.format(
+                field=self._format_field_or_tables(column), 
+                value=FIELD_FORMAT.format(table=alias, field=self._format_field_or_tables(column))
+            ) for column in updated_columns
+        ])
+        conditions = [
+            FIELD_FORMAT.format(table=table, field=self._format_field_or_tables(key)) + WHERE_EQUAL_OPERATION_FORMAT + 
+            FIELD_FORMAT.format(table=alias, field=self._format_field_or_tables(key))
+            for key in keys
+        ]
+        condition, condition_params = self._format_write_where()
+        if condition:
+            conditions.append(condition)
+
+        statements = []
+        for chunk in self._chunks(values):
+            params = []
+            query = BULK_UPDATE_FORMAT.format(
+                table=self.on_table,
+                sets=sets,
+                values=BULK_UPDATE_VALUES_FORMAT.format(
+                    columns=', '.join([self._format_field_or_tables(column) for column in columns]),
+                    table=self.on_table,
+                    values=self.format_db_values(tuple(chunk), params)
+                ),
+                alias=BULK_UPDATE_ALIAS,
+                conditions=WHERE_AND_CONNECTOR_FORMAT.join(conditions)
+            )
+            statements.append((query, tuple(params) + condition_params))
+        self._result_cache = None
+        return self._invalidate_result_cache(self.engine.write(statements))
+
+    def bulk_upsert(self, rows, conflict, column_names=None, update=None):
+        """
+        Inserts the rows and updates the ones that already exist with `INSERT ... ON CONFLICT`, in chunks of 999 rows.
+        >>> connection.query('form_value').bulk_upsert([{'id': 1, 'value': 'a'}, {'id': 2, 'value': 'b'}], conflict=['id'])
+
+        Args:
+            rows (iterable): each row is a dict or a list of values in the same order as `column_names`
+            conflict (list): the columns of the unique constraint or index used to find the existing rows
+            column_names (list, optional): the columns of each row, required if the rows are lists. Defaults to None
+            update (list, optional): the columns to update on the existing rows, by default every column that is
+            not in `conflict`. When there is nothing to update the existing rows are kept. Defaults to None
+
+        Returns:
+            int: the number of inserted or updated rows. With an async engine returns an awaitable.
+        """
+        if not conflict:
+            raise ValueError('You must set the `conflict` columns')
+        values, columns = self._format_rows(rows, column_names)
+        if not values:
+            return self._nothing_written()
+        update = update if update is not None else [column for column in columns if column not in conflict]
+        if update:
+            action = UPSERT_UPDATE_FORMAT.format(sets=', '.join([
+                SET_FORMAT.format(
+                    field=self._format_field_or_tables(column), 
+                    value=EXCLUDED_FIELD_FORMAT.format(field=self._format_field_or_tables(column))
+                ) for column in update
+            ]))
+        else:
+            action = UPSERT_NOTHING_FORMAT
+
+        statements = []
+        for chunk in self._chunks(values):
+            query, params = self._format_insert(tuple(chunk), columns)
+            query = UPSERT_FORMAT.format(
+                insert=query,
+                conflict=', '.join([self._format_field_or_tables(column) for column in conflict]),
+                action=action
+            )
+            statements.append((query, params))
+        self._result_cache = None
+        return self._invalidate_result_cache(self.engine.write(statements))
+
+
+class Query(Insert, Update, Select):
     def __repr__(self):
-        return str(self.force())
+        if self.engine.is_async and self._result_cache is None:
+            return '<Query: {}>'.format(self.query)
+        return str(self._fetch_all())
 
     def __getstate__(self):
-        return self.force()
+        return self._fetch_all()
 
     def __iter__(self):
-        return iter(self.force())
+        return iter(self._fetch_all())
 
     def __bool__(self):
-        return bool(self.force())
+        self._validate_sync()
+        return self.exists()
+
+    def __len__(self):
+        return len(self._fetch_all())
 
     def __getitem__(self, k):
-        return self.force()[k]
+        if self._result_cache is None:
+            self._validate_sync()
+        return self._slice(k)
 
     @property
     def columns(self):
         """
-        Returns all of the columns of the current table that you are connected to
+        Returns all of the columns of the current table that you are connected to, they come from the catalog of
+        the engine so we only query the database when the catalog expires.
 
         Returns:
-            list: list with each column_name of your table as string
+            list: list with each column_name of your table as string. With an async engine returns an awaitable.
         """
+        if self.engine.is_async:
+            return self._async_columns()
+        column_names = self.engine.catalog.columns(self.on_table)
+        if column_names is not None:
+            return column_names
+
+        # tables outside of the search path are not in the catalog
+        self.engine.connect()
+        try:
+            cursor = self.engine.execute(self._columns_query())
+            column_names = [description[0] for description in cursor.description]
+        finally:
+            self.engine.close()
+        return column_names
+
+    async def _async_columns(self):
+        if self.engine.catalog.is_expired:
+            await self.engine.catalog.load()
+        column_names = self.engine.catalog.columns(self.on_table)
+        if column_names is not None:
+            return column_names
+        return await self.engine.describe(self._columns_query())
+
+    def _columns_query(self):
         query = SELECT_FORMAT.format(
             select='*',
             distinct='',
             froms=self.on_table
         )
-        self.engine.connect()
-        query = query + LIMIT_FORMAT.format(num=0)
-        cursor = self.engine.execute(query)
-        column_names = [description[0] for description in cursor.description]
-        self.engine.close()
-        return column_names
+        return query + LIMIT_FORMAT.format(num=0)
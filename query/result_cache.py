@@ -0,0 +1,176 @@
+import multiprocessing
+import time
+import uuid
+
+from .cache import LRUCache
+
+
+class SharedCache:
+    def __init__(self, maxsize=1024, manager=None):
+        """
+        Same as `LRUCache` but the keys live in a `multiprocessing.Manager`, so every process created from this one,
+        like the workers of a `multiprocessing.Pool` or forked web workers, share the same cache. Values are pickled
+        on each access, use it for small results.
+
+        Args:
+            maxsize (int, optional): maximum number of keys in the cache. Defaults to 1024
+            manager (multiprocessing.managers.SyncManager, optional): the manager that holds the cache, when not set
+            we start a new one. Defaults to None
+        """
+        self.maxsize = maxsize
+        self._manager = manager if manager is not None else multiprocessing.Manager()
+        self._data = self._manager.dict()
+        self._counters = self._manager.dict(hits=0, misses=0, evictions=0, expirations=0)
+        self._lock = self._manager.RLock()
+
+    def __count(self, counter, number=1):
+        self._counters[counter] = self._counters[counter] + number
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.__count('misses')
+                return default
+            value, expires_at, __ = entry
+            # time.time() instead of time.monotonic() since the clock is compared between processes
+            if expires_at is not None and time.time() >= expires_at:
+                self._data.pop(key, None)
+                self.__count('expirations')
+                self.__count('misses')
+                return default
+            self._data[key] = (value, expires_at, time.time())
+            self.__count('hits')
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl is not None else None, time.time())
+            if len(self._data) > self.maxsize:
+                # finding the least recently used keys needs a copy of the whole dict, so we evict a tenth of the
+                # cache at once instead of one key on each set
+                entries = sorted(self._data.items(), key=lambda item: item[1][2])
+                evicted = entries[:len(entries) - self.maxsize + max(self.maxsize // 10, 1)]
+                for evicted_key, __ in evicted:
+                    self._data.pop(evicted_key, None)
+                self.__count('evictions', len(evicted))
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.update(hits=0, misses=0, evictions=0, expirations=0)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters.items(), size=len(self._data), maxsize=self.maxsize)
+
+
+class ResultCache:
+    BACKENDS = {
+        'memory': LRUCache,
+        'shared': SharedCache
+    }
+
+    def __init__(self, backend='memory', maxsize=1024, ttl=None, tables=None):
+        """
+        Caches the rows of the queries that use `.cache()`, the key is the SQL with the params. Whenever we write to
+        a table using a query of the same connection, the cached results of every query that uses this table are
+        invalidated. For this each table has a token that is part of the key, invalidating a table just replaces
+        its token so the old results are never found again and are evicted as any other key.
+
+        Args:
+            backend (str/object, optional): `memory` for a cache in this process, `shared` for a cache shared with
+            the child processes, or any object with the same methods as `LRUCache`. Defaults to 'memory'
+            maxsize (int, optional): maximum number of results in the cache. Defaults to 1024
+            ttl (int, optional): default seconds until the results expire, None to keep them until they are evicted
+            or invalidated. Defaults to None
+            tables (object, optional): where we keep the token of each table, by default a cache of the same type
+            of the backend. When you use your own backend set it so the tokens are shared as well. Defaults to None
+        """
+        if isinstance(backend, str):
+            if backend not in self.BACKENDS:
+                raise KeyError('Backend not found, use one of the following: {}'.format(', '.join(self.BACKENDS.keys())))
+            self.backend = self.BACKENDS[backend](maxsize=maxsize)
+        else:
+            self.backend = backend
+        if tables is None:
+            # tokens must not be evicted before the results that use them, so this cache is bigger
+            if isinstance(self.backend, SharedCache):
+                tables = SharedCache(maxsize=maxsize * 10, manager=self.backend._manager)
+            else:
+                tables = LRUCache(maxsize=maxsize * 10)
+        self.tables = tables
+        self.ttl = ttl
+
+    def __table_token(self, table):
+        token = self.tables.get(table)
+        if token is None:
+            token = uuid.uuid4().hex
+            self.tables.set(table, token)
+        return token
+
+    def key(self, query, params, tables):
+        """
+        Builds the key of the query with the current token of each table. Build it once before running the query and
+        use the same key to store the rows, so a write that invalidates a table while the query runs never stores the
+        old rows under the new token.
+
+        Args:
+            query (str): the SQL with placeholders
+            params (tuple): the value of each placeholder
+            tables (iterable): every table used in the query
+
+        Returns:
+            tuple: the key, or None when the params can't be hashed, like dicts, those results are never cached
+        """
+        key = (query, tuple(params or ()), tuple((table, self.__table_token(table)) for table in sorted(tables)))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key, default=None):
+        """
+        Args:
+            key (tuple): the key returned by `key()`
+
+        Returns:
+            list: the cached rows or `default` if they are not in the cache
+        """
+        if key is None:
+            return default
+        return self.backend.get(key, default)
+
+    def set(self, key, rows, ttl=None):
+        """
+        Args:
+            key (tuple): the key returned by `key()` before the rows were retrieved
+            rows (list): the rows retrieved from the database
+            ttl (int, optional): seconds until the rows expire, when not set we use the default ttl. Defaults to None
+        """
+        if key is not None:
+            self.backend.set(key, rows, ttl=ttl if ttl is not None else self.ttl)
+
+    def invalidate(self, *tables):
+        """
+        Invalidates the cached results of every query that uses one of the tables
+        """
+        for table in tables:
+            self.tables.set(table, uuid.uuid4().hex)
+
+    def clear(self):
+        self.backend.clear()
+        self.tables.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: the number of `hits`, `misses`, `evictions` and `expirations`, the current `size` and the `maxsize`
+            of the cache
+        """
+        return self.backend.stats()
@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import threading
+import time
+
+
+ROUTING_STRATEGIES = ('round_robin', 'least_outstanding')
+
+
+class Replica:
+    def __init__(self, name, engine, router):
+        """
+        Wraps the engine of a replica, counting the queries that are running on it and ejecting it from the router
+        when the database can't be reached.
+        """
+        self.name = name
+        self.engine = engine
+        self.router = router
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = None
+        self.__lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    @property
+    def is_healthy(self):
+        return self.ejected_until is None or time.monotonic() >= self.ejected_until
+
+    def __start(self):
+        with self.__lock:
+            self.outstanding += 1
+
+    def __finish(self):
+        with self.__lock:
+            self.outstanding -= 1
+
+    def fetch(self, query, params=None, with_description=False):
+        if self.engine.is_async:
+            return self.__async_fetch(query, params, with_description)
+        self.__start()
+        try:
+            return self.engine.fetch(query, params, with_description=with_description)
+        except Exception as error:
+            if not self.engine.is_connection_error(error):
+                raise
+            self.router.eject(self)
+            # the read still succeeds on the primary
+            return self.router.primary.fetch(query, params, with_description=with_description)
+        finally:
+            self.__finish()
+
+    async def __async_fetch(self, query, params, with_description):
+        self.__start()
+        try:
+            return await self.engine.fetch(query, params, with_description=with_description)
+        except Exception as error:
+            if not self.engine.is_connection_error(error):
+                raise
+            self.router.eject(self)
+            return await self.router.primary.fetch(query, params, with_description=with_description)
+        finally:
+            self.__finish()
+
+    def stream(self, query, params=None, chunk_size=2000, with_description=False):
+        if self.engine.is_async:
+            return self.__async_stream(query, params, chunk_size, with_description)
+        return self.__stream(query, params, chunk_size, with_description)
+
+    def __stream(self, query, params, chunk_size, with_description):
+        # a stream that already yielded rows can't move to the primary, so it is only ejected
+        self.__start()
+        try:
+            for rows in self.engine.stream(query, params, chunk_size=chunk_size, with_description=with_description):
+                yield rows
+        except Exception as error:
+            if not self.engine.is_connection_error(error):
+                raise
+            self.router.eject(self)
+            raise
+        finally:
+            self.__finish()
+
+    async def __async_stream(self, query, params, chunk_size, with_description):
+        self.__start()
+        try:
+            async for rows in self.engine.stream(query, params, chunk_size=chunk_size, with_description=with_description):
+                yield rows
+        except Exception as error:
+            if not self.engine.is_connection_error(error):
+                raise
+            self.router.eject(self)
+            raise
+        finally:
+            self.__finish()
+
+
+class Router:
+    def __init__(self, primary, replicas, strategy='round_robin', eject_seconds=30):
+        """
+        Sends the SELECT queries to the replicas and everything else to the primary. Queries inside a transaction
+        always run on the primary, so they see their own writes. Replicas that can't be reached are ejected for
+        `eject_seconds`, after this they are tried again.
+
+        Everything that is not a read, like `write`, `transaction` or `catalog`, is the primary's.
+
+        Args:
+            primary (Engine): the engine of the primary
+            replicas (dict): the name and the engine of each replica
+            strategy (str, optional): `round_robin` or `least_outstanding`, that picks the replica with less
+            queries running. Defaults to 'round_robin'
+            eject_seconds (int, optional): seconds a failing replica stays out of the router. Defaults to 30
+        """
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError('`strategy` must be one of the following: {}'.format(', '.join(ROUTING_STRATEGIES)))
+        self.primary = primary
+        self.replicas = [Replica(name, engine, self) for name, engine in replicas.items()]
+        self.strategy = strategy
+        self.eject_seconds = eject_seconds
+        self.__counter = itertools.count()
+
+    def __getattr__(self, name):
+        return getattr(self.primary, name)
+
+    def reader(self, using=None):
+        """
+        Args:
+            using (str, optional): `primary`, `replica` or the name of a replica, by default we pick a replica
+            unless we are in a transaction. Defaults to None
+
+        Returns:
+            Engine: the engine that runs the SELECT query
+        """
+        if using == 'primary' or (using is None and self.primary.in_transaction):
+            return self.primary
+        if using not in (None, 'replica'):
+            for replica in self.replicas:
+                if replica.name == using:
+                    return replica
+            raise KeyError('Replica `{}` not found, use one of the following: {}'.format(
+                using, ', '.join(['primary'] + [replica.name for replica in self.replicas])
+            ))
+
+        replicas = [replica for replica in self.replicas if replica.is_healthy]
+        if not replicas:
+            return self.primary
+        if self.strategy == 'least_outstanding':
+            return min(replicas, key=lambda replica: replica.outstanding)
+        return replicas[next(self.__counter) % len(replicas)]
+
+    def eject(self, replica):
+        replica.failures += 1
+        replica.ejected_until = time.monotonic() + self.eject_seconds
+
+    def check_health(self):
+        """
+        Runs a `SELECT 1` on every replica, ejecting the ones that fail and bringing back the ones that work.
+
+        Returns:
+            dict: the name of each replica and True if it is healthy. With an async engine returns an awaitable.
+        """
+        if self.primary.is_async:
+            return self.__async_check_health()
+        health = {}
+        for replica in self.replicas:
+            try:
+                replica.engine.fetch('SELECT 1')
+                replica.ejected_until = None
+            except Exception as error:
+                if not replica.engine.is_connection_error(error):
+                    raise
+                self.eject(replica)
+            health[replica.name] = replica.is_healthy
+        return health
+
+    async def __async_check_health(self):
+        health = {}
+        for replica in self.replicas:
+            try:
+                await replica.engine.fetch('SELECT 1')
+                replica.ejected_until = None
+            except Exception as error:
+                if not replica.engine.is_connection_error(error):
+                    raise
+                self.eject(replica)
+            health[replica.name] = replica.is_healthy
+        return health
+
+    def dispose(self):
+        """
+        Closes the idle connections of the primary and of every replica
+        """
+        if self.primary.is_async:
+            return self.__async_dispose()
+        for engine in [self.primary] + [replica.engine for replica in self.replicas]:
+            engine.dispose()
+        return True
+
+    async def __async_dispose(self):
+        await asyncio.gather(*[engine.dispose() for engine in [self.primary] + [replica.engine for replica in self.replicas]])
+        return True
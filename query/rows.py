@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+from .cache import LRUCache
+
+
+ROW_FORMAT_TUPLE = 'tuple'
+ROW_FORMAT_NAMED = 'named'
+ROW_FORMAT_DICT = 'dict'
+ROW_FORMATS = (ROW_FORMAT_TUPLE, ROW_FORMAT_NAMED, ROW_FORMAT_DICT)
+
+# one row class for each tuple of column names, the same query always reuses the same class
+row_classes = LRUCache(maxsize=1024)
+
+
+def named_row_class(names):
+    """
+    Creates a namedtuple for the columns, so the rows cost the same memory as a tuple and the values can be accessed
+    with `row.id`, `row['id']` or `row[0]`. Names that can't be attributes, like duplicated names or names with
+    spaces, are renamed to `_<index>` as attributes but still work as keys.
+
+    Args:
+        names (tuple): the name of each column
+
+    Returns:
+        type: the row class
+    """
+    row_class = row_classes.get(names)
+    if row_class is not None:
+        return row_class
+
+    indexes = {}
+    for index, name in enumerate(names):
+        indexes.setdefault(name, index)
+
+    class Row(namedtuple('Row', names, rename=True)):
+        __slots__ = ()
+
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                try:
+                    key = indexes[key]
+                except KeyError:
+                    raise KeyError(key) from None
+            return tuple.__getitem__(self, key)
+
+        def keys(self):
+            return names
+
+        def __reduce__(self):
+            # the class is created at runtime so it can't be pickled, we pickle the names instead
+            return make_row, (names, tuple(self))
+
+    row_classes.set(names, Row)
+    return Row
+
+
+def make_row(names, values):
+    return named_row_class(names)._make(values)
+
+
+def format_rows(rows, description, row_format):
+    """
+    Converts the tuples retrieved from the database to the `row_format`
+
+    Args:
+        rows (list): the rows retrieved from the database
+        description (list): a (name, type oid) for each column
+        row_format (str): one of `tuple`, `named` or `dict`
+
+    Returns:
+        list: the converted rows
+    """
+    if row_format == ROW_FORMAT_TUPLE:
+        return rows
+    names = tuple(column[0] for column in description)
+    if row_format == ROW_FORMAT_NAMED:
+        make = named_row_class(names)._make
+        return [make(row) for row in rows]
+    return [dict(zip(names, row)) for row in rows]
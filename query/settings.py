@@ -1,12 +1,18 @@
 from .engine import Postgres
+from .async_engine import AsyncPostgres
 
 ENGINES = {
-    'postgres': Postgres
+    'postgres': Postgres,
+    'postgres_async': AsyncPostgres
 }
 
 WHERE_SPECIAL_ARGUMENTS = {
     '_notin': ' NOT IN ',
-    '_in': ' IN '
+    '_in': ' IN ',
+    '_gt': ' > ',
+    '_gte': ' >= ',
+    '_lt': ' < ',
+    '_lte': ' <= '
 }
 
 AUTOMATIC_JOINS_PLACEHOLDER = '__'
@@ -22,8 +28,19 @@ SELECT_FORMAT = 'SELECT {distinct}{select} FROM "{froms}" '
 # Distinct
 DISTINCT_CLAUSE_FORMAT = 'DISTINCT '
 
+# Table alias config, joined tables are aliased by their join path
+TABLE_ALIAS_FORMAT = '{table}__{path}'
+MAXIMUM_IDENTIFIER_LENGTH = 63
+TABLE_ALIAS_DIGEST_LENGTH = 12
+
+# Number of resolved fields kept in the fields cache
+FIELDS_CACHE_SIZE = 4096
+
 # Joins Config
-JOIN_CLAUSE_FORMAT = 'INNER JOIN {to_table_join} {alias} ON ({from_table_join}."{join}_id" = {to_table_join_name_or_alias}."id")'
+JOIN_CLAUSE_FORMAT = 'INNER JOIN {to_table_join} {alias} ON ({from_table_join}.{from_column} = {to_table_join_name_or_alias}.{to_column})'
+# columns used in the join when the field is not a foreign key in the catalog
+JOIN_FROM_COLUMN_FORMAT = '{join}_id'
+JOIN_TO_COLUMN = 'id'
 
 # Where clause config
 WHERE_CLAUSE_FORMAT = 'WHERE {where_conditions} '
@@ -36,12 +53,63 @@ ORDER_BY_ASC_FORMAT = 'ASC'
 ORDER_BY_DESC_FORMAT = 'DESC'
 
 # Limit clause config 
-LIMIT_FORMAT = 'LIMIT {num}'
+LIMIT_FORMAT = 'LIMIT {num} '
+OFFSET_FORMAT = 'OFFSET {num} '
+
+# Exists and count config
+EXISTS_SELECT_FORMAT = '1'
+COUNT_SELECT_FORMAT = 'COUNT(*)'
+SUBQUERY_FORMAT = 'SELECT {select} FROM ({query}) AS "{alias}" '
+
+# Aggregation config, annotated queries are grouped by the selected fields or by the `id` of the table
+AGGREGATE_FORMAT = '{function}({distinct}{field})'
+AGGREGATE_ALL_FIELDS = '*'
+AGGREGATE_ALIAS_FORMAT = '{aggregate} AS {alias}'
+GROUP_BY_CLAUSE_FORMAT = 'GROUP BY {fields} '
+GROUP_BY_DEFAULT_FIELD = 'id'
+HAVING_CLAUSE_FORMAT = 'HAVING {conditions} '
+
+# Parallel config, each partition is a range of the values of the `partition_by` field
+PARTITION_BOUNDS_SELECT_FORMAT = 'MIN({field}), MAX({field})'
+PARTITION_CONDITION_FORMAT = '{field} >= {placeholder} AND {field} < {placeholder}'
+PARTITION_LAST_CONDITION_FORMAT = '{field} >= {placeholder} AND {field} <= {placeholder}'
+# MIN and MAX ignore nulls, so the rows without a value are retrieved in a partition of their own
+PARTITION_NULL_CONDITION_FORMAT = '{field} IS NULL'
+
+# Prefetch config, the ids of all of the rows are sent in a single array param
+PREFETCH_CONDITION_FORMAT = '{field} = ANY({placeholder})'
+# name of the related row when the foreign key column already has the name of the field
+PREFETCH_RENAMED_FIELD_FORMAT = '{field}_related'
+
+# Keyset pagination config, the next page starts after the values of the last row of the page
+KEYSET_CONDITION_FORMAT = '({fields}) {operator} ({values})'
+KEYSET_AFTER_OPERATOR = '>'
+KEYSET_BEFORE_OPERATOR = '<'
+KEYSET_FIELD_ALIAS_FORMAT = '{field} AS "__cursor_{index}"'
+
+# Copy config
+COPY_FROM_FORMAT = 'COPY "{table}" ({columns}) FROM STDIN'
+COPY_BUFFER_SIZE = 65536
+COPY_TO_FORMAT = 'COPY ({query}) TO STDOUT WITH (FORMAT {format}{header})'
+COPY_TO_HEADER_OPTION = ', HEADER'
+EXPORT_FORMATS = ('csv', 'text', 'binary')
 
-VALUE_STRING_FORMAT = "'{}'"
 VALUE_LIST_FORMAT = '({})'
-VALUE_TUPLE_FORMAT = '{}'
-VALUE_NULL_FORMAT = 'NULL'
+VALUE_SUBQUERY_FORMAT = '({query})'
+SUBQUERY_DEFAULT_FIELD = 'id'
+VALUE_PLACEHOLDER_FORMAT = '%s'
 
-VALUE_SINGLE_QUOTE_FORMAT = "''"
-VALUE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
\ No newline at end of file
+# Write config, the bulk methods send at most this number of rows in each statement
+MAXIMUM_ROWS_PER_STATEMENT = 999
+UPDATE_FORMAT = 'UPDATE "{table}" SET {sets} '
+SET_FORMAT = '{field} = {value}'
+DELETE_FORMAT = 'DELETE FROM "{table}" '
+WHERE_IN_SUBQUERY_FORMAT = '{field} IN ({query})'
+BULK_UPDATE_FORMAT = 'UPDATE "{table}" SET {sets} FROM ({values}) AS "{alias}" WHERE {conditions}'
+BULK_UPDATE_ALIAS = 'bulk_update'
+# the empty SELECT gives the column types of the table to the VALUES
+BULK_UPDATE_VALUES_FORMAT = 'SELECT {columns} FROM "{table}" WHERE false UNION ALL VALUES {values}'
+UPSERT_FORMAT = '{insert} ON CONFLICT ({conflict}) {action}'
+UPSERT_UPDATE_FORMAT = 'DO UPDATE SET {sets}'
+UPSERT_NOTHING_FORMAT = 'DO NOTHING'
+EXCLUDED_FIELD_FORMAT = 'EXCLUDED.{field}'
@@ -11,9 +11,14 @@ setup(
     url = 'https://github.com/user/reponame',   # Provide either the link to your github or to your website
     download_url = 'https://github.com/user/reponame/archive/v_01.tar.gz',    # I explain this later on
     keywords = ['Query', 'Django Like', 'SQL', 'Queries', 'Join'],   # Keywords that define your package best
+    python_requires='>=3.7',
     install_requires=[
         'psycopg2'
     ],
+    extras_require={
+        'async': ['asyncpg'],
+        'numpy': ['numpy']
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
@@ -21,11 +26,12 @@ setup(
         'License :: OSI Approved :: MIT License', 
         'Operating System :: OS Independent', 
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3 :: Only',
         'Programming Language :: Python :: 3.7',
-        'Programming Language :: Python :: 3.8'
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11'
     ],
     zip_safe=False
 )
\ No newline at end of file
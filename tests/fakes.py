@@ -0,0 +1,201 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import psycopg2.extensions
+
+from query.async_engine import AsyncPostgres
+from query.engine import Postgres
+
+
+class FakeCursor:
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.description = None
+        self.rowcount = -1
+        self.itersize = 2000
+        self.__rows = []
+
+    def execute(self, query, params=None):
+        if self.connection.closed:
+            raise psycopg2.InterfaceError('connection already closed')
+        self.connection.statements.append((query, params))
+        self.connection.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        description, self.__rows = self.connection.respond(query, params)
+        self.description = [(name, type_oid) + (None,) * 5 for name, type_oid in description]
+        self.rowcount = len(self.__rows)
+
+    def fetchall(self):
+        rows, self.__rows = self.__rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self.__rows = self.__rows[:size], self.__rows[size:]
+        return rows
+
+    def mogrify(self, query, params=None):
+        return (query % tuple(repr(param) for param in params) if params else query).encode('utf-8')
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, respond):
+        self.respond = respond
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.prepared_statements = OrderedDict()
+
+    def cursor(self, name=None, **kwargs):
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.commits += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+
+class FakePostgres(Postgres):
+    def __init__(self, rows=None, description=None, **kwargs):
+        """
+        A `Postgres` engine whose connections never touch the network, every SELECT returns `rows` and the catalog
+        is always empty. Every statement is kept in `statements`.
+        """
+        self.rows = rows if rows is not None else []
+        self.description = description if description is not None else []
+        self.connections = []
+        super(FakePostgres, self).__init__(
+            port=5432, host='localhost', database='pyquery', user='pyquery', password='', **kwargs
+        )
+
+    @property
+    def statements(self):
+        return [statement for connection in self.connections for statement in connection.statements]
+
+    def respond(self, query, params):
+        if 'pg_catalog' in query:
+            return [], []
+        return self.description, list(self.rows)
+
+    # replaces the private method of `Postgres` that opens the psycopg2 connections
+    def _Postgres__new_connection(self):
+        connection = FakeConnection(self.respond)
+        self.connections.append(connection)
+        return connection
+
+
+class FakeAttribute:
+    def __init__(self, name, type_oid):
+        self.name = name
+        self.type = SimpleNamespace(oid=type_oid)
+
+
+class FakeAsyncStatement:
+    def __init__(self, connection, query):
+        self.connection = connection
+        self.query = query
+
+    def get_attributes(self):
+        description, __ = self.connection.respond(self.query, None)
+        return [FakeAttribute(name, type_oid) for name, type_oid in description]
+
+    async def fetch(self, *params):
+        return await self.connection.fetch(self.query, *params)
+
+
+class FakeAsyncTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        self.savepoint = self.connection.depth > 0
+        self.connection.statements.append(('SAVEPOINT' if self.savepoint else 'BEGIN', None))
+        self.connection.depth += 1
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.connection.depth -= 1
+        if self.savepoint:
+            statement = 'RELEASE SAVEPOINT' if exc_type is None else 'ROLLBACK TO SAVEPOINT'
+        else:
+            statement = 'COMMIT' if exc_type is None else 'ROLLBACK'
+        self.connection.statements.append((statement, None))
+        return False
+
+
+class FakeAsyncConnection:
+    def __init__(self, respond):
+        self.respond = respond
+        self.statements = []
+        self.depth = 0
+
+    def transaction(self):
+        return FakeAsyncTransaction(self)
+
+    async def prepare(self, query):
+        return FakeAsyncStatement(self, query)
+
+    async def fetch(self, query, *params):
+        self.statements.append((query, params))
+        __, rows = self.respond(query, params)
+        return rows
+
+    async def execute(self, query, *params):
+        self.statements.append((query, params))
+        __, rows = self.respond(query, params)
+        return '{} {}'.format(query.split()[0], len(rows))
+
+
+class FakeAsyncPool:
+    def __init__(self, respond):
+        self.respond = respond
+        self.connections = []
+        self.idle = []
+
+    async def acquire(self, timeout=None):
+        if self.idle:
+            return self.idle.pop()
+        connection = FakeAsyncConnection(self.respond)
+        self.connections.append(connection)
+        return connection
+
+    async def release(self, connection):
+        self.idle.append(connection)
+
+    async def close(self):
+        self.idle = []
+
+
+class FakeAsyncPostgres(AsyncPostgres):
+    def __init__(self, rows=None, description=None, **kwargs):
+        """
+        Same as `FakePostgres` for the asyncio engine, the pool is created upfront so `asyncpg` never connects.
+        Queries use the `$n` placeholders of asyncpg and params are tuples.
+        """
+        self.rows = rows if rows is not None else []
+        self.description = description if description is not None else []
+        super(FakeAsyncPostgres, self).__init__(
+            port=5432, host='localhost', database='pyquery', user='pyquery', password='', **kwargs
+        )
+        self.pool = FakeAsyncPool(self.respond)
+
+    @property
+    def statements(self):
+        return [statement for connection in self.pool.connections for statement in connection.statements]
+
+    def respond(self, query, params):
+        if 'pg_catalog' in query:
+            return [], []
+        return self.description, list(self.rows)
@@ -0,0 +1,86 @@
+import unittest
+
+from query.aggregates import Count, Sum
+from query.pagination import encode_cursor
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+JOIN_RELATIONS = {
+    'form_value': {
+        'form': 'dynamic_forms'
+    }
+}
+
+
+class AggregatesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakePostgres(rows=[(10, 4)])
+
+    def query(self):
+        return Query(JOIN_RELATIONS, 'form_value', self.engine)
+
+    def test_aggregate(self):
+        self.assertEqual(self.query().filter(id___gte=3).aggregate(total=Sum('value'), n=Count()), {'total': 10, 'n': 4})
+        query, params = self.engine.statements[-1]
+        self.assertEqual(
+            query,
+            'SELECT SUM("form_value"."value") AS "total", COUNT(*) AS "n" FROM "form_value" '
+            'WHERE "form_value"."id" >= %s '
+        )
+        self.assertEqual(params, (3,))
+
+    def test_aggregate_does_not_change_the_query(self):
+        query = self.query()
+        query.aggregate(n=Count('form__id', distinct=True))
+        self.assertEqual(query.query, 'SELECT * FROM "form_value" ')
+
+    def test_annotate_groups_by_the_selected_fields(self):
+        query = self.query().values('form__name').annotate(n=Count('id')).having(n___gt=10).order_by('-n')
+        self.assertEqual(
+            query.query,
+            'SELECT "form_value__form"."name", COUNT("form_value"."id") AS "n" FROM "form_value" '
+            'INNER JOIN "dynamic_forms" "form_value__form" ON ("form_value"."form_id" = "form_value__form"."id") '
+            'GROUP BY "form_value__form"."name" HAVING COUNT("form_value"."id") > %s ORDER BY "n" DESC '
+        )
+        self.assertEqual(query.params, (10,))
+
+    def test_annotate_without_selected_fields_groups_by_id(self):
+        self.assertEqual(
+            self.query().annotate(n=Count()).query,
+            'SELECT "form_value".*, COUNT(*) AS "n" FROM "form_value" GROUP BY "form_value"."id" '
+        )
+
+    def test_count_of_an_annotated_query_counts_the_groups(self):
+        self.assertTrue(self.query().select('form_id').annotate(n=Count())._count_query()[0].startswith(
+            'SELECT COUNT(*) FROM (SELECT "form_value"."form_id", COUNT(*) AS "n"'
+        ))
+
+    def test_paginate_keeps_the_annotations(self):
+        query = self.query().select('form__name').annotate(n=Count('id'))
+        (sql, params), number_of_fields = query._keyset_query(('-n', '-form__name'), 10, encode_cursor((5, 'foo')))
+        self.assertEqual(
+            sql,
+            'SELECT "form_value__form"."name", COUNT("form_value"."id") AS "n", '
+            'COUNT("form_value"."id") AS "__cursor_0", "form_value__form"."name" AS "__cursor_1" FROM "form_value" '
+            'INNER JOIN "dynamic_forms" "form_value__form" ON ("form_value"."form_id" = "form_value__form"."id") '
+            'GROUP BY "form_value__form"."name" '
+            'HAVING (COUNT("form_value"."id"), "form_value__form"."name") < (%s, %s) '
+            'ORDER BY "n" DESC, "form_value__form"."name" DESC LIMIT 11 '
+        )
+        self.assertEqual(params, (5, 'foo'))
+        self.assertEqual(number_of_fields, 2)
+
+    def test_annotated_queries_can_not_be_partitioned(self):
+        with self.assertRaises(ValueError):
+            self.query().select('form_id').annotate(n=Count()).parallel()
+
+    def test_aggregates_must_be_aggregates(self):
+        with self.assertRaises(TypeError):
+            self.query().annotate(n='id')
+        with self.assertRaises(ValueError):
+            self.query().limit(1).aggregate(n=Count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+JOIN_RELATIONS = {
+    'form_value': {
+        'form': 'dynamic_forms',
+        'field': 'dynamic_fields'
+    },
+    'dynamic_forms': {
+        'depends_on': 'dynamic_forms'
+    }
+}
+
+
+class AliasesTestCase(unittest.TestCase):
+    def query(self):
+        return Query(JOIN_RELATIONS, 'form_value', FakePostgres())
+
+    def test_aliases_come_from_the_join_path(self):
+        query = self.query()
+        self.assertEqual(query._create_table_name_alias('form'), 'form_value__form')
+        self.assertEqual(query._create_table_name_alias('form__depends_on'), 'form_value__form__depends_on')
+
+    def test_the_same_query_produces_the_same_sql(self):
+        build = lambda: self.query().filter(form__depends_on__name='foo', field__name='bar').query
+        self.assertEqual(build(), build())
+        self.assertIn('"dynamic_forms" "form_value__form__depends_on"', build())
+
+    def test_long_aliases_are_shortened_with_a_digest(self):
+        query = self.query()
+        path = '__'.join(['depends_on'] * 10)
+        alias = query._create_table_name_alias(path)
+        self.assertEqual(len(alias), 63)
+        self.assertTrue(alias.startswith('form_value__depends_on__'))
+        self.assertRegex(alias, '_[0-9a-f]{12}$')
+        # paths that share the prefix get different aliases
+        self.assertNotEqual(alias, query._create_table_name_alias(path + '__other'))
+        self.assertEqual(alias, query._create_table_name_alias(path))
+
+    def test_digest_never_splits_a_character(self):
+        alias = self.query()._create_table_name_alias('ç' * 40)
+        self.assertLessEqual(len(alias.encode('utf-8')), 63)
+        self.assertRegex(alias, '^form_value__ç+_[0-9a-f]{12}$')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+
+from query.query import Query
+from tests.fakes import FakeAsyncPostgres
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class AsyncQueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakeAsyncPostgres(rows=[(1, 'foo'), (2, 'bar')], description=[('id', 23), ('name', 25)])
+
+    def query(self):
+        return Query({}, 'form_value', self.engine)
+
+    def selects(self):
+        return [query for query, __ in self.engine.statements if query.startswith('SELECT')]
+
+    def test_fetch(self):
+        query = self.query().filter(id___gte=1)
+        self.assertEqual(run(query.fetch()), [(1, 'foo'), (2, 'bar')])
+        # the placeholders of asyncpg are numbered
+        self.assertEqual(self.engine.statements, [('SELECT * FROM "form_value" WHERE "form_value"."id" >= $1 ', (1,))])
+        # the results are kept until the query changes
+        self.assertEqual(run(query.fetch()), [(1, 'foo'), (2, 'bar')])
+        self.assertEqual(len(self.selects()), 1)
+
+    def test_count_and_exists(self):
+        self.engine.rows = [(2,)]
+        self.assertEqual(run(self.query().count()), 2)
+        self.assertTrue(run(self.query().exists()))
+        self.assertEqual(self.selects(), [
+            'SELECT COUNT(*) FROM "form_value" ',
+            'SELECT 1 FROM "form_value" LIMIT 1 '
+        ])
+
+    def test_count_and_exists_of_an_evaluated_query(self):
+        query = self.query()
+        run(query.fetch())
+        self.assertEqual(run(query.count()), 2)
+        self.assertTrue(run(query.exists()))
+        self.assertEqual(len(self.selects()), 1)
+
+    def test_exists_with_limit_zero_never_runs(self):
+        self.assertFalse(run(self.query().limit(0).exists()))
+        self.assertEqual(self.engine.statements, [])
+
+    def test_sync_api_is_rejected(self):
+        with self.assertRaises(TypeError):
+            list(self.query())
+
+    def test_result_cache(self):
+        engine = FakeAsyncPostgres(rows=[(1,)], result_cache=True)
+        run(Query({}, 'form_value', engine).cache().fetch())
+        run(Query({}, 'form_value', engine).cache().fetch())
+        self.assertEqual(len([query for query, __ in engine.statements if query.startswith('SELECT')]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
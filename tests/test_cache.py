@@ -0,0 +1,68 @@
+from unittest import mock
+import unittest
+
+from query.cache import LRUCache
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_get_and_set(self):
+        cache = LRUCache()
+        cache.set('foo', 1)
+        self.assertEqual(cache.get('foo'), 1)
+        self.assertIsNone(cache.get('bar'))
+        self.assertEqual(cache.get('bar', 2), 2)
+        cache.delete('foo')
+        self.assertIsNone(cache.get('foo'))
+
+    def test_evicts_the_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('foo', 1)
+        cache.set('bar', 2)
+        cache.get('foo')
+        cache.set('baz', 3)
+        self.assertIsNone(cache.get('bar'))
+        self.assertEqual(cache.get('foo'), 1)
+        self.assertEqual(cache.get('baz'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_keys_expire_after_ttl(self):
+        cache = LRUCache()
+        with mock.patch('query.cache.time.monotonic', return_value=100):
+            cache.set('foo', 1, ttl=10)
+            cache.set('bar', 2)
+        with mock.patch('query.cache.time.monotonic', return_value=109):
+            self.assertEqual(cache.get('foo'), 1)
+        with mock.patch('query.cache.time.monotonic', return_value=110):
+            self.assertIsNone(cache.get('foo'))
+            self.assertEqual(cache.get('bar'), 2)
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(cache.stats()['size'], 1)
+
+    def test_items_skip_expired_keys(self):
+        cache = LRUCache()
+        with mock.patch('query.cache.time.monotonic', return_value=100):
+            cache.set('foo', 1, ttl=10)
+            cache.set('bar', 2)
+        with mock.patch('query.cache.time.monotonic', return_value=109):
+            self.assertEqual(cache.items(), [('foo', 1), ('bar', 2)])
+        with mock.patch('query.cache.time.monotonic', return_value=110):
+            self.assertEqual(cache.items(), [('bar', 2)])
+
+    def test_stats(self):
+        cache = LRUCache(maxsize=10)
+        cache.set('foo', 1)
+        cache.get('foo')
+        cache.get('bar')
+        self.assertEqual(
+            cache.stats(),
+            {'hits': 1, 'misses': 1, 'evictions': 0, 'expirations': 0, 'size': 1, 'maxsize': 10}
+        )
+        cache.clear()
+        self.assertEqual(
+            cache.stats(),
+            {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'size': 0, 'maxsize': 10}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
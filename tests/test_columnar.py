@@ -0,0 +1,89 @@
+from datetime import date
+from decimal import Decimal
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from query.columnar import ColumnarBuffer
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+DESCRIPTION = [('id', 23), ('value', 701), ('price', 1700), ('created_at', 1082), ('name', 25)]
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class ColumnarBufferTestCase(unittest.TestCase):
+    def rows(self, start, stop):
+        return [
+            (index, index * 1.5, Decimal('{}.10'.format(index)), date(2020, 1, 1), 'name {}'.format(index))
+            for index in range(start, stop)
+        ]
+
+    def test_columns_keep_the_type_of_the_database(self):
+        buffer = ColumnarBuffer(DESCRIPTION)
+        buffer.append(self.rows(0, 3))
+        columns = buffer.to_columns()
+        self.assertEqual(list(columns), ['id', 'value', 'price', 'created_at', 'name'])
+        self.assertEqual(columns['id'].dtype, numpy.dtype('int32'))
+        self.assertEqual(columns['value'].dtype, numpy.dtype('float64'))
+        self.assertEqual(columns['created_at'].dtype, numpy.dtype('datetime64[D]'))
+        self.assertEqual(columns['name'].tolist(), ['name 0', 'name 1', 'name 2'])
+
+    def test_numeric_keeps_its_precision(self):
+        buffer = ColumnarBuffer([('price', 1700)])
+        buffer.append([(Decimal('0.1'),), (Decimal('12345678901234567890.01'),)])
+        prices = buffer.to_columns()['price']
+        self.assertEqual(prices.dtype, numpy.dtype('object'))
+        self.assertEqual(prices.tolist(), [Decimal('0.1'), Decimal('12345678901234567890.01')])
+
+    def test_grows_across_batches(self):
+        buffer = ColumnarBuffer(DESCRIPTION)
+        for start in range(0, 3000, 1000):
+            buffer.append(self.rows(start, start + 1000))
+        buffer.append([])
+        columns = buffer.to_columns()
+        self.assertEqual(len(columns['id']), 3000)
+        self.assertEqual(columns['id'].tolist(), list(range(3000)))
+
+    def test_nulls(self):
+        buffer = ColumnarBuffer([('id', 23), ('value', 701), ('enabled', 16)])
+        buffer.append([(1, 1.5, True)])
+        buffer.append([(None, None, None)])
+        columns = buffer.to_columns()
+        # integers and booleans can't store nulls
+        self.assertEqual(columns['id'].tolist(), [1, None])
+        self.assertEqual(columns['enabled'].tolist(), [True, None])
+        self.assertTrue(numpy.isnan(columns['value'][1]))
+
+    def test_records(self):
+        buffer = ColumnarBuffer([('id', 23), ('name', 25)], records=True)
+        buffer.append([(1, 'foo'), (None, 'bar')])
+        records = buffer.to_records()
+        self.assertEqual(records['id'].tolist(), [1, None])
+        self.assertEqual(records['name'].tolist(), ['foo', 'bar'])
+
+    def test_repeated_column_names(self):
+        description = [('id', 23), ('id', 23), ('id_1', 23)]
+        rows = [(1, 2, 3)]
+        for records in (False, True):
+            buffer = ColumnarBuffer(description, records=records)
+            buffer.append(rows)
+            result = buffer.to_records() if records else buffer.to_columns()
+            self.assertEqual([result[name].tolist() for name in ('id', 'id_2', 'id_1')], [[1], [2], [3]])
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class ColumnarQueryTestCase(unittest.TestCase):
+    def test_to_columns(self):
+        engine = FakePostgres(rows=[(1, 10), (2, 20)], description=[('id', 23), ('id', 23)])
+        columns = Query({'form_value': {'form': 'dynamic_forms'}}, 'form_value', engine).select('id', 'form__id').to_columns()
+        self.assertEqual(columns['id'].tolist(), [1, 2])
+        self.assertEqual(columns['id_1'].tolist(), [10, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
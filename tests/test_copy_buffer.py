@@ -0,0 +1,81 @@
+from datetime import date, datetime
+import io
+import unittest
+
+from query.copy_buffer import CopyBuffer, CopyWriter, format_copy_value
+
+
+class FormatCopyValueTestCase(unittest.TestCase):
+    def test_null_and_booleans(self):
+        self.assertEqual(format_copy_value(None), '\\N')
+        self.assertEqual(format_copy_value(True), 't')
+        self.assertEqual(format_copy_value(False), 'f')
+        self.assertEqual(format_copy_value(0), '0')
+
+    def test_dates_and_bytes(self):
+        self.assertEqual(format_copy_value(date(2020, 1, 2)), '2020-01-02')
+        self.assertEqual(format_copy_value(datetime(2020, 1, 2, 3, 4, 5)), '2020-01-02T03:04:05')
+        self.assertEqual(format_copy_value(b'\x00\xff'), '\\\\x00ff')
+
+    def test_escapes_separators_and_backslashes(self):
+        self.assertEqual(format_copy_value('a\tb\nc\rd\\e'), 'a\\tb\\nc\\rd\\\\e')
+        # a string with the text of the null marker is not null
+        self.assertEqual(format_copy_value('\\N'), '\\\\N')
+
+
+class CopyBufferTestCase(unittest.TestCase):
+    def test_reads_every_row(self):
+        buffer = CopyBuffer([(1, 'foo'), (2, None)])
+        self.assertEqual(buffer.read(), b'1\tfoo\n2\t\\N\n')
+        self.assertEqual(buffer.read(), b'')
+        self.assertEqual(buffer.rows, 2)
+        self.assertEqual(buffer.bytes, 11)
+
+    def test_reads_in_chunks_of_size(self):
+        buffer = CopyBuffer([(1, 'foo'), (2, 'bar')])
+        chunks = []
+        while True:
+            chunk = buffer.read(5)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 5)
+            chunks.append(chunk)
+        self.assertEqual(b''.join(chunks), b'1\tfoo\n2\tbar\n')
+
+    def test_formats_rows_only_when_read(self):
+        def rows():
+            yield (1,)
+            raise AssertionError('the second row was formatted')
+
+        buffer = CopyBuffer(rows())
+        self.assertEqual(buffer.read(2), b'1\n')
+
+    def test_encoding(self):
+        self.assertEqual(CopyBuffer([('ção',)], encoding='latin-1').read(), 'ção\n'.encode('latin-1'))
+
+
+class CopyWriterTestCase(unittest.TestCase):
+    def test_writes_in_chunks(self):
+        fileobj = io.BytesIO()
+        writer = CopyWriter(fileobj, chunk_size=8)
+        writer.write(b'1\tfoo\n')
+        self.assertEqual(fileobj.getvalue(), b'')
+        writer.write(b'2\tbar\n')
+        self.assertEqual(fileobj.getvalue(), b'1\tfoo\n2\tbar\n')
+        writer.write('3\tbaz\n')
+        writer.flush()
+        self.assertEqual(fileobj.getvalue(), b'1\tfoo\n2\tbar\n3\tbaz\n')
+        self.assertEqual(writer.bytes, 18)
+
+    def test_text_files_receive_whole_characters(self):
+        fileobj = io.StringIO()
+        writer = CopyWriter(fileobj, chunk_size=1)
+        data = 'ção\n'.encode('utf-8')
+        for index in range(len(data)):
+            writer.write(data[index:index + 1])
+        writer.flush()
+        self.assertEqual(fileobj.getvalue(), 'ção\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from query.instrumentation import Instrumentation, summarize_params, percentile
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    def run_statement(self, instrumentation, query, params=None, rows=1):
+        with instrumentation.measure(query, params) as event:
+            event['rows'] = rows
+
+    def test_stats_by_query_shape(self):
+        instrumentation = Instrumentation()
+        for value in range(3):
+            self.run_statement(instrumentation, 'SELECT * FROM "form_value" WHERE "form_value"."id" = %s', (value,))
+        stats = instrumentation.stats()['queries']['SELECT * FROM "form_value" WHERE "form_value"."id" = %s']
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['rows'], 3)
+        self.assertIsNotNone(stats['p95'])
+
+    def test_query_shapes_are_bounded(self):
+        instrumentation = Instrumentation(shapes_size=2)
+        for size in range(1, 5):
+            self.run_statement(instrumentation, 'SELECT * FROM "form_value" WHERE "id" IN ({})'.format(', '.join(['%s'] * size)))
+        self.assertEqual(
+            list(instrumentation.stats()['queries']),
+            ['SELECT * FROM "form_value" WHERE "id" IN (%s, %s, %s)', 'SELECT * FROM "form_value" WHERE "id" IN (%s, %s, %s, %s)']
+        )
+
+    def test_recent_queries_keep_a_summary_of_the_params(self):
+        instrumentation = Instrumentation()
+        received = []
+        instrumentation.on_post_execute(lambda event: received.append(event['params']))
+        params = tuple(range(2000))
+        self.run_statement(instrumentation, 'INSERT INTO "form_value" VALUES %s', params)
+
+        self.assertIs(received[0], params)
+        self.assertEqual(instrumentation.recent_queries[-1]['params'], summarize_params(params))
+        self.assertTrue(instrumentation.recent_queries[-1]['params'].endswith('... 2000 params'))
+
+    def test_record_params(self):
+        instrumentation = Instrumentation(record_params=True)
+        self.run_statement(instrumentation, 'SELECT %s', (1,))
+        self.assertEqual(instrumentation.recent_queries[-1]['params'], (1,))
+
+    def test_errors_are_counted(self):
+        instrumentation = Instrumentation()
+        with self.assertRaises(ValueError):
+            with instrumentation.measure('SELECT 1'):
+                raise ValueError('error')
+        self.assertEqual(instrumentation.stats()['queries']['SELECT 1']['errors'], 1)
+
+    def test_summarize_params(self):
+        self.assertIsNone(summarize_params(None))
+        self.assertEqual(summarize_params((1, 'foo')), "(1, 'foo')")
+        self.assertTrue(summarize_params(('x' * 1000,)).endswith("xxx..."))
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 95), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from uuid import UUID
+import base64
+import unittest
+
+from query.pagination import decode_cursor, encode_cursor
+
+
+class CursorTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        values = (
+            1, 'foo', None, True, 1.5,
+            datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc), date(2020, 1, 2), time(3, 4, 5),
+            Decimal('1.10'), UUID('12345678-1234-5678-1234-567812345678')
+        )
+        decoded_values = decode_cursor(encode_cursor(values))
+        self.assertEqual(decoded_values, values)
+        # a datetime is never decoded as a date
+        self.assertIs(type(decoded_values[5]), datetime)
+        self.assertIs(type(decoded_values[6]), date)
+
+    def test_cursors_are_url_safe(self):
+        cursor = encode_cursor(('?' * 10, '>' * 10))
+        self.assertTrue(all(character.isalnum() or character in '-_=' for character in cursor))
+
+    def test_invalid_cursors(self):
+        for cursor in (
+            'not a cursor',
+            base64.urlsafe_b64encode(b'{"foo": 1').decode('ascii'),
+            base64.urlsafe_b64encode(b'[["pickle", "x"]]').decode('ascii'),
+            base64.urlsafe_b64encode(b'[["date", "yesterday"]]').decode('ascii'),
+            base64.urlsafe_b64encode(b'1').decode('ascii'),
+            'ção'
+        ):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+class PartitionedPostgres(FakePostgres):
+    """
+    Returns the bounds of the partitions and one row for each partition, the row is the condition of the partition
+    """
+    def __init__(self, bounds, **kwargs):
+        self.bounds = bounds
+        super(PartitionedPostgres, self).__init__(**kwargs)
+
+    def respond(self, query, params):
+        if 'pg_catalog' in query:
+            return [], []
+        if 'MIN(' in query:
+            return [('min', 23), ('max', 23)], [self.bounds]
+        return [('id', 23)], [(query.split('WHERE ')[-1].strip(), params)]
+
+
+class ParallelTestCase(unittest.TestCase):
+    def query(self, bounds):
+        return Query({}, 'form_value', PartitionedPostgres(bounds, pool={'max_size': 4}))
+
+    def test_partitions_cover_the_range_and_the_nulls(self):
+        rows = list(self.query((1, 100)).parallel(workers=2, partition_by='id'))
+        self.assertEqual(rows, [
+            ('"form_value"."id" >= %s AND "form_value"."id" < %s', (1, 50)),
+            ('"form_value"."id" >= %s AND "form_value"."id" <= %s', (50, 100)),
+            ('"form_value"."id" IS NULL', ())
+        ])
+
+    def test_only_nulls(self):
+        rows = list(self.query((None, None)).parallel(workers=2, partition_by='id'))
+        self.assertEqual(rows, [('"form_value"."id" IS NULL', ())])
+
+    def test_small_ranges_never_repeat_a_partition(self):
+        rows = list(self.query((1, 2)).parallel(workers=8, partition_by='id'))
+        self.assertEqual(len(rows), 2)
+
+    def test_limit_can_not_be_partitioned(self):
+        with self.assertRaises(ValueError):
+            self.query((1, 2)).limit(10).parallel()
+
+
+if __name__ == '__main__':
+    unittest.main()
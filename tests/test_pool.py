@@ -0,0 +1,127 @@
+from unittest import mock
+import itertools
+import threading
+import time
+import unittest
+
+from query import pool as pool_module
+from query.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self.ids)
+        self.closed = False
+        self.pings = 0
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+        del pool_module.inherited_connections[:]
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def is_healthy(self, connection):
+        connection.pings += 1
+        return not connection.closed
+
+    def test_reuses_idle_connections(self):
+        pool = ConnectionPool(self.connect)
+        connection = pool.get()
+        pool.put(connection)
+        self.assertIs(pool.get(), connection)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_prunes_connections_idle_longer_than_idle_timeout(self):
+        pool = ConnectionPool(self.connect, min_size=1, max_size=3, idle_timeout=0)
+        connections = [pool.get() for __ in range(3)]
+        for connection in connections:
+            pool.put(connection)
+        time.sleep(0.01)
+
+        pool.get()
+        # the oldest connections are closed, `min_size` of them are kept
+        self.assertEqual([connection.closed for connection in connections], [True, True, False])
+
+    def test_timeout_when_the_pool_is_exhausted(self):
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.05)
+        pool.get()
+        start = time.monotonic()
+        with self.assertRaises(PoolTimeout):
+            pool.get()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_waits_for_a_connection_given_back(self):
+        pool = ConnectionPool(self.connect, max_size=1, timeout=5)
+        connection = pool.get()
+        threading.Timer(0.05, pool.put, args=(connection,)).start()
+        self.assertIs(pool.get(), connection)
+
+    def test_discards_connections_that_fail_to_reset(self):
+        def reset(connection):
+            raise RuntimeError('broken connection')
+
+        pool = ConnectionPool(self.connect, reset=reset, max_size=1, timeout=0.05)
+        connection = pool.get()
+        pool.put(connection)
+        self.assertTrue(connection.closed)
+
+        # the slot of the discarded connection is free again
+        new_connection = pool.get()
+        self.assertIsNot(new_connection, connection)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_health_check_only_after_idle_threshold(self):
+        pool = ConnectionPool(self.connect, is_healthy=self.is_healthy, health_check_after=0.05)
+        connection = pool.get()
+        pool.put(connection)
+        self.assertIs(pool.get(), connection)
+        self.assertEqual(connection.pings, 0)
+
+        pool.put(connection)
+        time.sleep(0.06)
+        self.assertIs(pool.get(), connection)
+        self.assertEqual(connection.pings, 1)
+
+    def test_unhealthy_connections_are_replaced(self):
+        pool = ConnectionPool(self.connect, is_healthy=self.is_healthy, health_check_after=0)
+        connection = pool.get()
+        pool.put(connection)
+        connection.closed = True
+        time.sleep(0.01)
+        self.assertIsNot(pool.get(), connection)
+
+    def test_forked_child_never_closes_nor_frees_the_parent_connections(self):
+        pool = ConnectionPool(self.connect, max_size=2)
+        idle_connection = pool.get()
+        borrowed_connection = pool.get()
+        pool.put(idle_connection)
+
+        with mock.patch('query.pool.os.getpid', return_value=pool._pid + 1):
+            child_connection = pool.get()
+            pool.put(borrowed_connection)
+            pool.discard(borrowed_connection)
+            pool.close()
+
+        self.assertNotIn(child_connection, (idle_connection, borrowed_connection))
+        self.assertFalse(idle_connection.closed)
+        self.assertFalse(borrowed_connection.closed)
+        self.assertIn(idle_connection, pool_module.inherited_connections)
+        self.assertIn(borrowed_connection, pool_module.inherited_connections)
+
+    def test_min_size_bigger_than_max_size(self):
+        with self.assertRaises(ValueError):
+            ConnectionPool(self.connect, min_size=2, max_size=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+class PrefetchPostgres(FakePostgres):
+    def respond(self, query, params):
+        if 'pg_catalog' in query:
+            return [], []
+        if 'FROM "dynamic_forms"' in query:
+            return [('id', 23), ('name', 25)], [(form_id, 'form {}'.format(form_id)) for form_id in params[0]]
+        if query.startswith('SELECT "form_value"."id" FROM'):
+            return [('id', 23)], [(1,)]
+        return [('id', 23), ('form_id', 23)], [(1, 10), (2, 10), (3, None)]
+
+
+class PrefetchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = PrefetchPostgres()
+
+    def query(self):
+        return Query({'form_value': {'form': 'dynamic_forms'}}, 'form_value', self.engine)
+
+    def test_prefetch_runs_one_query_for_each_field(self):
+        rows = self.query().rows(as_='named').prefetch('form').force()
+        self.assertEqual(rows[0].form.name, 'form 10')
+        self.assertIs(rows[0].form, rows[1].form)
+        self.assertIsNone(rows[2].form)
+        self.assertEqual(len([query for query, __ in self.engine.statements if 'dynamic_forms' in query]), 1)
+
+    def test_prefetch_with_dict_rows(self):
+        rows = self.query().prefetch('form').values().force()
+        self.assertEqual(rows[0]['form'], {'id': 10, 'name': 'form 10'})
+
+    def test_foreign_key_column_with_the_name_of_the_field(self):
+        description, rows = self.query()._prefetch_attach(
+            'form', 1, 'id', [('id', 23), ('form', 23)], [(1, 10)], [('id', 23), ('name', 25)], [(10, 'foo')]
+        )
+        self.assertEqual([column[0] for column in description], ['id', 'form', 'form_related'])
+        self.assertEqual(rows, [(1, 10, (10, 'foo'))])
+
+    def test_prefetch_needs_the_foreign_key_column(self):
+        with self.assertRaises(ValueError):
+            self.query().select('id').prefetch('form').force()
+
+
+if __name__ == '__main__':
+    unittest.main()
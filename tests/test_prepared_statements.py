@@ -0,0 +1,86 @@
+import unittest
+
+from query.engine import numbered_placeholders
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+class NumberedPlaceholdersTestCase(unittest.TestCase):
+    def test_numbered_placeholders(self):
+        self.assertEqual(
+            numbered_placeholders('SELECT * FROM "a" WHERE "b" = %s AND "c" IN (%s, %s)'),
+            ('SELECT * FROM "a" WHERE "b" = $1 AND "c" IN ($2, $3)', 3)
+        )
+
+    def test_escaped_percent_signs(self):
+        self.assertEqual(
+            numbered_placeholders('SELECT * FROM "a" WHERE "b" LIKE \'%%foo\' AND "c" = %s'),
+            ('SELECT * FROM "a" WHERE "b" LIKE \'%foo\' AND "c" = $1', 1)
+        )
+        self.assertEqual(numbered_placeholders('SELECT 1'), ('SELECT 1', 0))
+
+
+class PreparedStatementsTestCase(unittest.TestCase):
+    def setUp(self):
+        # a single connection, prepared statements only exist in the connection that prepared them
+        self.engine = FakePostgres(rows=[(1,)], pool={'max_size': 1, 'health_check': False}, prepare=True)
+
+    def query(self, **filters):
+        return Query({}, 'form_value', self.engine).filter(**filters)
+
+    def statements(self):
+        return [
+            statement for statement in self.engine.statements
+            if statement[0].split()[0] in ('PREPARE', 'EXECUTE', 'DEALLOCATE', 'SELECT')
+        ]
+
+    def name(self, index=0):
+        return [query for query, __ in self.statements() if query.startswith('PREPARE')][index].split()[1]
+
+    def test_prepares_once_and_executes_after(self):
+        self.query(id=1).force()
+        self.query(id=2).force()
+        name = self.name()
+        self.assertEqual(self.statements(), [
+            ('PREPARE {} AS SELECT * FROM "form_value" WHERE "form_value"."id" = $1 '.format(name), None),
+            ('EXECUTE {} (%s)'.format(name), (1,)),
+            ('EXECUTE {} (%s)'.format(name), (2,))
+        ])
+
+    def test_each_connection_prepares_its_statements(self):
+        self.query(id=1).force()
+        self.engine.pool.close()
+        self.query(id=2).force()
+        self.assertEqual(len([query for query, __ in self.statements() if query.startswith('PREPARE')]), 2)
+        self.assertEqual(len(self.engine.connections), 2)
+
+    def test_queries_without_placeholders(self):
+        self.query().force()
+        name = self.name()
+        self.assertEqual(self.statements(), [
+            ('PREPARE {} AS SELECT * FROM "form_value" '.format(name), None),
+            ('EXECUTE {}'.format(name), ())
+        ])
+
+    def test_statements_without_params_are_not_prepared(self):
+        self.engine.fetch('SELECT 1')
+        self.assertEqual(self.statements(), [('SELECT 1', None)])
+
+    def test_deallocates_the_least_recently_used(self):
+        self.engine.max_prepared_statements = 2
+        self.query(id=1).force()
+        self.query(name='foo').force()
+        # uses the first statement again, so the second is the least recently used
+        self.query(id=2).force()
+        self.query(value='bar').force()
+        first_name, second_name, third_name = self.name(0), self.name(1), self.name(2)
+        self.assertEqual(self.statements()[-3:], [
+            ('DEALLOCATE {}'.format(second_name), None),
+            ('PREPARE {} AS SELECT * FROM "form_value" WHERE "form_value"."value" = $1 '.format(third_name), None),
+            ('EXECUTE {} (%s)'.format(third_name), ('bar',))
+        ])
+        self.assertEqual(list(self.engine.connections[0].prepared_statements), [first_name, third_name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import unittest
+
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakePostgres(rows=[(1, 'foo')], description=[('id', 23), ('name', 25)], result_cache=True)
+
+    def query(self, table='form_value'):
+        return Query({}, table, self.engine)
+
+    def selects(self):
+        return [query for query, __ in self.engine.statements if query.startswith('SELECT')]
+
+    def cache_size(self):
+        return self.engine.result_cache.stats()['size']
+
+    def test_cached_queries_hit_the_database_once(self):
+        self.assertEqual(self.query().filter(id=1).cache().force(), [(1, 'foo')])
+        self.assertEqual(self.query().filter(id=1).cache().force(), [(1, 'foo')])
+        self.assertEqual(len(self.selects()), 1)
+
+    def test_writes_invalidate_the_table(self):
+        self.query().filter(id=1).cache().force()
+        self.query().insert(id=2, name='bar')
+        self.query().filter(id=1).cache().force()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_transactions_skip_the_cache(self):
+        with self.engine.transaction():
+            self.query().filter(id=1).cache().force()
+            self.query().filter(id=1).cache().force()
+        self.assertEqual(len(self.selects()), 2)
+        self.assertEqual(self.cache_size(), 0)
+
+    def test_writes_in_a_transaction_invalidate_when_it_ends(self):
+        self.query().filter(id=1).cache().force()
+        with self.engine.transaction():
+            self.query().insert(id=2, name='bar')
+            # other threads keep using the committed rows until the commit
+            thread = threading.Thread(target=self.query().filter(id=1).cache().force)
+            thread.start()
+            thread.join()
+            self.assertEqual(self.engine.result_cache.stats()['hits'], 1)
+        self.query().filter(id=1).cache().force()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_writes_in_a_rolled_back_transaction_invalidate_when_it_ends(self):
+        self.query().filter(id=1).cache().force()
+        with self.assertRaises(RuntimeError):
+            with self.engine.transaction():
+                self.query().insert(id=2, name='bar')
+                raise RuntimeError('rollback')
+        self.query().filter(id=1).cache().force()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_writes_while_the_query_runs_invalidate_the_rows(self):
+        respond = self.engine.respond
+
+        def respond_and_write(query, params):
+            result = respond(query, params)
+            # another thread writes to the table while this select runs
+            if query.startswith('SELECT'):
+                self.engine.invalidate_result_cache('form_value')
+            return result
+
+        self.engine.respond = respond_and_write
+        self.query().filter(id=1).cache().force()
+        self.engine.respond = respond
+        self.query().filter(id=1).cache().force()
+        self.assertEqual(len(self.selects()), 2)
+
+    def test_unhashable_params_are_never_cached(self):
+        self.assertIsNone(self.engine.result_cache.key('SELECT %s', ({'foo': 1},), ['form_value']))
+
+    def test_writes_to_other_tables_keep_the_cache(self):
+        self.query().filter(id=1).cache().force()
+        with self.engine.transaction():
+            self.query('dynamic_forms').insert(id=2)
+        self.query().filter(id=1).cache().force()
+        self.assertEqual(len(self.selects()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
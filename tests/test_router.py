@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+
+import psycopg2
+import psycopg2.extensions
+
+from query.query import Query
+from query.router import Router
+from tests.fakes import FakeAsyncPostgres, FakePostgres
+
+
+class QueryCanceled(psycopg2.extensions.QueryCanceledError):
+    # errors sent by the server have a pgcode, statement_timeout is 57014
+    pgcode = '57014'
+
+
+class FailingPostgres(FakePostgres):
+    def __init__(self, error, **kwargs):
+        self.error = error
+        super(FailingPostgres, self).__init__(**kwargs)
+
+    def respond(self, query, params):
+        if 'pg_catalog' in query:
+            return [], []
+        raise self.error
+
+
+class RouterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.primary = FakePostgres(rows=[('primary',)])
+        self.replica = FakePostgres(rows=[('replica',)])
+
+    def query(self, router):
+        return Query({}, 'form_value', router).select('id', flat=True)
+
+    def test_reads_go_to_the_replicas(self):
+        router = Router(self.primary, {'replica': self.replica})
+        self.assertEqual(self.query(router).force(), ['replica'])
+        self.assertEqual(self.query(router).using('primary').force(), ['primary'])
+
+    def test_reads_in_a_transaction_go_to_the_primary(self):
+        router = Router(self.primary, {'replica': self.replica})
+        with router.transaction():
+            self.assertEqual(self.query(router).force(), ['primary'])
+
+    def test_connection_errors_eject_the_replica(self):
+        replica = FailingPostgres(psycopg2.OperationalError('server closed the connection unexpectedly'))
+        router = Router(self.primary, {'replica': replica})
+        self.assertEqual(self.query(router).force(), ['primary'])
+        self.assertFalse(router.replicas[0].is_healthy)
+        self.assertEqual(router.replicas[0].failures, 1)
+
+    def test_query_errors_keep_the_replica(self):
+        replica = FailingPostgres(QueryCanceled('canceling statement due to statement timeout'))
+        router = Router(self.primary, {'replica': replica})
+        with self.assertRaises(psycopg2.extensions.QueryCanceledError):
+            self.query(router).force()
+        self.assertTrue(router.replicas[0].is_healthy)
+        # the query never runs again on the primary
+        self.assertEqual([query for query, __ in self.primary.statements if 'form_value' in query], [])
+
+    def test_round_robin(self):
+        other_replica = FakePostgres(rows=[('other',)])
+        router = Router(self.primary, {'replica': self.replica, 'other': other_replica})
+        self.assertEqual(
+            sorted(self.query(router).force()[0] for __ in range(4)),
+            ['other', 'other', 'replica', 'replica']
+        )
+
+    def test_unknown_replica(self):
+        router = Router(self.primary, {'replica': self.replica})
+        with self.assertRaises(KeyError):
+            self.query(router).using('missing').force()
+
+
+class FailingAsyncPostgres(FakeAsyncPostgres):
+    def __init__(self, error, **kwargs):
+        self.error = error
+        super(FailingAsyncPostgres, self).__init__(**kwargs)
+
+    def respond(self, query, params):
+        if 'pg_catalog' in query:
+            return [], []
+        raise self.error
+
+
+class AsyncRouterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.primary = FakeAsyncPostgres(rows=[('primary',)])
+
+    def query(self, router):
+        return Query({}, 'form_value', router).select('id', flat=True)
+
+    def test_connection_errors_eject_the_replica(self):
+        replica = FailingAsyncPostgres(ConnectionRefusedError('connection refused'))
+        router = Router(self.primary, {'replica': replica})
+        self.assertEqual(asyncio.run(self.query(router).fetch()), ['primary'])
+        self.assertFalse(router.replicas[0].is_healthy)
+
+    def test_timeouts_keep_the_replica(self):
+        replica = FailingAsyncPostgres(asyncio.TimeoutError())
+        router = Router(self.primary, {'replica': replica})
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(self.query(router).fetch())
+        self.assertTrue(router.replicas[0].is_healthy)
+        self.assertEqual([query for query, __ in self.primary.statements if 'form_value' in query], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
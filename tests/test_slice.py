@@ -0,0 +1,62 @@
+import unittest
+
+from query.query import Query
+from tests.fakes import FakePostgres
+
+
+class SliceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakePostgres(rows=[(1,), (2,)])
+
+    def query(self):
+        return Query({}, 'form_value', self.engine)
+
+    def last_statement(self):
+        return self.engine.statements[-1][0]
+
+    def test_window_without_limit_nor_offset(self):
+        query = self.query()
+        self.assertEqual(query._window(0, 10), (10, 0))
+        self.assertEqual(query._window(5, 20), (15, 5))
+        self.assertEqual(query._window(5, None), (None, 5))
+        self.assertEqual(query._window(20, 5), (0, 20))
+
+    def test_window_inside_the_limit(self):
+        query = self.query().limit(10)
+        self.assertEqual(query._window(5, 20), (5, 5))
+        self.assertEqual(query._window(2, 4), (2, 2))
+        self.assertEqual(query._window(5, None), (5, 5))
+        self.assertEqual(query._window(15, 20), (0, 15))
+
+    def test_window_after_the_offset(self):
+        query = self.query().limit(10)
+        query.query_offset = 3
+        self.assertEqual(query._window(5, 20), (5, 8))
+        self.assertEqual(query._window(0, None), (10, 3))
+
+    def test_slice_uses_limit_and_offset(self):
+        self.assertEqual(self.query().limit(10)[5:20], [(1,), (2,)])
+        self.assertEqual(self.last_statement(), 'SELECT * FROM "form_value" LIMIT 5 OFFSET 5 ')
+
+    def test_index_uses_limit_and_offset(self):
+        self.assertEqual(self.query()[4], (1,))
+        self.assertEqual(self.last_statement(), 'SELECT * FROM "form_value" LIMIT 1 OFFSET 4 ')
+
+    def test_slice_past_the_limit_never_runs(self):
+        self.assertEqual(self.query().limit(3)[5:20], [])
+        with self.assertRaises(IndexError):
+            self.query().limit(3)[5]
+        self.assertEqual(self.engine.statements, [])
+
+    def test_negative_indexes_evaluate_the_whole_query(self):
+        self.assertEqual(self.query()[-1], (2,))
+        self.assertEqual(self.query()[::-1], [(2,), (1,)])
+        self.assertEqual(self.last_statement(), 'SELECT * FROM "form_value" ')
+
+    def test_invalid_index(self):
+        with self.assertRaises(TypeError):
+            self.query()['id']
+
+
+if __name__ == '__main__':
+    unittest.main()
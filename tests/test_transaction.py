@@ -0,0 +1,142 @@
+import asyncio
+import unittest
+
+from query.query import Query
+from tests.fakes import FakeAsyncPostgres, FakePostgres
+
+
+class TransactionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakePostgres()
+
+    def insert(self, id):
+        Query({}, 'form_value', self.engine).insert(id=id)
+
+    def statements(self):
+        return [query for query, __ in self.engine.statements]
+
+    def test_single_connection_and_a_single_commit(self):
+        with self.engine.transaction():
+            self.assertTrue(self.engine.in_transaction)
+            self.insert(1)
+            self.insert(2)
+        self.assertFalse(self.engine.in_transaction)
+        connection, = self.engine.connections
+        self.assertEqual(len(connection.statements), 2)
+        self.assertEqual((connection.commits, connection.rollbacks), (1, 0))
+        self.assertEqual(connection.closed, 1)
+
+    def test_rollback_when_an_exception_is_raised(self):
+        with self.assertRaises(RuntimeError):
+            with self.engine.transaction():
+                self.insert(1)
+                raise RuntimeError('rollback')
+        connection, = self.engine.connections
+        self.assertEqual((connection.commits, connection.rollbacks), (0, 1))
+        self.assertFalse(self.engine.in_transaction)
+
+    def test_commit_and_rollback_inside_a_transaction_do_nothing(self):
+        with self.engine.transaction():
+            self.engine.connect()
+            self.engine.execute('SELECT 1')
+            self.engine.commit()
+            self.engine.connect()
+            self.engine.rollback()
+            self.assertEqual((self.engine.connections[0].commits, self.engine.connections[0].rollbacks), (0, 0))
+        self.assertEqual((self.engine.connections[0].commits, self.engine.connections[0].rollbacks), (1, 0))
+
+    def test_nested_transactions_use_savepoints(self):
+        with self.engine.transaction():
+            self.insert(1)
+            with self.engine.transaction():
+                self.insert(2)
+                with self.engine.transaction():
+                    self.insert(3)
+        self.assertEqual(self.statements(), [
+            'INSERT INTO "form_value" ("id") VALUES (%s)',
+            'SAVEPOINT pyquery_savepoint_1',
+            'INSERT INTO "form_value" ("id") VALUES (%s)',
+            'SAVEPOINT pyquery_savepoint_2',
+            'INSERT INTO "form_value" ("id") VALUES (%s)',
+            'RELEASE SAVEPOINT pyquery_savepoint_2',
+            'RELEASE SAVEPOINT pyquery_savepoint_1'
+        ])
+        self.assertEqual(self.engine.connections[0].commits, 1)
+
+    def test_exceptions_in_a_nested_transaction_roll_back_to_the_savepoint(self):
+        with self.engine.transaction():
+            self.insert(1)
+            with self.assertRaises(RuntimeError):
+                with self.engine.transaction():
+                    self.insert(2)
+                    raise RuntimeError('rollback')
+            self.insert(3)
+        self.assertEqual(self.statements(), [
+            'INSERT INTO "form_value" ("id") VALUES (%s)',
+            'SAVEPOINT pyquery_savepoint_1',
+            'INSERT INTO "form_value" ("id") VALUES (%s)',
+            'ROLLBACK TO SAVEPOINT pyquery_savepoint_1',
+            'INSERT INTO "form_value" ("id") VALUES (%s)'
+        ])
+        self.assertEqual((self.engine.connections[0].commits, self.engine.connections[0].rollbacks), (1, 0))
+
+
+class AsyncTransactionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakeAsyncPostgres()
+
+    async def insert(self, id):
+        await Query({}, 'form_value', self.engine).insert(id=id)
+
+    def statements(self):
+        return [query for query, __ in self.engine.statements]
+
+    def test_single_connection_and_a_single_commit(self):
+        async def transaction():
+            async with self.engine.transaction():
+                self.assertTrue(self.engine.in_transaction)
+                await self.insert(1)
+                await self.insert(2)
+            self.assertFalse(self.engine.in_transaction)
+
+        asyncio.run(transaction())
+        self.assertEqual(len(self.engine.pool.connections), 1)
+        self.assertEqual(self.statements()[0], 'BEGIN')
+        self.assertEqual(self.statements()[-1], 'COMMIT')
+        self.assertEqual(self.statements().count('COMMIT'), 1)
+        # the connection is given back to the pool when the transaction ends
+        self.assertEqual(self.engine.pool.idle, self.engine.pool.connections)
+
+    def test_exceptions_in_a_nested_transaction_roll_back_to_the_savepoint(self):
+        async def transaction():
+            async with self.engine.transaction():
+                await self.insert(1)
+                with self.assertRaises(RuntimeError):
+                    async with self.engine.transaction():
+                        await self.insert(2)
+                        raise RuntimeError('rollback')
+                await self.insert(3)
+
+        asyncio.run(transaction())
+        statements = self.statements()
+        self.assertEqual(statements[0], 'BEGIN')
+        self.assertEqual(statements[-1], 'COMMIT')
+        self.assertEqual(statements.count('ROLLBACK TO SAVEPOINT'), 1)
+        self.assertNotIn('ROLLBACK', statements)
+        self.assertEqual(len([query for query in statements if query.startswith('INSERT')]), 3)
+
+    def test_rollback_when_an_exception_is_raised(self):
+        async def transaction():
+            async with self.engine.transaction():
+                await self.insert(1)
+                raise RuntimeError('rollback')
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(transaction())
+        self.assertEqual(self.statements()[-1], 'ROLLBACK')
+        self.assertNotIn('COMMIT', self.statements())
+        self.assertFalse(self.engine.in_transaction)
+
+
+if __name__ == '__main__':
+    unittest.main()
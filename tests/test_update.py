@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+
+from query.query import Query
+from tests.fakes import FakeAsyncPostgres, FakePostgres
+
+
+JOIN_RELATIONS = {
+    'form_value': {
+        'form': 'dynamic_forms'
+    }
+}
+
+
+class UpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        # every statement changes a single row
+        self.engine = FakePostgres(rows=[(1,)])
+
+    def query(self):
+        return Query(JOIN_RELATIONS, 'form_value', self.engine)
+
+    def last_statement(self):
+        return self.engine.statements[-1]
+
+    def test_update(self):
+        self.assertEqual(self.query().filter(id=1, name='foo').update(value='a', number=2), 1)
+        self.assertEqual(self.last_statement(), (
+            'UPDATE "form_value" SET "value" = %s, "number" = %s '
+            'WHERE "form_value"."id" = %s AND "form_value"."name" = %s ',
+            ('a', 2, 1, 'foo')
+        ))
+
+    def test_update_with_joins_filters_by_the_ids(self):
+        self.query().filter(form__name='foo').update(value='a')
+        self.assertEqual(self.last_statement(), (
+            'UPDATE "form_value" SET "value" = %s WHERE "form_value"."id" IN (SELECT "form_value"."id" FROM "form_value" '
+            'INNER JOIN "dynamic_forms" "form_value__form" ON ("form_value"."form_id" = "form_value__form"."id") '
+            'WHERE "form_value__form"."name" = %s) ',
+            ('a', 'foo')
+        ))
+
+    def test_update_without_columns(self):
+        with self.assertRaises(ValueError):
+            self.query().update()
+
+    def test_delete(self):
+        self.assertEqual(self.query().delete(), 1)
+        self.assertEqual(self.last_statement(), ('DELETE FROM "form_value" ', ()))
+
+    def test_delete_with_limit_filters_by_the_ids(self):
+        self.query().filter(value='a').order_by('id').limit(10).delete()
+        self.assertEqual(self.last_statement(), (
+            'DELETE FROM "form_value" WHERE "form_value"."id" IN (SELECT "form_value"."id" FROM "form_value" '
+            'WHERE "form_value"."value" = %s ORDER BY "form_value"."id" ASC LIMIT 10) ',
+            ('a',)
+        ))
+
+    def test_bulk_update(self):
+        rows = [{'id': 1, 'value': 'a'}, {'id': 2, 'value': None}]
+        self.assertEqual(self.query().filter(form_id=3).bulk_update(rows), 1)
+        # the values get the types of the columns from the empty select
+        self.assertEqual(self.last_statement(), (
+            'UPDATE "form_value" SET "value" = "bulk_update"."value" FROM (SELECT "id", "value" FROM "form_value" '
+            'WHERE false UNION ALL VALUES (%s, %s), (%s, %s)) AS "bulk_update" '
+            'WHERE "form_value"."id" = "bulk_update"."id" AND "form_value"."form_id" = %s',
+            (1, 'a', 2, None, 3)
+        ))
+
+    def test_bulk_update_with_a_composite_key(self):
+        self.query().bulk_update([[1, 2, 'a']], key=('form_id', 'id'), column_names=['form_id', 'id', 'value'])
+        self.assertEqual(self.last_statement(), (
+            'UPDATE "form_value" SET "value" = "bulk_update"."value" FROM (SELECT "form_id", "id", "value" '
+            'FROM "form_value" WHERE false UNION ALL VALUES (%s, %s, %s)) AS "bulk_update" '
+            'WHERE "form_value"."form_id" = "bulk_update"."form_id" AND "form_value"."id" = "bulk_update"."id"',
+            (1, 2, 'a')
+        ))
+
+    def test_bulk_update_in_chunks(self):
+        rows = [{'id': index, 'value': index} for index in range(1500)]
+        self.assertEqual(self.query().filter(form_id=3).bulk_update(rows), 2)
+        (first_query, first_params), (second_query, second_params) = self.engine.statements
+        self.assertEqual(len(first_params), 999 * 2 + 1)
+        self.assertEqual(len(second_params), 501 * 2 + 1)
+        self.assertEqual(second_params[:2] + second_params[-1:], (999, 999, 3))
+
+    def test_bulk_update_invalid_rows(self):
+        with self.assertRaises(ValueError):
+            self.query().bulk_update([{'value': 'a'}])
+        with self.assertRaises(ValueError):
+            self.query().bulk_update([{'id': 1}])
+        with self.assertRaises(ValueError):
+            self.query().bulk_update([[1, 'a']])
+
+    def test_bulk_upsert(self):
+        rows = [{'id': 1, 'value': 'a'}, {'id': 2, 'value': 'b'}]
+        self.assertEqual(self.query().bulk_upsert(rows, conflict=['id']), 1)
+        self.assertEqual(self.last_statement(), (
+            'INSERT INTO "form_value" ("id", "value") VALUES (%s, %s), (%s, %s) '
+            'ON CONFLICT ("id") DO UPDATE SET "value" = EXCLUDED."value"',
+            (1, 'a', 2, 'b')
+        ))
+
+    def test_bulk_upsert_keeping_the_existing_rows(self):
+        self.query().bulk_upsert([[1, 'a']], conflict=['id'], column_names=['id', 'value'], update=[])
+        self.assertEqual(self.last_statement(), (
+            'INSERT INTO "form_value" ("id", "value") VALUES (%s, %s) ON CONFLICT ("id") DO NOTHING', (1, 'a')
+        ))
+
+    def test_bulk_upsert_without_conflict(self):
+        with self.assertRaises(ValueError):
+            self.query().bulk_upsert([{'id': 1}], conflict=[])
+
+    def test_empty_writes_never_connect(self):
+        self.assertEqual(self.query().bulk_update([]), 0)
+        self.assertEqual(self.query().bulk_upsert([], conflict=['id']), 0)
+        self.assertEqual(self.engine.connections, [])
+
+    def test_empty_writes_are_awaitable_on_async_engines(self):
+        engine = FakeAsyncPostgres()
+        self.assertEqual(asyncio.run(Query({}, 'form_value', engine).bulk_update([])), 0)
+        self.assertEqual(asyncio.run(Query({}, 'form_value', engine).bulk_upsert([], conflict=['id'])), 0)
+        self.assertEqual(engine.statements, [])
+
+
+if __name__ == '__main__':
+    unittest.main()